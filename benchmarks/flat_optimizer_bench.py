@@ -0,0 +1,90 @@
+"""Compares per-parameter and flattened optimizer states.
+
+Runs training steps of a model with many small parameters with the syncfree
+Adam optimizer and with ZeroRedundancyOptimizer, with and without flattened
+states, and reports the number of HLO instructions of the step graph and the
+average step time. Runs on any PJRT device, eg.:
+
+  PJRT_DEVICE=CPU python benchmarks/flat_optimizer_bench.py --layers 64
+"""
+
+import argparse
+import re
+import time
+
+import torch
+import torch.nn as nn
+import torch_xla
+import torch_xla.core.xla_model as xm
+from torch_xla.amp import syncfree
+from torch_xla.distributed.zero_redundancy_optimizer import ZeroRedundancyOptimizer
+
+
+def make_model(num_layers, hidden_size):
+  layers = []
+  for _ in range(num_layers):
+    layers.extend(
+        [nn.Linear(hidden_size, hidden_size),
+         nn.LayerNorm(hidden_size)])
+  return nn.Sequential(*layers)
+
+
+def run_config(name, args, make_optimizer):
+  device = xm.xla_device()
+  torch.manual_seed(0)
+  model = make_model(args.layers, args.hidden_size).to(device)
+  optimizer = make_optimizer(model.parameters())
+  x = torch.randn(args.batch_size, args.hidden_size).to(device)
+  found_inf = torch.tensor(0.0).to(device)
+  xm.mark_step()
+
+  def step():
+    optimizer.zero_grad()
+    model(x).sum().backward()
+    if isinstance(optimizer, ZeroRedundancyOptimizer):
+      optimizer.step()
+    else:
+      optimizer.step(found_inf=found_inf)
+
+  # Trace one step to count the instructions of the graph.
+  step()
+  hlo = torch_xla._XLAC._get_xla_tensors_hlo(list(model.parameters()))
+  num_instructions = len(re.findall(r'^\s+\S+ = ', hlo, re.M))
+  xm.mark_step()
+  xm.wait_device_ops()
+
+  start = time.perf_counter()
+  for _ in range(args.steps):
+    step()
+    xm.mark_step()
+  xm.wait_device_ops()
+  step_time = (time.perf_counter() - start) / args.steps
+  print(f'{name:<24} {num_instructions:>12} {step_time * 1000:>10.3f}ms')
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__)
+  parser.add_argument('--layers', type=int, default=32)
+  parser.add_argument('--hidden-size', type=int, default=64)
+  parser.add_argument('--batch-size', type=int, default=8)
+  parser.add_argument('--steps', type=int, default=10)
+  args = parser.parse_args()
+
+  print(f'{"config":<24} {"instructions":>12} {"step":>12}')
+  for flatten in (False, True):
+    run_config(
+        f'adam flatten={flatten}', args,
+        lambda params: syncfree.Adam(params, lr=1e-3, flatten_state=flatten))
+  for flatten in (False, True):
+    run_config(
+        f'zero1 adam flatten={flatten}', args,
+        lambda params: ZeroRedundancyOptimizer(
+            params,
+            syncfree.Adam,
+            lr=1e-3,
+            flatten_shards=flatten,
+            flatten_state=flatten))
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,97 @@
+"""Compares the collectives and graph size of FSDP training steps.
+
+Runs a forward and backward pass of a model with many small parameters
+wrapped with `XlaFullyShardedDataParallel` under different communication
+options, and reports the number of collective ops, the number of HLO
+instructions and the time to trace, compile and run the step. Runs on any
+PJRT device, eg.:
+
+  PJRT_DEVICE=CPU python benchmarks/fsdp_collectives_bench.py --layers 64
+"""
+
+import argparse
+import re
+import time
+
+import torch
+import torch.nn as nn
+import torch_xla
+import torch_xla.core.xla_model as xm
+import torch_xla.debug.metrics as met
+from torch_xla.distributed.fsdp import XlaFullyShardedDataParallel as FSDP
+
+_COLLECTIVES = ('all-gather', 'reduce-scatter', 'all-reduce')
+
+
+def make_model(num_layers, hidden_size):
+  layers = []
+  for _ in range(num_layers):
+    layers.extend(
+        [nn.Linear(hidden_size, hidden_size),
+         nn.LayerNorm(hidden_size)])
+  return nn.Sequential(*layers)
+
+
+def count_hlo(hlo_text):
+  counts = {
+      op: len(re.findall(rf' {op}(-start)?\(', hlo_text)) for op in _COLLECTIVES
+  }
+  counts['instructions'] = len(re.findall(r'^\s+\S+ = ', hlo_text, re.M))
+  return counts
+
+
+def run_config(name, args, **fsdp_kwargs):
+  device = xm.xla_device()
+  torch.manual_seed(0)
+  model = FSDP(
+      make_model(args.layers, args.hidden_size),
+      pin_layout_in_collective_ops=False,
+      **fsdp_kwargs)
+  x = torch.randn(args.batch_size, args.hidden_size).to(device)
+  xm.mark_step()
+
+  start = time.perf_counter()
+  model(x).sum().backward()
+  grads = [p.grad for p in model.parameters()]
+  trace_time = time.perf_counter() - start
+  counts = count_hlo(torch_xla._XLAC._get_xla_tensors_hlo(grads))
+
+  met.clear_all()
+  start = time.perf_counter()
+  xm.mark_step()
+  xm.wait_device_ops()
+  first_step_time = time.perf_counter() - start
+  compile_time = met.metric_data('CompileTime')
+  compile_time = compile_time[1] / 1e9 if compile_time else 0.0
+
+  print(f'{name:<24} ' + ' '.join(f'{counts[op]:>14}' for op in _COLLECTIVES) +
+        f' {counts["instructions"]:>12} {trace_time:>8.3f}s'
+        f' {compile_time:>8.3f}s {first_step_time:>8.3f}s')
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__)
+  parser.add_argument('--layers', type=int, default=32)
+  parser.add_argument('--hidden-size', type=int, default=64)
+  parser.add_argument('--batch-size', type=int, default=8)
+  parser.add_argument(
+      '--bucket-bytes',
+      type=int,
+      nargs='+',
+      default=[1 << 16, 1 << 20, 25 << 20],
+      help='The reduce-scatter bucket sizes to compare.')
+  args = parser.parse_args()
+
+  print(f'{"config":<24} ' + ' '.join(f'{op:>14}' for op in _COLLECTIVES) +
+        f' {"instructions":>12} {"trace":>9} {"compile":>9} {"step":>9}')
+  run_config('baseline', args)
+  for bucket_bytes in args.bucket_bytes:
+    run_config(
+        f'bucket={bucket_bytes}',
+        args,
+        coalesce_reduce_scatter_ops=True,
+        reduce_scatter_bucket_bytes=bucket_bytes)
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,72 @@
+"""Compares the startup time and peak host memory of FSDP initialization.
+
+Wraps a toy model of large linear layers with `XlaFullyShardedDataParallel`
+when the model is built on the CPU, built on the meta device and materialized
+before sharding, and built on the meta device and initialized shard by shard
+with `sharded_param_init=True`. Each configuration runs in its own process,
+and reports the time to build and wrap the model and the peak resident memory
+of the process. Runs on any PJRT device, eg.:
+
+  PJRT_DEVICE=CPU python benchmarks/fsdp_init_bench.py --layers 16 --hidden-size 8192
+"""
+
+import argparse
+import multiprocessing
+import resource
+import time
+
+import torch
+import torch.nn as nn
+import torch_xla.core.xla_model as xm
+from torch_xla.distributed.fsdp import XlaFullyShardedDataParallel as FSDP
+from torch_xla.distributed.fsdp.wrap import always_wrap_policy
+
+_CONFIGS = ('cpu', 'meta', 'meta_sharded')
+
+
+def make_model(num_layers, hidden_size, device):
+  return nn.Sequential(*[
+      nn.Linear(hidden_size, hidden_size, device=device)
+      for _ in range(num_layers)
+  ])
+
+
+def run_config(config, args):
+  torch.manual_seed(0)
+  xm.xla_device()
+  start = time.perf_counter()
+  model = make_model(args.layers, args.hidden_size,
+                     'cpu' if config == 'cpu' else 'meta')
+  model = FSDP(
+      model,
+      auto_wrap_policy=always_wrap_policy,
+      sharded_param_init=config == 'meta_sharded')
+  xm.wait_device_ops()
+  init_time = time.perf_counter() - start
+  # In KiB on Linux.
+  peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+  num_params = sum(p.numel() for p in model.parameters())
+  return init_time, peak_rss * 1024, num_params
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__)
+  parser.add_argument('--layers', type=int, default=8)
+  parser.add_argument('--hidden-size', type=int, default=4096)
+  parser.add_argument(
+      '--configs', nargs='+', choices=_CONFIGS, default=list(_CONFIGS))
+  args = parser.parse_args()
+
+  full_bytes = args.layers * (args.hidden_size + 1) * args.hidden_size * 4
+  print(f'full parameters: {full_bytes / 2**20:.1f}MiB')
+  print(f'{"config":<16} {"init":>10} {"peak rss":>12} {"local params":>14}')
+  ctx = multiprocessing.get_context('spawn')
+  for config in args.configs:
+    with ctx.Pool(1) as pool:
+      init_time, peak_rss, num_params = pool.apply(run_config, (config, args))
+    print(f'{config:<16} {init_time:>9.3f}s {peak_rss / 2**20:>9.1f}MiB'
+          f' {num_params:>14}')
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,124 @@
+"""Compares the collectives of SPMD FSDP composed with tensor parallelism.
+
+Runs a forward and backward pass of a stack of MLP blocks on a
+(fsdp, tensor) mesh, either with the tensor parallel weights annotated by
+hand before wrapping with `SpmdFullyShardedDataParallel`, or with a
+`tensor_parallel_plan`. Reports the number of collective ops in the SPMD
+partitioned HLO of the step, and the number of HLO instructions. Runs on a
+virtual CPU mesh, eg.:
+
+  PJRT_DEVICE=CPU CPU_NUM_DEVICES=8 python benchmarks/spmd_fsdp_tp_bench.py
+"""
+
+import argparse
+import re
+
+import numpy as np
+import torch
+import torch.nn as nn
+import torch_xla
+import torch_xla.core.xla_model as xm
+import torch_xla.runtime as xr
+import torch_xla.distributed.spmd as xs
+from torch_xla.experimental.spmd_fully_sharded_data_parallel import SpmdFullyShardedDataParallel as FSDPv2
+
+_COLLECTIVES = ('all-gather', 'reduce-scatter', 'all-reduce', 'all-to-all',
+                'collective-permute')
+
+
+class MLPBlock(nn.Module):
+
+  def __init__(self, hidden_size):
+    super().__init__()
+    self.fc1 = nn.Linear(hidden_size, 4 * hidden_size)
+    self.fc2 = nn.Linear(4 * hidden_size, hidden_size)
+
+  def forward(self, x):
+    return x + self.fc2(torch.relu(self.fc1(x)))
+
+
+class Model(nn.Module):
+
+  def __init__(self, num_layers, vocab_size, hidden_size):
+    super().__init__()
+    self.embedding = nn.Embedding(vocab_size, hidden_size)
+    self.blocks = nn.Sequential(
+        *[MLPBlock(hidden_size) for _ in range(num_layers)])
+
+  def forward(self, x):
+    return self.blocks(self.embedding(x))
+
+
+def count_hlo(hlo_text):
+  counts = {
+      op: len(re.findall(rf' {op}(-start)?\(', hlo_text)) for op in _COLLECTIVES
+  }
+  counts['instructions'] = len(re.findall(r'^\s+\S+ = ', hlo_text, re.M))
+  return counts
+
+
+def annotate_by_hand(model, mesh):
+  # Tensor parallel shardings of the weights, which FSDP then leaves alone.
+  xs.mark_sharding(model.embedding.weight, mesh, (None, 'tensor'))
+  for block in model.blocks:
+    xs.mark_sharding(block.fc1.weight, mesh, ('tensor', None))
+    xs.mark_sharding(block.fc2.weight, mesh, (None, 'tensor'))
+  return FSDPv2(model, mesh)
+
+
+def annotate_with_plan(model, mesh):
+  return FSDPv2(
+      model,
+      mesh,
+      tensor_parallel_plan={
+          'embedding': 'embedding',
+          'blocks.*.fc1': 'colwise',
+          'blocks.*.fc2': 'rowwise',
+      })
+
+
+def run_config(name, wrap, mesh, args):
+  device = xm.xla_device()
+  torch.manual_seed(0)
+  model = wrap(
+      Model(args.layers, args.vocab_size, args.hidden_size).to(device), mesh)
+  x = torch.randint(0, args.vocab_size, (args.batch_size, 16)).to(device)
+  xs.mark_sharding(x, mesh, ('fsdp', None))
+  model(x).sum().backward()
+  grads = [p.grad for p in model.parameters()]
+  hlo = torch_xla._XLAC._xla_partitioning_pass(grads, 1,
+                                               xr.global_runtime_device_count())
+  counts = count_hlo(hlo)
+  print(f'{name:<12} ' + ' '.join(f'{counts[op]:>18}' for op in _COLLECTIVES) +
+        f' {counts["instructions"]:>12}')
+  xm.mark_step()
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__)
+  parser.add_argument('--layers', type=int, default=4)
+  parser.add_argument('--hidden-size', type=int, default=256)
+  parser.add_argument('--vocab-size', type=int, default=1024)
+  parser.add_argument('--batch-size', type=int, default=16)
+  parser.add_argument(
+      '--tensor-parallel-size',
+      type=int,
+      default=2,
+      help='The size of the tensor axis of the mesh.')
+  args = parser.parse_args()
+
+  xr.use_spmd()
+  num_devices = xr.global_runtime_device_count()
+  mesh = xs.Mesh(
+      np.arange(num_devices),
+      (num_devices // args.tensor_parallel_size, args.tensor_parallel_size),
+      ('fsdp', 'tensor'))
+
+  print(f'{"config":<12} ' + ' '.join(f'{op:>18}' for op in _COLLECTIVES) +
+        f' {"instructions":>12}')
+  run_config('by hand', annotate_by_hand, mesh, args)
+  run_config('plan', annotate_with_plan, mesh, args)
+
+
+if __name__ == '__main__':
+  main()
@@ -355,7 +355,8 @@ setup(
     },
     entry_points={
         'console_scripts': [
-            'stablehlo-to-saved-model = torch_xla.tf_saved_model_integration:main'
+            'stablehlo-to-saved-model = torch_xla.tf_saved_model_integration:main',
+            'xla-persistent-cache = torch_xla.debug.persistent_cache:main',
         ],
         'torch_xla.plugins': ['tpu = torch_xla._internal.tpu:TpuPlugin',],
     },
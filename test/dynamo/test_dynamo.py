@@ -1,8 +1,12 @@
+import collections
+import json
 import os
 import sys
+import threading
 
 import torch
 import torch_xla
+import torch_xla.core.dynamo_bridge as bridge
 import torch_xla.core.xla_model as xm
 import torch_xla.utils.utils as xu
 import torch_xla.debug.metrics as met
@@ -12,6 +16,7 @@ import torch.nn as nn
 import torch._dynamo as dynamo
 import torchvision
 import unittest
+from unittest import mock
 import warnings
 
 torch_xla._XLAC._init_computation_client()
@@ -307,6 +312,144 @@ class DynamoCpuFallbackTest(unittest.TestCase):
     self.assertEqual(met.metric_data('ExecuteTime')[0], 3)
 
 
+class DynamoAsyncCompileTest(unittest.TestCase):
+
+  def fn_simple(self, x, y):
+    return torch.cos(x) + torch.sin(y)
+
+  def setUp(self):
+    self._saved_env = os.environ.get('XLA_DYNAMO_ASYNC_COMPILE')
+    os.environ['XLA_DYNAMO_ASYNC_COMPILE'] = '1'
+
+  def tearDown(self):
+    if self._saved_env is None:
+      del os.environ['XLA_DYNAMO_ASYNC_COMPILE']
+    else:
+      os.environ['XLA_DYNAMO_ASYNC_COMPILE'] = self._saved_env
+
+  def test_async_compile_correctness(self):
+    torch._dynamo.reset()
+    device = xm.xla_device()
+    x = torch.randn(10)
+    y = torch.randn(10)
+    xla_x = x.to(device)
+    xla_y = y.to(device)
+    expected = self.fn_simple(x, y)
+    dynamo_fn = torch.compile(self.fn_simple, backend='openxla')
+    stats_before = bridge.async_compile_stats()
+    # Results have to be correct both before and after the background
+    # compilation finishes.
+    res = dynamo_fn(xla_x, xla_y)
+    self.assertTrue(torch.allclose(res.cpu(), expected))
+    bridge.wait_async_compiles()
+    stats = bridge.async_compile_stats()
+    self.assertEqual(stats['pending_compiles'], 0)
+    self.assertEqual(stats['failed_compiles'], stats_before['failed_compiles'])
+    self.assertGreater(stats['completed_compiles'],
+                       stats_before['completed_compiles'])
+
+    met.clear_all()
+    res = dynamo_fn(xla_x, xla_y)
+    self.assertTrue(torch.allclose(res.cpu(), expected))
+    # The compiled graph is used once the background compilation is done.
+    self.assertEqual(met.metric_data('CompileTime'), None)
+    self.assertEqual(met.metric_data('RunCachedGraphOutputData')[0], 1)
+    self.assertEqual(bridge.async_compile_stats()['fallback_executions'],
+                     stats['fallback_executions'])
+
+  def test_async_compile_fallback_does_not_compile(self):
+    torch._dynamo.reset()
+    device = xm.xla_device()
+    x = torch.randn(10)
+    y = torch.randn(10)
+    xla_x = x.to(device)
+    xla_y = y.to(device)
+    expected = self.fn_simple(x, y)
+    dynamo_fn = torch.compile(self.fn_simple, backend='openxla')
+
+    # Hold the background compilation until the fallback calls are checked.
+    gate = threading.Event()
+    compiler = bridge._get_async_compiler()
+    submit = compiler.submit
+
+    def gated_submit(compile_fn):
+
+      def gated_compile_fn():
+        gate.wait()
+        return compile_fn()
+
+      return submit(gated_compile_fn)
+
+    try:
+      with mock.patch.object(compiler, 'submit', gated_submit):
+        dynamo_fn(xla_x, xla_y)
+        stats = bridge.async_compile_stats()
+        met.clear_all()
+        res = dynamo_fn(xla_x, xla_y)
+        xm.mark_step()
+        self.assertTrue(torch.allclose(res.cpu(), expected))
+        # The background compilation is still blocked, so any compilation
+        # would have happened on this thread.
+        self.assertEqual(met.metric_data('CompileTime'), None)
+        self.assertEqual(bridge.async_compile_stats()['fallback_executions'],
+                         stats['fallback_executions'] + 1)
+    finally:
+      gate.set()
+    bridge.wait_async_compiles()
+
+
+class DynamoGraphReportTest(unittest.TestCase):
+
+  def test_graph_report_with_fallback(self):
+
+    def fn_fallback(t):
+      t_2 = torch.mul(t, 2)
+      # aten::_foobar is aux function that's used for testing purposes only
+      t_3 = torch._foobar(t_2)
+      t_4 = torch.mul(t_3, 2)
+      return t_4
+
+    torch._dynamo.reset()
+    bridge.clear_graph_reports()
+    device = xm.xla_device()
+    dynamo_fn = torch.compile(fn_fallback, backend="openxla")
+    t_xla = torch.randn(7).to(device)
+    for _ in range(3):
+      dynamo_fn(t_xla)
+
+    reports = bridge.get_graph_reports()
+    self.assertEqual(len(reports), 1)
+    report = reports[0]
+    # The fallback op splits the graph in two XLA partitions.
+    self.assertEqual(len(report.partitions), 2)
+    self.assertEqual(len(report.unsupported_nodes), 1)
+    self.assertIn('aten::_foobar', list(report.unsupported_nodes.values())[0])
+    for partition in report.partitions:
+      self.assertIsNotNone(partition.graph_hash)
+      self.assertGreater(partition.trace_time, 0)
+      self.assertGreater(partition.compile_time, 0)
+      self.assertEqual(partition.run_count, 3)
+      self.assertGreater(partition.avg_run_time, 0)
+
+    exported = json.loads(bridge.graph_reports_json())
+    self.assertEqual(len(exported), 1)
+    self.assertEqual(exported[0]['partitions'][0]['run_count'], 3)
+    table = bridge.graph_reports_table()
+    for partition in report.partitions:
+      self.assertIn(partition.name, table)
+    self.assertIn('split the graph', table)
+
+  def test_graph_reports_are_bounded(self):
+    bridge.clear_graph_reports()
+    with mock.patch.object(bridge, '_graph_reports',
+                           collections.deque(maxlen=2)):
+      for num_nodes in range(3):
+        bridge._new_graph_report(num_nodes)
+      reports = bridge.get_graph_reports()
+    self.assertEqual([r.graph_id for r in reports], [1, 2])
+    bridge.clear_graph_reports()
+
+
 class DynamoTrainingBasicTest(unittest.TestCase):
 
   @classmethod
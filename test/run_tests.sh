@@ -159,6 +159,7 @@ function run_xla_op_tests1 {
   run_dynamic "$CDIR/ds/test_dynamic_shape_models.py" "$@" --verbosity=$VERBOSITY
   run_eager_debug  "$CDIR/test_operations.py" "$@" --verbosity=$VERBOSITY
   run_test "$CDIR/test_grad_checkpoint.py"
+  run_test "$CDIR/test_selective_checkpoint.py"
   run_test "$CDIR/test_operations.py" "$@" --verbosity=$VERBOSITY
   run_test_without_functionalization "$CDIR/test_operations.py" "$@" --verbosity=$VERBOSITY
   run_pt_xla_debug "$CDIR/debug_tool/test_pt_xla_debug.py"
@@ -208,11 +209,22 @@ function run_xla_op_tests3 {
   run_test "$CDIR/spmd/test_spmd_debugging.py"
   run_test "$CDIR/spmd/test_xla_distributed_checkpoint.py"
   run_test "$CDIR/spmd/test_xla_spmd_python_api_interaction.py"
+  run_test "$CDIR/spmd/test_sharding_planner.py"
+  run_test "$CDIR/spmd/test_virtual_topology.py"
+  run_test "$CDIR/spmd/test_reshard.py"
+  run_test "$CDIR/spmd/test_memory_estimator.py"
   run_test "$CDIR/test_operations_hlo.py" "$@" --verbosity=$VERBOSITY
   run_test "$CDIR/test_input_output_aliases.py"
   run_test "$CDIR/test_torch_distributed_xla_backend.py"
   run_torchrun "$CDIR/pjrt/test_torchrun.py"
   run_test "$CDIR/test_persistent_cache.py"
+  run_test "$CDIR/test_warm_up.py"
+  run_test "$CDIR/test_fsdp_collectives.py"
+  run_test "$CDIR/test_fsdp_hybrid_shard.py"
+  run_test "$CDIR/test_fsdp_auto_wrap_plan.py"
+  run_test "$CDIR/test_fsdp_sharded_init.py"
+  run_test "$CDIR/test_fsdp_simulator.py"
+  run_test "$CDIR/test_cpu_offload_optimizer.py"
   # NOTE: this line below is testing export and don't care about GPU
   PJRT_DEVICE=CPU CPU_NUM_DEVICES=1 run_coverage "$CDIR/test_core_aten_ops.py"
 }
@@ -11,6 +11,7 @@ import torch_xla.distributed.spmd as xs
 
 import test_xla_sharding_base
 from torch_xla.experimental.spmd_fully_sharded_data_parallel import SpmdFullyShardedDataParallel as FSDPv2
+from torch_xla.experimental.spmd_fully_sharded_data_parallel import TensorParallelStyle
 
 
 # TODO(alanwaketan): Add more tests for FSDPv2.
@@ -78,6 +79,83 @@ class FSDPv2Test(test_xla_sharding_base.XlaShardingTest):
     output = model(x)
     self.assertTrue(torch.allclose(output_expected.cpu(), output.cpu()))
 
+  def test_fsdp_v2_tensor_parallel_plan(self):
+    model_expected = self.SimpleLinear().to(xm.xla_device())
+
+    model = copy.deepcopy(model_expected)
+    mesh = self._get_mesh((self.n_devices, 1), None, ('fsdp', 'tensor'))
+    model = FSDPv2(
+        model,
+        mesh,
+        tensor_parallel_plan={
+            'fc1': 'colwise',
+            'fc2': TensorParallelStyle.ROWWISE
+        })
+    self.assertEqual(
+        model.partition_specs, {
+            'fc1.weight': ('tensor', 'fsdp'),
+            'fc1.bias': ('tensor',),
+            'fc2.weight': ('fsdp', 'tensor'),
+            'fc2.bias': ('fsdp',),
+        })
+
+    # The weights are sharded over the fsdp axis on their other dim.
+    if self.n_devices > 1:
+      devices = ','.join([str(i) for i in range(self.n_devices)])
+      self.assertEqual('{devices=[1,%d]%s}' % (self.n_devices, devices),
+                       torch_xla._XLAC._get_xla_sharding_spec(model.fc1.weight))
+      self.assertEqual('{devices=[%d,1]%s}' % (self.n_devices, devices),
+                       torch_xla._XLAC._get_xla_sharding_spec(model.fc2.weight))
+
+    x_expected = torch.randn(16, 128).to(xm.xla_device())
+    x = copy.deepcopy(x_expected)
+    xs.mark_sharding(x, mesh, ('fsdp', None))
+    output = model(x)
+    self.assertTrue(
+        torch.allclose(model_expected(x_expected).cpu(), output.cpu()))
+
+    output.sum().backward()
+    xm.mark_step()
+    self.assertEqual(
+        torch_xla._XLAC._get_xla_sharding_spec(model.fc1.weight.grad),
+        torch_xla._XLAC._get_xla_sharding_spec(model.fc1.weight))
+
+  def test_fsdp_v2_3d_mesh(self):
+    model = self.SimpleLinear().to(xm.xla_device())
+    mesh = self._get_mesh((1, self.n_devices, 1), None,
+                          ('data', 'fsdp', 'tensor'))
+    model = FSDPv2(model, mesh, tensor_parallel_plan={'fc*': 'colwise'})
+    self.assertEqual(model.partition_specs['fc2.weight'], ('tensor', 'fsdp'))
+
+    x = torch.randn(16, 128).to(xm.xla_device())
+    xs.mark_sharding(x, mesh, (('data', 'fsdp'), None))
+    output = model(x)
+    # The batch is sharded over both the data and the fsdp axes.
+    if self.n_devices > 1:
+      self.assertEqual(
+          torch_xla._XLAC._get_xla_sharding_spec(output),
+          torch_xla._XLAC._get_xla_sharding_spec(x))
+
+  def test_fsdp_v2_invalid_tensor_parallel_plan(self):
+    mesh = self._get_mesh((self.n_devices, 1), None, ('fsdp', 'tensor'))
+    with self.assertRaises(ValueError):
+      FSDPv2(
+          self.SimpleLinear().to(xm.xla_device()),
+          mesh,
+          tensor_parallel_plan={'fc1': 'embedding'})
+    with self.assertRaises(ValueError):
+      FSDPv2(
+          self.SimpleLinear().to(xm.xla_device()),
+          mesh,
+          tensor_parallel_plan={'fc3': 'colwise'})
+
+    mesh = self._get_mesh((self.n_devices,), None, ('fsdp',))
+    with self.assertRaises(ValueError):
+      FSDPv2(
+          self.SimpleLinear().to(xm.xla_device()),
+          mesh,
+          tensor_parallel_plan={'fc1': 'colwise'})
+
 
 if __name__ == '__main__':
   test = unittest.main()
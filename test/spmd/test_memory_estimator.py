@@ -0,0 +1,65 @@
+import sys
+import unittest
+
+import torch
+import torch_xla.core.xla_model as xm
+import torch_xla.runtime as xr
+import torch_xla.distributed.spmd as xs
+from torch_xla.distributed.spmd.memory_estimator import _estimate_from_hlo
+import test_xla_sharding_base
+
+_PARTITIONED_HLO = '''HloModule SyncTensorsGraph.8
+
+%add.1 (a: f32[], b: f32[]) -> f32[] {
+  ROOT %x = f32[] add(f32[] %a, f32[] %b)
+}
+
+ENTRY %SyncTensorsGraph.8 (p0.1: f32[4,8], p1.2: f32[8,16]) -> (f32[4,16], f32[8,16]) {
+  %p1.2 = f32[8,16]{1,0} parameter(1), sharding={replicated}
+  %p0.1 = f32[4,8]{1,0} parameter(0), sharding={devices=[2,1]0,1}
+  %dot.3 = f32[4,16]{1,0} dot(f32[4,8]{1,0} %p0.1, f32[8,16]{1,0} %p1.2), lhs_contracting_dims={1}, rhs_contracting_dims={0}
+  %tanh.4 = f32[4,16]{1,0} tanh(f32[4,16]{1,0} %dot.3)
+  %mul.5 = f32[4,16]{1,0} multiply(f32[4,16]{1,0} %tanh.4, f32[4,16]{1,0} %dot.3)
+  ROOT %tuple.6 = (f32[4,16]{1,0}, f32[8,16]{1,0}) tuple(f32[4,16]{1,0} %mul.5, f32[8,16]{1,0} %p1.2)
+}
+'''
+
+
+class MemoryEstimatorTest(test_xla_sharding_base.XlaShardingTest):
+
+  @classmethod
+  def setUpClass(cls):
+    xr.use_spmd()
+    super().setUpClass()
+
+  def test_estimate_from_hlo(self):
+    estimate = _estimate_from_hlo(_PARTITIONED_HLO)
+    self.assertFalse(estimate.compiled)
+    self.assertEqual(estimate.parameter_bytes, (4 * 8 + 8 * 16) * 4)
+    # The second output is an input, and does not take more memory.
+    self.assertEqual(estimate.activation_bytes, 4 * 16 * 4)
+    # The dot and the tanh are both alive when the multiply runs.
+    self.assertEqual(estimate.temp_bytes, 2 * 4 * 16 * 4)
+    self.assertEqual(estimate.total_bytes, 640 + 256 + 512)
+
+  def test_estimate_memory(self):
+    mesh = self._get_mesh((self.n_devices, 1))
+    a = torch.randn(self.n_devices * 4, 8).to(xm.xla_device())
+    b = torch.randn(8, 16).to(xm.xla_device())
+    xs.mark_sharding(a, mesh, (0, None))
+    c = torch.tanh(a @ b)
+
+    estimate = xs.estimate_memory([c])
+    self.assertFalse(estimate.compiled)
+    # The inputs are partitioned before the graph runs.
+    self.assertEqual(estimate.parameter_bytes, (4 * 8 + 8 * 16) * 4)
+    self.assertGreater(estimate.activation_bytes, 0)
+
+    # Compiled executables can pad the device layouts of the buffers.
+    estimate = xs.estimate_memory([c], use_compiled_stats=True)
+    self.assertGreaterEqual(estimate.parameter_bytes, (4 * 8 + 8 * 16) * 4)
+
+
+if __name__ == '__main__':
+  test = unittest.main()
+  sys.exit(0 if test.result.wasSuccessful() else 1)
@@ -0,0 +1,89 @@
+import sys
+import unittest
+
+import numpy as np
+import torch
+import torch_xla
+import torch_xla.core.xla_model as xm
+import torch_xla.runtime as xr
+import torch_xla.distributed.spmd as xs
+from torch_xla.distributed.spmd.reshard import get_partition_spec
+import test_xla_sharding_base
+
+
+class ReshardTest(test_xla_sharding_base.XlaShardingTest):
+
+  @classmethod
+  def setUpClass(cls):
+    xr.use_spmd()
+    super().setUpClass()
+
+  def _collectives(self, plan):
+    return [(step.collective, step.mesh_axis) for step in plan.steps]
+
+  def test_plan_all_to_all(self):
+    # The mesh does not need to match the devices to plan.
+    mesh = xs.Mesh(np.arange(8), (2, 4), ('data', 'model'))
+    t = torch.zeros(8, 16)
+    plan = xs.plan_reshard(t, mesh, (None, 'data'), src_spec=('data', None))
+    self.assertEqual(self._collectives(plan), [('all_to_all', 0)])
+    # Each device keeps half of its 256 bytes shard.
+    self.assertEqual(plan.bytes_per_device, 128)
+    self.assertEqual(plan.bytes_moved, 8 * 128)
+
+  def test_plan_gather_and_slice(self):
+    mesh = xs.Mesh(np.arange(8), (2, 4), ('data', 'model'))
+    t = torch.zeros(8, 16)
+    plan = xs.plan_reshard(
+        t, mesh, ('model', 'data'), src_spec=('data', 'model'))
+    # The data axis is not the minor axis of its target dim after the
+    # all-to-all, so the model axis is gathered and sliced.
+    self.assertEqual(
+        self._collectives(plan), [('all_to_all', 0), ('all_gather', 1),
+                                  ('dynamic_slice', 1)])
+    self.assertEqual([step.bytes_per_device for step in plan.steps],
+                     [32, 192, 0])
+    self.assertEqual(plan.steps[-1].partition_spec, (1, 0))
+
+  def test_plan_collective_permute(self):
+    mesh = xs.Mesh(np.arange(8), (2, 4), ('data', 'model'))
+    t = torch.zeros(8, 16)
+    plan = xs.plan_reshard(
+        t, mesh, (('model', 'data'), None), src_spec=(('data', 'model'), None))
+    self.assertEqual(self._collectives(plan), [('collective_permute', None)])
+    self.assertEqual(plan.bytes_per_device, 64)
+
+    plan = xs.plan_reshard(t, mesh, ('data', None), src_spec=('data', None))
+    self.assertEqual(plan.steps, [])
+    self.assertEqual(plan.bytes_moved, 0)
+
+  @unittest.skipUnless(xr.global_runtime_device_count() > 1,
+                       "Multiple devices required")
+  def test_reshard(self):
+    mesh = self._get_mesh((self.n_devices,), axis_names=('x',))
+    t = torch.randn(self.n_devices, self.n_devices * 2)
+    xt = t.to(xm.xla_device())
+    xs.mark_sharding(xt, mesh, ('x', None))
+    self.assertEqual(get_partition_spec(xt, mesh), (0, None))
+
+    resharded, plan = xs.reshard(xt, mesh, (None, 'x'))
+    self.assertEqual(self._collectives(plan), [('all_to_all', 0)])
+    # The partitioner lowers the annotations to the planned all-to-all, not to
+    # an all-gather followed by a slice.
+    hlo = torch_xla._XLAC._xla_partitioning_pass([resharded.global_tensor], 1,
+                                                 self.n_devices)
+    self.assertIn(' all-to-all(', hlo)
+    self.assertNotRegex(hlo, r' all-gather(-start)?\(')
+    self.assertEqual(get_partition_spec(resharded, mesh), (None, 0))
+    # The input keeps its sharding.
+    self.assertEqual(get_partition_spec(xt, mesh), (0, None))
+    self.assertTrue(torch.allclose(resharded.global_tensor.cpu(), t))
+
+    replicated, plan = xs.reshard(resharded, mesh, (None, None))
+    self.assertEqual(self._collectives(plan), [('all_gather', 0)])
+    self.assertTrue(torch.allclose(replicated.global_tensor.cpu(), t))
+
+
+if __name__ == '__main__':
+  test = unittest.main()
+  sys.exit(0 if test.result.wasSuccessful() else 1)
@@ -0,0 +1,98 @@
+import sys
+import unittest
+
+import numpy as np
+import torch
+from torch import nn
+import torch_xla
+import torch_xla.core.xla_model as xm
+import torch_xla.runtime as xr
+import torch_xla.distributed.spmd as xs
+from torch_xla.distributed.spmd.sharding_planner import ShardingPlan, plan_sharding
+import test_xla_sharding_base
+
+
+class ShardingPlannerTest(test_xla_sharding_base.XlaShardingTest):
+
+  @classmethod
+  def setUpClass(cls):
+    xr.use_spmd()
+    super().setUpClass()
+
+  def _make_model(self):
+    torch.manual_seed(42)
+    return nn.Sequential(
+        nn.Embedding(512, 64), nn.Linear(64, 256), nn.ReLU(),
+        nn.Linear(256, 64), nn.LayerNorm(64)).to(xm.xla_device())
+
+  def _sample_input(self):
+    return torch.randint(0, 512, (8, 16)).to(xm.xla_device())
+
+  def test_replicates_without_budget(self):
+    # The mesh does not need to match the devices to plan.
+    mesh = xs.Mesh(np.arange(16), (16,), ('data',))
+    plan = plan_sharding(self._make_model(), self._sample_input(), mesh=mesh)
+    # All-reducing the gradients is cheaper than gathering the parameters.
+    for name, spec in plan.partition_specs.items():
+      self.assertTrue(all(p is None for p in spec), name)
+    self.assertEqual(
+        plan.comm_bytes,
+        sum(options[0].comm_bytes for options in plan.options.values()))
+
+  def test_shards_large_weights_over_model_axis(self):
+    mesh = xs.Mesh(np.arange(16), (4, 4), ('data', 'model'))
+    plan = plan_sharding(
+        self._make_model(),
+        self._sample_input(),
+        mesh=mesh,
+        data_axes=('data',))
+    # The outputs of the embedding are much smaller than its weight, so
+    # communicating them is cheaper than all-reducing the full gradient.
+    self.assertIn('model', plan.partition_specs['0.weight'])
+    self.assertEqual(plan.partition_specs['4.weight'], (None,))
+
+  def test_fits_budget(self):
+    mesh = xs.Mesh(np.arange(4), (4,), ('data',))
+    model = self._make_model()
+    param_bytes = sum(p.numel() * p.element_size() for p in model.parameters())
+    unbounded = plan_sharding(model, self._sample_input(), mesh=mesh)
+    self.assertEqual(unbounded.memory_bytes, 4 * param_bytes)
+
+    budget = param_bytes
+    plan = plan_sharding(
+        model, self._sample_input(), mesh=mesh, memory_budget_bytes=budget)
+    self.assertLessEqual(plan.memory_bytes, budget)
+    self.assertGreater(plan.comm_bytes, unbounded.comm_bytes)
+    for name, spec in plan.partition_specs.items():
+      self.assertEqual(len(spec), model.get_parameter(name).dim())
+      self.assertIn(spec, [o.partition_spec for o in plan.options[name]])
+
+  def test_options(self):
+    mesh = xs.Mesh(np.arange(4), (4,), ('fsdp',))
+    model = nn.Linear(64, 6).to(xm.xla_device())
+    plan = plan_sharding(
+        model, torch.randn(8, 64).to(xm.xla_device()), mesh=mesh)
+    # The output features are not divisible by the mesh.
+    self.assertEqual([o.partition_spec for o in plan.options['bias']],
+                     [(None,)])
+    weight_options = {o.partition_spec: o for o in plan.options['weight']}
+    self.assertEqual(set(weight_options), {(None, None), (None, 'fsdp')})
+    self.assertLess(weight_options[(None, 'fsdp')].memory_bytes,
+                    weight_options[(None, None)].memory_bytes)
+
+  def test_json_and_apply(self):
+    mesh = self._get_mesh((self.n_devices,), axis_names=('fsdp',))
+    model = self._make_model()
+    plan = plan_sharding(
+        model, self._sample_input(), mesh=mesh, memory_budget_bytes=0)
+    plan = ShardingPlan.from_json(plan.to_json())
+    plan.apply(model, mesh)
+    for name, param in model.named_parameters():
+      if self.n_devices > 1 and any(plan.partition_specs[name]):
+        self.assertNotEqual(
+            torch_xla._XLAC._get_xla_sharding_spec(param), '', name)
+
+
+if __name__ == '__main__':
+  test = unittest.main()
+  sys.exit(0 if test.result.wasSuccessful() else 1)
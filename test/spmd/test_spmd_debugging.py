@@ -6,6 +6,7 @@ import math
 import numpy as np
 import os
 import io
+import json
 import rich
 
 import torch
@@ -830,6 +831,42 @@ class DebuggingSpmdTest(test_xla_sharding_base.XlaShardingTest):
     fake_output = fake_capture.get()
     assert output == fake_output
 
+  def test_sharding_report_entry(self):
+    from torch_xla.distributed.spmd.debugging import _sharding_report_entry
+    entry = _sharding_report_entry(
+        'w', (10, 8), torch.float32,
+        '{devices=[4,1,2]0,1,2,3,4,5,6,7 last_tile_dim_replicate}', 8)
+    self.assertEqual(entry.sharding_type, 'PARTIAL')
+    self.assertEqual(entry.num_shards, 4)
+    self.assertEqual(entry.replication_factor, 2)
+    # Each of the 4 shards holds 3 of the 10 rows, padded to 12 rows.
+    self.assertEqual(entry.bytes_per_device, 3 * 8 * 4)
+    self.assertEqual(entry.padding_bytes, 2 * 8 * 4)
+
+    entry = _sharding_report_entry('b', (8,), torch.bfloat16, '{replicated}',
+                                   256)
+    self.assertEqual(entry.sharding_type, 'REPLICATED')
+    self.assertEqual(entry.replication_factor, 256)
+    self.assertEqual(entry.bytes_per_device, 16)
+    self.assertEqual(entry.padding_bytes, 0)
+
+  def test_sharding_report(self):
+    from torch_xla.distributed.spmd.debugging import sharding_report
+    model = self.SimpleLinear().to(xm.xla_device())
+    mesh = self._get_mesh((self.n_devices, 1))
+    xs.mark_sharding(model.fc1.weight, mesh, (0, 1))
+    report = sharding_report(model)
+    # Only the sharded weight is reported.
+    self.assertEqual([e.name for e in report.entries], ['fc1.weight'])
+    self.assertEqual(report.total_bytes_per_device,
+                     math.ceil(64 / self.n_devices) * 128 * 4)
+
+    totals = json.loads(report.to_json())['totals']
+    self.assertEqual(totals['num_tensors'], 1)
+    self.assertEqual(totals['bytes_per_device'], report.total_bytes_per_device)
+    self.assertIn('<td>fc1.weight</td>', report.to_html())
+    self.assertIn('fc1.weight', str(report))
+
 if __name__ == '__main__':
   test = unittest.main()
   sys.exit(0 if test.result.wasSuccessful() else 1)
@@ -0,0 +1,84 @@
+import sys
+import unittest
+
+import numpy as np
+import torch_xla.distributed.spmd as xs
+from torch_xla.distributed.spmd import VirtualTopology, mesh_locality
+
+
+class VirtualTopologyTest(unittest.TestCase):
+
+  def test_device_attributes(self):
+    topology = VirtualTopology(chip_shape=(2, 2, 1), num_slices=2)
+    attributes = topology.device_attributes()
+    self.assertEqual(len(attributes), topology.num_devices)
+    self.assertEqual(attributes[3], {
+        'name': 'TPU:3',
+        'coords': [1, 1, 0],
+        'core_on_chip': 0,
+        'slice_index': 0,
+    })
+    self.assertEqual(attributes[4]['slice_index'], 1)
+    self.assertEqual(attributes[4]['coords'], [0, 0, 0])
+
+    # Single slice topologies do not report the slice of the devices.
+    topology = VirtualTopology(chip_shape=(2, 2, 1), cores_per_chip=2)
+    attributes = topology.device_attributes()
+    self.assertNotIn('slice_index', attributes[0])
+    self.assertEqual([a['coords'] for a in attributes[:2]],
+                     [[0, 0, 0], [0, 0, 1]])
+
+    with self.assertRaises(ValueError):
+      VirtualTopology(chip_shape=(2, 2, 1), host_shape=(4, 1, 1))
+
+  def test_hybrid_mesh(self):
+    topology = VirtualTopology(
+        chip_shape=(2, 2, 1), num_slices=2, host_shape=(2, 1, 1))
+    mesh = xs.HybridMesh(
+        ici_mesh_shape=(2, 2),
+        dcn_mesh_shape=(2, 1),
+        axis_names=('data', 'model'),
+        topology=topology)
+    self.assertEqual(mesh.get_logical_mesh().tolist(),
+                     [[0, 1], [2, 3], [4, 5], [6, 7]])
+
+    locality = mesh_locality(mesh, topology)
+    # The model axis pairs the chips of a host.
+    self.assertEqual(locality['model'].same_host, 1.0)
+    self.assertEqual(locality['model'].same_slice, 1.0)
+    # The data axis crosses hosts, and slices between its two halves.
+    self.assertEqual(locality['data'].same_host, 0.0)
+    self.assertAlmostEqual(locality['data'].same_slice, 2 / 3)
+
+  def test_hybrid_mesh_multiple_cores_per_chip(self):
+    topology = VirtualTopology(chip_shape=(2, 2, 1), cores_per_chip=2)
+    mesh = xs.HybridMesh(ici_mesh_shape=(2, 4), topology=topology)
+    self.assertEqual(
+        sorted(mesh.get_logical_mesh().flatten().tolist()), list(range(8)))
+    # A single host holds all the devices.
+    for axis_locality in mesh_locality(mesh, topology).values():
+      self.assertEqual(axis_locality.same_host, 1.0)
+
+    with self.assertRaises(ValueError):
+      xs.HybridMesh(
+          ici_mesh_shape=(2, 4), dcn_mesh_shape=(2, 1), topology=topology)
+
+  def test_mesh_locality(self):
+    topology = VirtualTopology(chip_shape=(4, 4, 1), host_shape=(2, 2, 1))
+    # A mesh in device order puts the x axis of the chips on the second axis,
+    # and each host holds 2x2 chips.
+    mesh = xs.Mesh(np.arange(16), (4, 4))
+    locality = mesh_locality(mesh, topology)
+    self.assertAlmostEqual(locality[0].same_host, 2 / 3)
+    self.assertAlmostEqual(locality[1].same_host, 2 / 3)
+    # Along a flattened axis, the rows of chips alternate between hosts.
+    mesh = xs.Mesh(np.arange(16), (16, 1))
+    self.assertAlmostEqual(mesh_locality(mesh, topology)[0].same_host, 8 / 15)
+    self.assertEqual(
+        mesh_locality(xs.Mesh(np.arange(16), (1, 16)), topology)[0].same_host,
+        1.0)
+
+
+if __name__ == '__main__':
+  test = unittest.main()
+  sys.exit(0 if test.result.wasSuccessful() else 1)
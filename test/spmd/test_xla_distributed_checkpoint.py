@@ -20,9 +20,14 @@ from torch.distributed.checkpoint.default_planner import (
     create_default_local_save_plan,
     create_default_global_save_plan,
 )
+from torch.distributed.checkpoint.metadata import (ChunkStorageMetadata,
+                                                   MetadataIndex)
+from torch.distributed.checkpoint.planner import (SavePlan, TensorProperties,
+                                                  TensorWriteData, WriteItem,
+                                                  WriteItemType)
 from torch_xla.experimental.distributed_checkpoint import SPMDLoadPlanner, SPMDSavePlanner, CheckpointManager
 from torch_xla.experimental.distributed_checkpoint._helpers import (
-    _sharded_cpu_state_dict, _CpuShards, _is_sharded_tensor)
+    _sharded_cpu_state_dict, _CpuShards, _is_sharded_tensor, dedup_tensors)
 
 
 # Wrapper to manage a temporary directory for the wrapped test
@@ -331,9 +336,81 @@ class SPMDSavePlannerTest(DistributedCheckpointTestBase):
       resolved_data = planner.resolve_data(write_item)
       self.assertTrue(torch.allclose(shard.data, resolved_data))
 
+  @unittest.skipUnless(xr.global_runtime_device_count() >= 4,
+                       "Multiple devices required for partial replication")
+  def test_partially_replicated_save_plan(self):
+    t = torch.randn(16, 16).to(xm.xla_device())
+    mesh = self._get_mesh((self.n_devices // 2, 2))
+    # Partial replication along the 0th tensor axis, shard 2-way on the 1st
+    xs.mark_sharding(t, mesh, (None, 1))
+    for chkpt_on_cpu in [True, False]:
+      with self.subTest(chkpt_on_cpu):
+        state_dict = {'weight': t}
+        if chkpt_on_cpu:
+          state_dict = _sharded_cpu_state_dict(state_dict)
+        planner = SPMDSavePlanner()
+        planner.set_up_planner(state_dict, True)
+        plan = planner.create_local_plan()
+        # A single WriteItem is created for each unique shard.
+        self.assertEqual(len(plan.items), 2)
+        global_plan, _ = planner.create_global_plan([plan])
+        plan = planner.finish_plan(global_plan[0])
+        self.assertEqual(len(plan.items), 2)
+        for write_item in plan.items:
+          offset = write_item.index.offset
+          data = planner.resolve_data(write_item)
+          self.assertTrue(
+              torch.allclose(data,
+                             t.cpu()[:, offset[1]:offset[1] + 8]))
+
 
 class DistributedCheckpointHelpersTest(DistributedCheckpointTestBase):
 
+  def _write_item(self, fqn, offset, size):
+    return WriteItem(
+        index=MetadataIndex(fqn, torch.Size([offset])),
+        type=WriteItemType.SHARD,
+        tensor_data=TensorWriteData(
+            chunk=ChunkStorageMetadata(
+                offsets=torch.Size([offset]), sizes=torch.Size([size])),
+            properties=TensorProperties(dtype=torch.float32),
+            size=torch.Size([64])))
+
+  def test_dedup_tensors_balances_owners(self):
+    # Every item is replicated on both plans, and plan 0 also has an item of
+    # its own.
+    items = [self._write_item('a', offset, 16) for offset in (0, 16, 32, 48)]
+    plans = [
+        SavePlan(items + [self._write_item('b', 0, 32)]),
+        SavePlan(list(items)),
+    ]
+    plans = dedup_tensors(plans)
+    keys = [{item.index for item in plan.items} for plan in plans]
+    self.assertEqual(keys[0] & keys[1], set())
+    self.assertEqual(len(keys[0] | keys[1]), 5)
+    # Each plan writes half of the 96 elements.
+    for plan in plans:
+      self.assertEqual(
+          sum(item.tensor_data.chunk.sizes[0] for item in plan.items), 48)
+
+    # Duplicates within a plan are kept once.
+    plans = dedup_tensors([SavePlan(items + items)])
+    self.assertEqual(len(plans[0].items), len(items))
+
+  @unittest.skipUnless(xr.global_runtime_device_count() >= 4,
+                       "Multiple devices required for partial replication")
+  def test_sharded_cpu_state_dict_partial_replication(self):
+    t = torch.randn(16, 16).to(xm.xla_device())
+    mesh = self._get_mesh((self.n_devices // 2, 2))
+    xs.mark_sharding(t, mesh, (None, 1))
+    cpu_shards = _sharded_cpu_state_dict({'weight': t})['weight']
+    self.assertIsInstance(cpu_shards, _CpuShards)
+    # With a single process, each unique shard is transferred once.
+    self.assertEqual(
+        sorted(shard.indices[1].start for shard in cpu_shards.shards), [0, 8])
+    for shard in cpu_shards.shards:
+      self.assertTrue(torch.allclose(shard.data, t.cpu()[shard.indices]))
+
   def test_sharded_cpu_state_dict(self):
     model = self.SimpleLinear().to(xm.xla_device())
     state_dict = model.state_dict()
@@ -124,6 +124,40 @@ class BasicShardingTest(test_xla_sharding_base.XlaShardingTest):
       # Tiled sharding makes all shards have replica_id 0.
       self.assertEqual(shard.replica_id, 0)
 
+  def test_local_shard_handles(self):
+    num_element = self.n_devices + 1  # Ensure padding with two or more devices
+    mesh = self._get_mesh((self.n_devices,))
+    t = torch.arange(num_element, dtype=torch.float32)
+    xt = xs.mark_sharding(t.to(xm.xla_device()), mesh, (0,))
+    shards = xt.local_shards
+
+    met.clear_all()
+    handles = xt.local_shard_handles
+    # Reading the metadata of the shards does not transfer their data.
+    self.assertNotIn('TransferFromDeviceTime', met.metric_names())
+    self.assertEqual(len(handles), len(shards))
+    for handle, shard in zip(handles, shards):
+      self.assertEqual(handle.indices, shard.indices)
+      self.assertEqual(handle.shard_device, shard.shard_device)
+      self.assertEqual(handle.replica_id, shard.replica_id)
+      self.assertEqual(handle.unpadded_shape, shard.unpadded_data.shape)
+
+    # Fetch a subset of the shards, with and without padding.
+    subset = handles[::2]
+    padded = xs.fetch_shards(subset)
+    unpadded = xs.fetch_shards(subset, unpadded=True)
+    for i, handle in enumerate(subset):
+      shard = shards[handle.shard_index]
+      self.assertTrue(torch.allclose(padded[i], shard.data))
+      self.assertTrue(torch.allclose(unpadded[i], shard.unpadded_data))
+
+    # Fetch into caller-provided buffers.
+    out = torch.empty(handles[0].unpadded_shape)
+    self.assertIs(handles[0].fetch(unpadded=True, out=out), out)
+    self.assertTrue(torch.allclose(out, shards[0].unpadded_data))
+    with self.assertRaises(ValueError):
+      handles[0].fetch(out=torch.empty(num_element + 1))
+
   def test_replicated_xla_shards(self):
     num_element = self.n_devices
     mesh = self._get_mesh((self.n_devices,))
@@ -203,6 +237,32 @@ class BasicShardingTest(test_xla_sharding_base.XlaShardingTest):
     with self.assertRaises(RuntimeError):
       rt.load_local_shards_(local_shards)
 
+  def test_make_global_tensor_from_local_shards(self):
+    mesh = self._get_mesh((self.n_devices, 1), axis_names=('data', 'model'))
+    # Ensure padding with two or more devices
+    t = torch.randn(self.n_devices + 1, 4)
+    # A single process holds the shards of all the devices.
+    met.clear_all()
+    xt = xs.make_global_tensor_from_local_shards(t, mesh, ('data', None),
+                                                 t.shape)
+    # The placeholder of the global tensor is never executed.
+    self.assertNotIn('ExecuteReplicatedTime', met.metric_names())
+    self.assertNotIn('ExecuteTime', met.metric_names())
+    self.assertTrue(torch.allclose(xt.global_tensor.cpu(), t))
+    self.assertEqual(
+        torch_xla._XLAC._get_xla_sharding_spec(xt.global_tensor),
+        torch_xla._XLAC._get_xla_sharding_spec(
+            xs.mark_sharding(t.to(xm.xla_device()), mesh,
+                             ('data', None)).global_tensor))
+
+    rt = xs.make_global_tensor_from_local_shards(t, mesh, (None, None), t.shape)
+    self.assertTrue(torch.allclose(rt.global_tensor.cpu(), t))
+
+    # The local data must span the local shards.
+    with self.assertRaises(ValueError):
+      xs.make_global_tensor_from_local_shards(t[1:], mesh, ('data', None),
+                                              t.shape)
+
   def test_xla_sharding_type(self):
     t = torch.randn(10, 20).to(xm.xla_device())
     self.assertEqual(torch_xla._XLAC._get_xla_sharding_type(t), None)
@@ -914,6 +974,52 @@ class BasicShardingTest(test_xla_sharding_base.XlaShardingTest):
     xs.mark_sharding(v, mesh, (0, None))
     self.assertEqual(met.counter_value("CreateOpSharding"), 2)
 
+  def test_op_sharding_cache_named_axes(self):
+    met.clear_all()
+    mesh = self._get_mesh((1, self.n_devices), axis_names=('x', 'y'))
+
+    op_sharding = mesh.get_op_sharding(('x', 'y'))
+    self.assertEqual(met.counter_value("CreateOpSharding"), 1)
+    # Equivalent partition specs share the cached OpSharding.
+    self.assertIs(mesh.get_op_sharding((0, 1)), op_sharding)
+    self.assertIs(mesh.get_op_sharding(['x', 1]), op_sharding)
+    self.assertEqual(met.counter_value("CreateOpSharding"), 1)
+    # The dynamo custom op branch of mark_sharding uses the cached arguments.
+    op_sharding_args, _ = mesh._get_cached_op_sharding((0, 1))
+    self.assertIs(mesh._get_cached_op_sharding(('x', 'y'))[0], op_sharding_args)
+
+    # The cache is per mesh.
+    other_mesh = self._get_mesh((1, self.n_devices), axis_names=('x', 'y'))
+    self.assertIsNot(other_mesh.get_op_sharding((0, 1)), op_sharding)
+    self.assertEqual(met.counter_value("CreateOpSharding"), 2)
+
+  def test_mark_sharding_many(self):
+    met.clear_all()
+    mesh = self._get_mesh((1, self.n_devices))
+    partition_specs = [(0, 1), (1,), (None, 1), (0, 1)]
+    tensors = [
+        torch.randn(1, self.n_devices),
+        torch.randn(self.n_devices),
+        torch.randn(4, self.n_devices),
+        torch.randn(1, self.n_devices),
+    ]
+    xtensors = [t.to(xm.xla_device()) for t in tensors]
+    xsts = xs.mark_sharding_many(xtensors, mesh, partition_specs)
+    self.assertEqual(met.counter_value("CreateOpSharding"), 3)
+
+    for t, xt, xst, partition_spec in zip(tensors, xtensors, xsts,
+                                          partition_specs):
+      self.assertIsInstance(xst, XLAShardedTensor)
+      expected = torch.randn(t.shape).to(xm.xla_device())
+      xs.mark_sharding(expected, mesh, partition_spec)
+      self.assertEqual(
+          torch_xla._XLAC._get_xla_sharding_spec(xt),
+          torch_xla._XLAC._get_xla_sharding_spec(expected))
+      self.assertTrue(torch.allclose(xt.cpu(), t))
+
+    with self.assertRaises(AssertionError):
+      xs.mark_sharding_many(xtensors[:2], mesh, partition_specs)
+
   def test_from_cpu_shards_replicated(self):
     from_cpu_shards = torch_xla._XLAC._global_tensor_from_cpu_shards
 
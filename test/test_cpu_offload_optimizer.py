@@ -0,0 +1,107 @@
+import sys
+import unittest
+
+import torch
+import torch.nn as nn
+import torch_xla.core.xla_model as xm
+from torch_xla.distributed.cpu_offload_optimizer import CPUOffloadOptimizer, get_buckets
+from torch_xla.distributed.fsdp import XlaFullyShardedDataParallel as FSDP
+import test_utils
+
+
+def _make_model():
+  torch.manual_seed(42)
+  return nn.Sequential(*[nn.Linear(8, 8) for _ in range(4)])
+
+
+class _CountingSGD(torch.optim.SGD):
+
+  def __init__(self, *args, **kwargs):
+    super().__init__(*args, **kwargs)
+    self.num_steps = 0
+
+  def step(self, closure=None):
+    self.num_steps += 1
+    return super().step(closure)
+
+
+class CPUOffloadOptimizerTest(test_utils.XlaTestCase):
+
+  def _train(self, model, optimizer, steps=3):
+    device = xm.xla_device()
+    x = torch.randn(4, 8, generator=torch.Generator().manual_seed(0))
+    for _ in range(steps):
+      optimizer.zero_grad()
+      model(x.to(device)).sum().backward()
+      optimizer.step()
+      xm.mark_step()
+    return [p.cpu() for p in model.parameters()]
+
+  def test_get_buckets(self):
+    tensors = [torch.zeros(4), torch.zeros(4), torch.zeros(16), torch.zeros(1)]
+    self.assertEqual(get_buckets(tensors, 32), [[0, 1], [2], [3]])
+    self.assertEqual(get_buckets(tensors, 1 << 20), [[0, 1, 2, 3]])
+
+  def test_matches_device_optimizer(self):
+    device = xm.xla_device()
+    model = _make_model().to(device)
+    params = self._train(model, torch.optim.Adam(model.parameters(), lr=1e-2))
+    # One bucket per layer, and all layers in one bucket.
+    for bucket_cap_bytes in (288, 1 << 20):
+      model = _make_model().to(device)
+      optimizer = CPUOffloadOptimizer(
+          model.parameters(),
+          torch.optim.Adam,
+          bucket_cap_bytes=bucket_cap_bytes,
+          lr=1e-2)
+      offloaded_params = self._train(model, optimizer)
+      for param, offloaded_param in zip(params, offloaded_params):
+        self.assertEqual(param, offloaded_param)
+      for state in optimizer.state_dict()['state'].values():
+        self.assertEqual(state['exp_avg'].device.type, 'cpu')
+
+  def test_fsdp_matches_device_optimizer(self):
+    model = FSDP(_make_model())
+    params = self._train(model, torch.optim.Adam(model.parameters(), lr=1e-2))
+    model = FSDP(_make_model())
+    offloaded_params = self._train(
+        model,
+        CPUOffloadOptimizer(model.parameters(), torch.optim.Adam, lr=1e-2))
+    for param, offloaded_param in zip(params, offloaded_params):
+      self.assertEqual(param, offloaded_param)
+
+  def test_wrapped_step_runs_once_per_bucket(self):
+    device = xm.xla_device()
+    model = _make_model().to(device)
+    # One bucket per layer.
+    optimizer = CPUOffloadOptimizer(
+        model.parameters(), _CountingSGD, bucket_cap_bytes=288, lr=0.1)
+    self._train(model, optimizer)
+    self.assertEqual(len(optimizer._buckets), 4)
+    for bucket in optimizer._buckets:
+      self.assertEqual(bucket.optimizer.num_steps, 3)
+
+  def test_state_dict(self):
+    device = xm.xla_device()
+    model = _make_model().to(device)
+    optimizer = CPUOffloadOptimizer(
+        model.parameters(), torch.optim.Adam, bucket_cap_bytes=288, lr=1e-2)
+    self._train(model, optimizer, steps=1)
+    state_dict = optimizer.state_dict()
+    self.assertEqual(len(state_dict['state']), 4)
+    optimizer.param_groups[0]['lr'] = 1.0
+    optimizer.load_state_dict(state_dict)
+    self.assertEqual(optimizer.param_groups[0]['lr'], 1e-2)
+
+  def test_partial_bucket_grads(self):
+    device = xm.xla_device()
+    model = _make_model().to(device)
+    optimizer = CPUOffloadOptimizer(model.parameters(), torch.optim.SGD, lr=0.1)
+    model[0].weight.grad = torch.ones_like(model[0].weight)
+    with self.assertRaises(RuntimeError):
+      optimizer.step()
+
+
+if __name__ == '__main__':
+  test = unittest.main(exit=False)
+  sys.exit(0 if test.result.wasSuccessful() else 1)
@@ -0,0 +1,88 @@
+import sys
+import unittest
+
+import torch
+import torch.nn as nn
+import torch_xla.core.xla_model as xm
+from torch_xla.distributed.fsdp import XlaFullyShardedDataParallel as FSDP
+from torch_xla.distributed.fsdp.wrap import AutoWrapPlan, plan_auto_wrap, profile_module
+import test_utils
+
+# The bytes of the parameters of a Linear(64, 64) layer.
+_LAYER_BYTES = (64 * 64 + 64) * 4
+# The bytes of the output of a layer for a batch of 2.
+_OUTPUT_BYTES = 2 * 64 * 4
+
+
+def _make_model():
+  torch.manual_seed(42)
+  return nn.Sequential(*[nn.Linear(64, 64) for _ in range(4)])
+
+
+class FsdpAutoWrapPlanTest(test_utils.XlaTestCase):
+
+  def _sample_input(self):
+    return torch.randn(2, 64).to(xm.xla_device())
+
+  def test_profile_module(self):
+    model = _make_model().to(xm.xla_device())
+    profiles = profile_module(model, self._sample_input())
+    self.assertEqual(profiles[''].param_bytes, 4 * _LAYER_BYTES)
+    self.assertEqual(profiles['0'].param_bytes, _LAYER_BYTES)
+    self.assertEqual(profiles['0'].activation_bytes, _OUTPUT_BYTES)
+    profiles = profile_module(
+        model, self._sample_input(), compute_dtype=torch.bfloat16)
+    self.assertEqual(profiles['0'].param_bytes, _LAYER_BYTES // 2)
+
+  def test_profile_module_restores_buffers(self):
+    device = xm.xla_device()
+    model = nn.Sequential(nn.Linear(64, 64), nn.BatchNorm1d(64)).to(device)
+    running_mean = model[1].running_mean.cpu()
+    profile_module(model, self._sample_input())
+    self.assertTrue(torch.equal(model[1].running_mean.cpu(), running_mean))
+
+  def test_plan_fits_budget(self):
+    model = _make_model().to(xm.xla_device())
+    fixed_bytes = _LAYER_BYTES + 4 * _OUTPUT_BYTES
+    # Room for two full layers.
+    budget = fixed_bytes + 2 * _LAYER_BYTES
+    plan = plan_auto_wrap(
+        model, self._sample_input(), memory_budget_bytes=budget, world_size=4)
+    self.assertEqual(plan.wrap_module_names, ['2', '3'])
+    self.assertEqual(plan.num_units, 3)
+    self.assertEqual(plan.estimated_peak_bytes, budget)
+
+    # A larger budget needs fewer units.
+    plan = plan_auto_wrap(
+        model,
+        self._sample_input(),
+        memory_budget_bytes=fixed_bytes + 4 * _LAYER_BYTES,
+        world_size=4)
+    self.assertEqual(plan.wrap_module_names, [])
+
+    with self.assertRaises(ValueError):
+      plan_auto_wrap(
+          model,
+          self._sample_input(),
+          memory_budget_bytes=fixed_bytes,
+          world_size=4)
+
+  def test_apply_saved_plan(self):
+    model = _make_model().to(xm.xla_device())
+    plan = plan_auto_wrap(
+        model,
+        self._sample_input(),
+        memory_budget_bytes=2 * _LAYER_BYTES + 4 * _OUTPUT_BYTES,
+        world_size=4)
+    plan = AutoWrapPlan.from_json(plan.to_json())
+    self.assertEqual(plan.wrap_module_names, ['1', '2', '3'])
+
+    model = _make_model()
+    model = FSDP(model, auto_wrap_policy=plan.auto_wrap_policy(model))
+    units = [m for m in model.modules() if isinstance(m, FSDP)]
+    self.assertEqual(len(units), plan.num_units)
+
+
+if __name__ == '__main__':
+  test = unittest.main(exit=False)
+  sys.exit(0 if test.result.wasSuccessful() else 1)
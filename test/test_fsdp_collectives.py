@@ -0,0 +1,179 @@
+import sys
+import unittest
+
+import torch
+import torch.nn as nn
+import torch_xla
+import torch_xla.core.xla_model as xm
+from torch_xla.distributed.fsdp import XlaFullyShardedDataParallel as FSDP
+from torch_xla.distributed.fsdp.wrap import always_wrap_policy
+import test_utils
+
+
+def _make_model():
+  torch.manual_seed(42)
+  return nn.Sequential(*[nn.Linear(8, 8) for _ in range(4)])
+
+
+def _count_ops(tensors, op_name):
+  hlo = torch_xla._XLAC._get_xla_tensors_hlo(tensors)
+  return hlo.count(f' {op_name}(')
+
+
+class FsdpReduceScatterBucketingTest(test_utils.XlaTestCase):
+
+  def _backward(self, **fsdp_kwargs):
+    device = xm.xla_device()
+    model = FSDP(
+        _make_model(), pin_layout_in_collective_ops=False, **fsdp_kwargs)
+    x = torch.randn(4, 8, generator=torch.Generator().manual_seed(0))
+    model(x.to(device)).sum().backward()
+    return [p.grad for p in model.parameters()]
+
+  def test_bucketed_grads_match(self):
+    grads = self._backward()
+    # Each padded gradient is 128 floats, so two of them fill a bucket.
+    bucketed_grads = self._backward(
+        coalesce_reduce_scatter_ops=True, reduce_scatter_bucket_bytes=1024)
+    self.assertEqual(_count_ops(grads, 'reduce-scatter'), 8)
+    self.assertEqual(_count_ops(bucketed_grads, 'reduce-scatter'), 4)
+    for grad, bucketed_grad in zip(grads, bucketed_grads):
+      self.assertEqual(grad.cpu(), bucketed_grad.cpu())
+
+  def test_partial_bucket_is_flushed(self):
+    # A bucket larger than all gradients is only reduced at the end of the
+    # backward pass.
+    grads = self._backward(coalesce_reduce_scatter_ops=True)
+    self.assertEqual(_count_ops(grads, 'reduce-scatter'), 1)
+    self.assertTrue(all(grad is not None for grad in grads))
+
+  def test_nested_partial_buckets_are_flushed_per_unit(self):
+    # Wraps each linear layer in its own FSDP module.
+    model = FSDP(
+        _make_model(),
+        auto_wrap_policy=always_wrap_policy,
+        pin_layout_in_collective_ops=False,
+        coalesce_reduce_scatter_ops=True)
+    units = [m for m in model.modules() if isinstance(m, FSDP)][1:]
+    pending = []
+    wait_for_post_backward = model._wait_for_post_backward
+
+    def record_buckets():
+      # The gradients left in the buckets when the root finishes.
+      pending.extend(len(unit._reduce_scatter_bucket) for unit in units)
+      wait_for_post_backward()
+
+    model._wait_for_post_backward = record_buckets
+    x = torch.randn(4, 8, generator=torch.Generator().manual_seed(0))
+    model(x.to(xm.xla_device())).sum().backward()
+    self.assertEqual(pending, [0] * 4)
+    grads = [p.grad for p in model.parameters()]
+    # One reduce-scatter per unit, for its weight and bias.
+    self.assertEqual(_count_ops(grads, 'reduce-scatter'), 4)
+    unbucketed_grads = self._backward(auto_wrap_policy=always_wrap_policy)
+    for grad, unbucketed_grad in zip(grads, unbucketed_grads):
+      self.assertEqual(grad.cpu(), unbucketed_grad.cpu())
+
+  def test_invalid_bucket_size(self):
+    with self.assertRaises(ValueError):
+      FSDP(_make_model(), reduce_scatter_bucket_bytes=0)
+
+
+class FsdpPrefetchTest(test_utils.XlaTestCase):
+
+  def _wrap(self, **fsdp_kwargs):
+    # Wraps each linear layer in its own FSDP module.
+    model = FSDP(
+        _make_model(), auto_wrap_policy=always_wrap_policy, **fsdp_kwargs)
+    units = [m for m in model.modules() if isinstance(m, FSDP)]
+    return model, units
+
+  def _step(self, model):
+    x = torch.randn(4, 8, generator=torch.Generator().manual_seed(0))
+    model(x.to(xm.xla_device())).sum().backward()
+    grads = [p.grad.cpu() for p in model.parameters()]
+    model.zero_grad(set_to_none=True)
+    xm.mark_step()
+    return grads
+
+  def _gathered_on_entry(self, units, pass_name):
+    # Whether the full params of each unit are already gathered when its
+    # forward or pre-backward hook runs.
+    gathered = []
+    for unit in units[1:]:
+      if pass_name == 'forward':
+        unit.register_forward_pre_hook(
+            lambda m, args: gathered.append(m.has_full_params))
+      else:
+        # Hook the output of the wrapped module, so that the hook runs before
+        # the pre-backward hook registered by FSDP.
+        unit.module.register_forward_hook(
+            lambda _, args, out, unit=unit: out.register_hook(
+                lambda grad: gathered.append(unit.has_full_params)))
+    return gathered
+
+  def test_execution_order_recorded(self):
+    model, units = self._wrap(forward_prefetch=True)
+    self._step(model)
+    exec_order = model._exec_order
+    self.assertTrue(exec_order.forward_recorded)
+    self.assertTrue(exec_order.backward_recorded)
+    self.assertEqual(exec_order.forward, units)
+    # The hook of the last layer on the model output was registered before the
+    # hook of the root.
+    self.assertEqual(exec_order.backward,
+                     [units[-1], units[0]] + units[-2:0:-1])
+
+  def test_forward_prefetch(self):
+    model, units = self._wrap(forward_prefetch=True)
+    self._step(model)
+    gathered = self._gathered_on_entry(units, 'forward')
+    self._step(model)
+    # Each unit was prefetched while running the previous one.
+    self.assertEqual(gathered, [True] * 4)
+
+  def test_backward_prefetch(self):
+    model, units = self._wrap(backward_prefetch=True)
+    grads = self._step(model)
+    gathered = self._gathered_on_entry(units, 'backward')
+    prefetched_grads = self._step(model)
+    # The last layer runs first in the backward pass, the others are
+    # prefetched by the one running before them.
+    self.assertEqual(gathered, [False, True, True, True])
+    for grad, prefetched_grad in zip(grads, prefetched_grads):
+      self.assertEqual(grad, prefetched_grad)
+
+  def test_prefetch_memory_cap(self):
+    # Each unit has 72 params (288 bytes), none of them fits the budget.
+    model, units = self._wrap(forward_prefetch=True, prefetch_max_bytes=100)
+    self._step(model)
+    gathered = self._gathered_on_entry(units, 'forward')
+    self._step(model)
+    self.assertEqual(gathered, [False] * 4)
+
+  def test_prefetch_memory_cap_bounds_residency(self):
+    # Each unit has 72 params (288 bytes). The full params gathered ahead of
+    # the running unit, including the ones prefetched by the previous units,
+    # stay within the cap.
+    for num_units, expected in ((1, [1, 1, 1, 0]), (2, [2, 2, 1, 0])):
+      model, units = self._wrap(
+          forward_prefetch=True,
+          prefetch_limit=3,
+          prefetch_max_bytes=288 * num_units)
+      self._step(model)
+      prefetched = []
+      for unit in units[1:]:
+        # Runs after the unit has freed its own full params.
+        unit.register_forward_hook(lambda *_: prefetched.append(
+            sum(u.has_full_params for u in units[1:])))
+      self._step(model)
+      self.assertEqual(prefetched, expected)
+
+  def test_invalid_prefetch_limit(self):
+    with self.assertRaises(ValueError):
+      FSDP(_make_model(), prefetch_limit=0)
+
+
+if __name__ == '__main__':
+  test = unittest.main(exit=False)
+  sys.exit(0 if test.result.wasSuccessful() else 1)
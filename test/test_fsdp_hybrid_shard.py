@@ -0,0 +1,81 @@
+import os
+import re
+
+from absl.testing import absltest
+
+import torch
+import torch.nn as nn
+import torch_xla
+import torch_xla.core.xla_model as xm
+import torch_xla.core.xla_env_vars as xenv
+from torch_xla import runtime as xr
+from torch_xla._internal import pjrt
+from torch_xla.distributed.fsdp import XlaFullyShardedDataParallel as FSDP
+from torch_xla.distributed.fsdp import get_hybrid_shard_groups
+
+
+def _replica_groups(hlo, op_name):
+  return re.findall(rf' {op_name}\(.*replica_groups=(\{{[0-9,{{}}]*\}})', hlo)
+
+
+class TestFsdpHybridShard(absltest.TestCase):
+
+  def setUp(self):
+    xr.set_device_type('CPU')
+    os.environ.update({
+        xenv.PJRT_CPU_ASYNC_CLIENT: 'true',
+        xenv.CPU_NUM_DEVICES: '4',
+    })
+
+  def test_get_hybrid_shard_groups(self):
+    sharding_groups, replica_groups = get_hybrid_shard_groups(4, world_size=8)
+    self.assertEqual(sharding_groups, [[0, 1, 2, 3], [4, 5, 6, 7]])
+    self.assertEqual(replica_groups, [[0, 4], [1, 5], [2, 6], [3, 7]])
+    with self.assertRaises(ValueError):
+      get_hybrid_shard_groups(3, world_size=8)
+
+  @staticmethod
+  def _hybrid_backward():
+    torch.manual_seed(42)
+    model = FSDP(
+        nn.Linear(8, 8),
+        hybrid_shard_size=2,
+        pin_layout_in_collective_ops=False)
+    x = torch.randn(4, 8).to(xm.xla_device())
+    model(x).sum().backward()
+    grads = [p.grad for p in model.parameters()]
+    return {
+        'rank': model.rank,
+        'world_size': model.world_size,
+        'predivide_factor': model.gradient_predivide_factor,
+        'postdivide_factor': model.gradient_postdivide_factor,
+        'hlo': torch_xla._XLAC._get_xla_tensors_hlo(grads),
+    }
+
+  def test_hybrid_shard_collectives(self):
+    results = pjrt.run_multiprocess(self._hybrid_backward)
+    self.assertLen(results, 4)
+    for ordinal, result in results.items():
+      self.assertEqual(result['rank'], ordinal % 2)
+      self.assertEqual(result['world_size'], 2)
+      # The gradients are averaged over the 4 devices.
+      self.assertEqual(result['predivide_factor'] * result['postdivide_factor'],
+                       4)
+      # Gradients are reduce-scattered within the hosts, and the shards are
+      # all-reduced across them.
+      reduce_scatter_groups = _replica_groups(result['hlo'], 'reduce-scatter')
+      all_reduce_groups = _replica_groups(result['hlo'], 'all-reduce')
+      self.assertTrue(reduce_scatter_groups)
+      self.assertTrue(all_reduce_groups)
+      self.assertTrue(all(g == '{{0,1},{2,3}}' for g in reduce_scatter_groups))
+      self.assertTrue(all(g == '{{0,2},{1,3}}' for g in all_reduce_groups))
+
+  def test_hybrid_shard_conflicting_args(self):
+    with self.assertRaises(ValueError):
+      FSDP(nn.Linear(8, 8), hybrid_shard_size=1, sharding_groups=[[0]])
+    with self.assertRaises(ValueError):
+      FSDP(nn.Linear(8, 8), replica_groups=[[0]])
+
+
+if __name__ == '__main__':
+  absltest.main()
@@ -0,0 +1,74 @@
+import math
+import sys
+import unittest
+
+import torch
+import torch.nn as nn
+from torch_xla.distributed.fsdp import XlaFullyShardedDataParallel as FSDP
+from torch_xla.distributed.fsdp._init_utils import _init_flat_shard, _record_init_recipes
+import test_utils
+
+
+def _make_meta_model():
+  return nn.Sequential(
+      nn.Linear(300, 200, device='meta'), nn.BatchNorm1d(200, device='meta'),
+      nn.Linear(200, 10, device='meta'))
+
+
+class FsdpShardedInitTest(test_utils.XlaTestCase):
+
+  def test_slices_match_full_tensor(self):
+    recipes = _record_init_recipes(
+        nn.Linear(300, 300, device='meta'), None, check_fn=lambda m: True)
+    components = [(i, recipe, 300 * 300 if name == 'weight' else 300)
+                  for i, (name, recipe) in enumerate(recipes.values())]
+    numel = 300 * 300 + 300
+    full = _init_flat_shard(components, 0, numel + 4, torch.float32)
+    # Slices crossing the random blocks and the parameters, as with any world
+    # size.
+    for world_size in (3, 7):
+      local_size = -(-(numel + 4) // world_size)
+      shards = [
+          _init_flat_shard(components, r * local_size, (r + 1) * local_size,
+                           torch.float32) for r in range(world_size)
+      ]
+      self.assertEqual(full, torch.cat(shards)[:numel + 4])
+    bound = 1 / math.sqrt(300)
+    self.assertTrue(full[:numel].abs().max() <= bound)
+    self.assertEqual(full[numel:], torch.zeros(4))
+
+  def test_sharded_init(self):
+    torch.manual_seed(0)
+    model = FSDP(_make_meta_model(), sharded_param_init=True)
+    self.assertFalse(any(p.is_meta for p in model.parameters()))
+    self.assertFalse(any(b.is_meta for b in model.buffers()))
+    bn = model.module[1]
+    self.assertEqual(bn.running_var.cpu(), torch.ones(200))
+    self.assertEqual(bn.running_mean.cpu(), torch.zeros(200))
+
+    # The same torch seed gives the same shards.
+    torch.manual_seed(0)
+    model2 = FSDP(_make_meta_model(), sharded_param_init=True)
+    for p, p2 in zip(model.parameters(), model2.parameters()):
+      self.assertEqual(p, p2)
+
+  def test_unsupported_init(self):
+
+    def _init_fn(module):
+      for m in module.modules():
+        if isinstance(m, nn.Linear):
+          nn.init.normal_(m.weight)
+          # Writes to a part of a parameter cannot be replayed on a shard.
+          m.weight[0].fill_(1.0)
+          nn.init.zeros_(m.bias)
+
+    with self.assertRaises(ValueError):
+      FSDP(
+          nn.Sequential(nn.Linear(8, 8, device='meta')),
+          param_init_fn=_init_fn,
+          sharded_param_init=True)
+
+
+if __name__ == '__main__':
+  test = unittest.main(exit=False)
+  sys.exit(0 if test.result.wasSuccessful() else 1)
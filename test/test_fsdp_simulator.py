@@ -0,0 +1,117 @@
+import sys
+import unittest
+
+import torch
+import torch.nn as nn
+import torch_xla
+import torch_xla.core.xla_model as xm
+from torch_xla.distributed.fsdp import XlaFullyShardedDataParallel as FSDP
+from torch_xla.distributed.fsdp.simulator import (default_fsdp_configs,
+                                                  rank_fsdp_configs,
+                                                  simulate_fsdp)
+from torch_xla.distributed.fsdp.wrap import always_wrap_policy
+
+# The bytes of a parameter of a Linear(8, 8) layer padded to 4 * 128 elements.
+_PADDED_BYTES = 4 * 128 * 4
+
+
+def _make_meta_model():
+  return nn.Sequential(*[nn.Linear(8, 8, device='meta') for _ in range(4)])
+
+
+class FsdpSimulatorTest(unittest.TestCase):
+
+  def test_wrapped_units(self):
+    model = _make_meta_model()
+    sim = simulate_fsdp(model, 4, auto_wrap_policy=always_wrap_policy)
+    # One unit per layer, and the root without parameters.
+    self.assertEqual(sim.num_units, 5)
+    # Each weight and bias is gathered in the forward and backward passes.
+    self.assertEqual(sim.all_gather_ops, 16)
+    self.assertEqual(sim.reduce_scatter_ops, 8)
+    self.assertEqual(sim.reduce_scatter_bytes, 8 * _PADDED_BYTES)
+    self.assertEqual(sim.peak_full_param_bytes, 2 * _PADDED_BYTES)
+    self.assertEqual(sim.sharded_param_bytes, 2 * _PADDED_BYTES)
+    self.assertEqual(sim.padding_bytes, 8 * _PADDED_BYTES - 4 * 72 * 4)
+    # The module is not modified.
+    self.assertTrue(all(isinstance(m, nn.Linear) for m in model))
+
+  def test_options(self):
+    model = _make_meta_model()
+    sim = simulate_fsdp(
+        model, 4, auto_wrap_policy=always_wrap_policy, flatten_parameters=True)
+    self.assertEqual(sim.all_gather_ops, 8)
+    self.assertEqual(sim.reduce_scatter_ops, 4)
+    sim = simulate_fsdp(
+        model,
+        4,
+        auto_wrap_policy=always_wrap_policy,
+        coalesce_all_gather_ops=True)
+    self.assertEqual(sim.all_gather_ops, 8)
+    sim = simulate_fsdp(
+        model,
+        4,
+        auto_wrap_policy=always_wrap_policy,
+        reshard_after_forward=False)
+    self.assertEqual(sim.all_gather_ops, 8)
+    self.assertEqual(sim.peak_full_param_bytes, 8 * _PADDED_BYTES)
+    sim = simulate_fsdp(model, 4, shard_size_multiple=1)
+    self.assertEqual(sim.padding_bytes, 0)
+    # Each unit reduces its two gradients in its own partial bucket.
+    sim = simulate_fsdp(
+        model,
+        4,
+        auto_wrap_policy=always_wrap_policy,
+        coalesce_reduce_scatter_ops=True,
+        reduce_scatter_bucket_bytes=3 * _PADDED_BYTES)
+    self.assertEqual(sim.reduce_scatter_ops, 4)
+
+  def test_rank_configs(self):
+    model = _make_meta_model()
+    configs = default_fsdp_configs([None, always_wrap_policy])
+    sims = rank_fsdp_configs(model, 4, configs)
+    self.assertEqual(len(sims), len(configs))
+    # A single flat parameter in a single unit is the fewest collectives.
+    self.assertEqual(sims[0].collective_ops, 2)
+    self.assertTrue(sims[0].config['flatten_parameters'])
+    self.assertIsNone(sims[0].config['auto_wrap_policy'])
+
+    # Only the wrapped and resharded configs fit a tight budget.
+    budget = min(sim.peak_param_bytes for sim in sims)
+    sims = rank_fsdp_configs(model, 4, configs, memory_budget_bytes=budget)
+    self.assertLessEqual(sims[0].peak_param_bytes, budget)
+    self.assertIs(sims[0].config['auto_wrap_policy'], always_wrap_policy)
+    self.assertTrue(sims[0].config['reshard_after_forward'])
+
+  def _assert_matches_fsdp(self, auto_wrap_policy, bucket_bytes):
+    torch.manual_seed(42)
+    model = FSDP(
+        nn.Sequential(*[nn.Linear(8, 8) for _ in range(4)]),
+        auto_wrap_policy=auto_wrap_policy,
+        pin_layout_in_collective_ops=False,
+        coalesce_reduce_scatter_ops=True,
+        reduce_scatter_bucket_bytes=bucket_bytes)
+    model(torch.randn(4, 8).to(xm.xla_device())).sum().backward()
+    hlo = torch_xla._XLAC._get_xla_tensors_hlo(
+        [p.grad for p in model.parameters()])
+    sim = simulate_fsdp(
+        _make_meta_model(),
+        xm.xrt_world_size(),
+        auto_wrap_policy=auto_wrap_policy,
+        coalesce_reduce_scatter_ops=True,
+        reduce_scatter_bucket_bytes=bucket_bytes)
+    self.assertEqual(hlo.count(' reduce-scatter('), sim.reduce_scatter_ops)
+
+  def test_matches_fsdp(self):
+    self._assert_matches_fsdp(None, 1024)
+
+  def test_matches_wrapped_fsdp(self):
+    # The padded gradients are 512 bytes on a single device, so the buckets of
+    # three gradients of each unit are only flushed when all its gradients
+    # are in.
+    self._assert_matches_fsdp(always_wrap_policy, 1536)
+
+
+if __name__ == '__main__':
+  test = unittest.main(exit=False)
+  sys.exit(0 if test.result.wasSuccessful() else 1)
@@ -1,4 +1,5 @@
 import os
+import sys
 import time
 
 import torch
@@ -192,6 +193,56 @@ class MetricsTest(unittest.TestCase):
     # of `ExecuteComputation`, but the actual async time.
     self.assertGreater(execute_time_ns, .5 * wall_time_ns)
 
+  def _new_cache_entries(self):
+    hashes = {e['hash'] for e in met.computation_cache_entries()}
+    xm.mark_step()
+    return [
+        e for e in met.computation_cache_entries() if e['hash'] not in hashes
+    ]
+
+  def test_computation_cache_entries(self):
+    xla_device = xm.xla_device()
+    t1 = torch.randn(7, 3, device=xla_device)
+    xm.mark_step()
+    t2 = t1 * 3 + 1
+    new_entries = self._new_cache_entries()
+    self.assertEqual(len(new_entries), 1)
+    graph_hash = new_entries[0]['hash']
+    entries = {e['hash']: e for e in met.computation_cache_entries()}
+    self.assertIn(graph_hash, entries)
+    self.assertGreater(entries[graph_hash]['size_bytes'], 0)
+    self.assertFalse(entries[graph_hash]['pinned'])
+
+    # Running the same graph again is a cache hit.
+    t3 = t1 * 3 + 1
+    xm.mark_step()
+    entry = [
+        e for e in met.computation_cache_entries() if e['hash'] == graph_hash
+    ][0]
+    self.assertGreaterEqual(entry['hits'], 1)
+    self.assertGreaterEqual(entry['last_use'], entries[graph_hash]['last_use'])
+
+    stats = met.computation_cache_stats()
+    self.assertGreaterEqual(stats['num_entries'], 1)
+    self.assertGreaterEqual(stats['total_bytes'], entry['size_bytes'])
+    self.assertGreaterEqual(stats['hits'], 1)
+
+  def test_pin_computation(self):
+    xla_device = xm.xla_device()
+    t1 = torch.randn(5, 9, device=xla_device)
+    xm.mark_step()
+    t2 = t1 - 2
+    new_entries = self._new_cache_entries()
+    self.assertEqual(len(new_entries), 1)
+    graph_hash = new_entries[0]['hash']
+    self.assertTrue(met.pin_computation(graph_hash))
+    entry = [
+        e for e in met.computation_cache_entries() if e['hash'] == graph_hash
+    ][0]
+    self.assertTrue(entry['pinned'])
+    self.assertTrue(met.pin_computation(graph_hash, pinned=False))
+    self.assertFalse(met.pin_computation('00' * 16))
+
 
 if __name__ == '__main__':
   test = unittest.main()
@@ -4,10 +4,12 @@ import functools
 import os
 import sys
 import tempfile
+import time
 
 import torch
 import torch_xla.core.xla_model as xm
 import torch_xla.debug.metrics as met
+import torch_xla.debug.persistent_cache as pcache
 import torch_xla.distributed.spmd as xs
 import torch_xla.distributed.xla_multiprocessing as xmp
 import torch_xla.runtime as xr
@@ -151,6 +153,52 @@ class PersistentCacheTest(parameterized.TestCase):
     }))
 
 
+class PersistentCacheManagementTest(absltest.TestCase):
+
+  def _make_entries(self, tmpdir, sizes):
+    now = time.time()
+    for i, size in enumerate(sizes):
+      path = os.path.join(tmpdir, f'hash{i}')
+      with open(path, 'wb') as f:
+        f.write(b'x' * size)
+      # Entry i was last accessed i hours ago.
+      os.utime(path, (now - i * 3600, now - i * 3600))
+
+  @run_with_tmpdir
+  def test_list_entries(self, tmpdir):
+    self._make_entries(tmpdir, [10, 20, 30])
+    # In flight writes are not part of the cache.
+    with open(os.path.join(tmpdir, '.tmp-hash3-1-1'), 'wb') as f:
+      f.write(b'x' * 40)
+    entries = pcache.list_entries(tmpdir)
+    self.assertEqual([e.name for e in entries], ['hash0', 'hash1', 'hash2'])
+    self.assertEqual([e.size_bytes for e in entries], [10, 20, 30])
+    stats = pcache.cache_stats(tmpdir)
+    self.assertEqual(stats['num_entries'], 3)
+    self.assertEqual(stats['total_bytes'], 60)
+
+  @run_with_tmpdir
+  def test_prune_max_bytes(self, tmpdir):
+    self._make_entries(tmpdir, [10, 20, 30])
+    removed = pcache.prune(tmpdir, max_bytes=35, dry_run=True)
+    self.assertEqual([e.name for e in removed], ['hash2'])
+    self.assertEqual(len(pcache.list_entries(tmpdir)), 3)
+    removed = pcache.prune(tmpdir, max_bytes=25)
+    self.assertEqual([e.name for e in removed], ['hash2', 'hash1'])
+    self.assertEqual([e.name for e in pcache.list_entries(tmpdir)], ['hash0'])
+
+  @run_with_tmpdir
+  def test_prune_max_age(self, tmpdir):
+    self._make_entries(tmpdir, [10, 20, 30])
+    removed = pcache.prune(tmpdir, max_age=1.5 * 3600)
+    self.assertEqual([e.name for e in removed], ['hash2'])
+
+  def test_parse_size(self):
+    self.assertEqual(pcache._parse_size('1024'), 1024)
+    self.assertEqual(pcache._parse_size('2K'), 2048)
+    self.assertEqual(pcache._parse_size('1.5GB'), int(1.5 * (1 << 30)))
+
+
 if __name__ == '__main__':
   test = absltest.main()
   sys.exit(0 if test.result.wasSuccessful() else 1)
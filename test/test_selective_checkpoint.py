@@ -0,0 +1,73 @@
+import sys
+import unittest
+
+import torch
+import torch.nn as nn
+import torch_xla
+import torch_xla.core.xla_model as xm
+from torch_xla.distributed.fsdp import checkpoint_module
+from torch_xla.utils.checkpoint import checkpoint, flops_per_byte_policy
+import test_utils
+
+
+def _make_model():
+  torch.manual_seed(42)
+  return nn.Sequential(
+      nn.Linear(16, 64), nn.GELU(), nn.Linear(64, 16), nn.LayerNorm(16))
+
+
+class SelectiveCheckpointTest(test_utils.XlaTestCase):
+
+  def _grads(self, model):
+    x = torch.randn(8, 16, generator=torch.Generator().manual_seed(0))
+    x = x.to(xm.xla_device()).requires_grad_()
+    model(x).sum().backward()
+    return [x.grad] + [p.grad for p in model.parameters()]
+
+  def test_flops_per_byte_policy(self):
+    device = xm.xla_device()
+    a = torch.randn(64, 64, device=device)
+    b = torch.randn(64, 64, device=device)
+    aten = torch.ops.aten
+    self.assertTrue(flops_per_byte_policy(aten.mm.default, (a, b), {}, a @ b))
+    self.assertFalse(flops_per_byte_policy(aten.add.Tensor, (a, b), {}, a + b))
+    # A 64x64 matmul takes 32 FLOPs per output byte.
+    self.assertFalse(
+        flops_per_byte_policy(
+            aten.mm.default, (a, b), {}, a @ b, min_flops_per_byte=64))
+    self.assertTrue(
+        flops_per_byte_policy(aten.rand_like.default, (a,), {},
+                              torch.rand_like(a)))
+
+  def test_grads_match(self):
+    device = xm.xla_device()
+    grads = self._grads(_make_model().to(device))
+    for policy in (flops_per_byte_policy, lambda *args: True,
+                   lambda *args: False):
+      model = checkpoint_module(_make_model().to(device), policy=policy)
+      for grad, checkpointed_grad in zip(grads, self._grads(model)):
+        self.assertEqual(grad, checkpointed_grad)
+
+  def test_saved_outputs(self):
+    device = xm.xla_device()
+    saved_ops = []
+
+    def _policy(func, args, kwargs, outputs):
+      save = flops_per_byte_policy(func, args, kwargs, outputs)
+      if save:
+        saved_ops.append(func.overloadpacket.__name__)
+      return save
+
+    model = _make_model().to(device)
+    x = torch.randn(8, 16, device=device, requires_grad=True)
+    out = checkpoint(model, x, policy=_policy)
+    # Only the outputs of the two linear layers are saved.
+    self.assertEqual(saved_ops, ['addmm', 'addmm'])
+    out.sum().backward()
+    hlo = torch_xla._XLAC._get_xla_tensors_hlo([x.grad])
+    self.assertIn('opt-barrier', hlo)
+
+
+if __name__ == '__main__':
+  test = unittest.main(exit=False)
+  sys.exit(0 if test.result.wasSuccessful() else 1)
@@ -1,4 +1,5 @@
 import argparse
+import functools
 import sys
 
 parser = argparse.ArgumentParser(add_help=False)
@@ -9,6 +10,7 @@ sys.argv = [sys.argv[0]] + leftovers
 import torch
 import torch.nn as nn
 import torch.nn.functional as F
+import torch_xla
 import torch_xla.core.xla_model as xm
 import unittest
 import numpy as np
@@ -187,6 +189,74 @@ class TestSyncFreeAdam(TestSyncFreeOptimizerBase):
     self._test_adam_optimizer_helper(syncfree.Adam, torch.optim.Adam)
     self._test_adam_optimizer_helper(syncfree.AdamW, torch.optim.AdamW)
 
+  def _test_flatten_state_helper(self, optim_cls, found_inf):
+    device = xm.xla_device()
+    data = torch.rand(32, 1, 28, 28).to(device)
+    models = []
+    for flatten_state in (True, False):
+      torch.manual_seed(0)
+      model = MNIST().train().to(device)
+      optimizer = optim_cls(
+          model.parameters(), lr=1e-3, flatten_state=flatten_state)
+      step_found_inf = found_inf
+      if step_found_inf is None and not flatten_state:
+        # The per-parameter states need a found_inf tensor to take the
+        # syncfree path, which runs the same fused op as the flat states.
+        step_found_inf = torch.zeros((), device=device)
+      for _ in range(3):
+        optimizer.zero_grad()
+        model(data).sum().backward()
+        optimizer.step(found_inf=step_found_inf)
+        xm.mark_step()
+      models.append((model, optimizer))
+    (model, optimizer), (ref_model, _) = models
+    # The states of all the parameters are kept under the first one.
+    self.assertEqual(len(optimizer.state), 1)
+    for p, p_ref in zip(model.parameters(), ref_model.parameters()):
+      np.testing.assert_allclose(
+          p.cpu().detach().numpy(),
+          p_ref.cpu().detach().numpy(),
+          rtol=1e-6,
+          atol=1e-6)
+
+  def test_flatten_state_adam_optimizer(self):
+    self._test_adam_optimizer_helper(
+        functools.partial(syncfree.Adam, flatten_state=True), torch.optim.Adam)
+    self._test_adam_optimizer_helper(
+        functools.partial(syncfree.AdamW, flatten_state=True),
+        torch.optim.AdamW)
+    # The flat states run the same update as the per-parameter ones.
+    found_inf = torch.zeros((), device=xm.xla_device())
+    self._test_flatten_state_helper(syncfree.Adam, found_inf)
+    self._test_flatten_state_helper(syncfree.AdamW, found_inf)
+
+  def test_flatten_state_single_param(self):
+    # A single parameter, e.g. a flat ZeRO shard, is updated in place.
+    device = xm.xla_device()
+    found_inf = torch.zeros((), device=device)
+    params = []
+    for flatten_state in (True, False):
+      torch.manual_seed(0)
+      param = nn.Parameter(torch.randn(64).to(device))
+      optimizer = syncfree.Adam([param], lr=1e-3, flatten_state=flatten_state)
+      for _ in range(3):
+        optimizer.zero_grad()
+        (param * param).sum().backward()
+        optimizer.step(found_inf=found_inf)
+        hlo = torch_xla._XLAC._get_xla_tensors_hlo([param])
+        self.assertNotIn(' concatenate(', hlo)
+        xm.mark_step()
+      params.append(param)
+    np.testing.assert_allclose(
+        params[0].cpu().detach().numpy(),
+        params[1].cpu().detach().numpy(),
+        rtol=1e-6,
+        atol=1e-6)
+
+  def test_flatten_state_without_found_inf(self):
+    self._test_flatten_state_helper(syncfree.Adam, None)
+    self._test_flatten_state_helper(syncfree.AdamW, None)
+
 
 if __name__ == "__main__":
   test = unittest.main(verbosity=FLAGS.verbosity, exit=False)
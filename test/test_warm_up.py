@@ -0,0 +1,74 @@
+import os
+import sys
+import tempfile
+import unittest
+
+import torch
+import torch_xla.core.xla_model as xm
+import torch_xla.debug.metrics as met
+from torch_xla.experimental import warm_up
+
+
+class WarmUpCacheTest(unittest.TestCase):
+
+  def _model(self):
+    torch.manual_seed(42)
+    return torch.nn.Sequential(
+        torch.nn.Linear(16, 32), torch.nn.ReLU(),
+        torch.nn.Linear(32, 4)).to(xm.xla_device())
+
+  def test_record_and_load_manifest(self):
+    model = self._model()
+    recorder = warm_up.InputSignatureRecorder()
+    handle = recorder.attach(model)
+    device = xm.xla_device()
+    for batch_size in (1, 8, 8, 2):
+      model(torch.randn(batch_size, 16, device=device))
+    handle.remove()
+    xm.mark_step()
+    # Duplicated signatures are recorded once.
+    self.assertEqual(len(recorder.signatures), 3)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+      path = os.path.join(tmpdir, 'manifest.json')
+      recorder.save(path)
+      signatures = warm_up.load_manifest(path)
+    self.assertEqual(signatures, recorder.signatures)
+    self.assertEqual(signatures[0], [{'shape': [1, 16], 'dtype': 'float32'}])
+
+  def test_warm_up_cache(self):
+    model = self._model()
+    signatures = [[{
+        'shape': [batch_size, 16],
+        'dtype': 'float32'
+    }] for batch_size in (3, 5, 7)]
+    results = warm_up.warm_up_cache(model, signatures, num_threads=2)
+    self.assertEqual(len(results), 3)
+    self.assertEqual(len({r.graph_hash for r in results}), 3)
+    self.assertFalse(any(r.cache_hit for r in results))
+    self.assertTrue(all(r.compile_time > 0 for r in results))
+
+    # A second warm up finds every graph in the cache.
+    results = warm_up.warm_up_cache(model, signatures)
+    self.assertTrue(all(r.cache_hit for r in results))
+
+    # Running the model with a warmed up shape does not compile.
+    met.clear_all()
+    x = torch.randn(5, 16)
+    output = model(x.to(xm.xla_device()))
+    xm.mark_step()
+    self.assertEqual(met.metric_data('CompileTime'), None)
+    self.assertEqual(output.cpu().shape, (5, 4))
+
+  def test_warm_up_preserves_state(self):
+    device = xm.xla_device()
+    model = torch.nn.BatchNorm1d(8).to(device)
+    model.train()
+    running_mean = model.running_mean.cpu()
+    warm_up.warm_up_cache(model, [[{'shape': [4, 8], 'dtype': 'float32'}]])
+    self.assertTrue(torch.allclose(model.running_mean.cpu(), running_mean))
+
+
+if __name__ == '__main__':
+  test = unittest.main()
+  sys.exit(0 if test.result.wasSuccessful() else 1)
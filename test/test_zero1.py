@@ -59,6 +59,138 @@ class XlaZeRO1Test(TestCase):
     opt1.step()
     opt2.step()
 
+  def _train(self, steps, **zero_kwargs):
+    device = xm.xla_device()
+    torch.manual_seed(42)
+    model = nn.Sequential(nn.Linear(8, 8), nn.Linear(8, 8)).to(device)
+    x = torch.ones((8, 8), device=device)
+    opt = ZeroRedundancyOptimizer(
+        model.parameters(),
+        torch.optim.SGD,
+        lr=0.01,
+        momentum=0.9,
+        grad_clipping=False,
+        **zero_kwargs)
+    if opt.defer_all_gather:
+      opt.register_all_gather_hooks(model)
+    for _ in range(steps):
+      opt.zero_grad()
+      model(x).sum().backward()
+      opt.step()
+      xm.mark_step()
+    return model, opt
+
+  @unittest.skipIf(xr.device_type() == 'TPU', "Crash on TPU")
+  @unittest.skipIf(xr.device_type() == 'CUDA', "Crash on CUDA")
+  def test_zero1_coalesced(self):
+    model1, _ = self._train(3, pin_layout=False)
+    # One parameter per bucket, and all parameters in one bucket.
+    for bucket_cap_bytes in (1, 1 << 20):
+      model2, _ = self._train(
+          3,
+          pin_layout=False,
+          coalesce_cc=True,
+          bucket_cap_bytes=bucket_cap_bytes)
+      for p1, p2 in zip(model1.parameters(), model2.parameters()):
+        self.assertEqual(p1, p2)
+
+    with self.assertRaises(ValueError):
+      self._train(1, coalesce_cc=True)
+
+  @unittest.skipIf(xr.device_type() == 'TPU', "Crash on TPU")
+  @unittest.skipIf(xr.device_type() == 'CUDA', "Crash on CUDA")
+  def test_zero1_defer_all_gather(self):
+    model1, _ = self._train(3)
+    model2, opt2 = self._train(3, defer_all_gather=True)
+    # The parameters updated by the last step are not gathered yet.
+    self.assertEqual(len(opt2._pending_all_gather), 4)
+    opt2.all_gather_params()
+    self.assertEqual(len(opt2._pending_all_gather), 0)
+    for p1, p2 in zip(model1.parameters(), model2.parameters()):
+      self.assertEqual(p1, p2)
+
+  @unittest.skipIf(xr.device_type() == 'TPU', "Crash on TPU")
+  @unittest.skipIf(xr.device_type() == 'CUDA', "Crash on CUDA")
+  def test_zero1_all_gather_hooks_cover_all_params(self):
+    device = xm.xla_device()
+    model = nn.Sequential(nn.Linear(8, 8), nn.Linear(8, 8)).to(device)
+    # A tied parameter is gathered by the hook of the root module.
+    model[1].weight = model[0].weight
+    opt = ZeroRedundancyOptimizer(
+        model.parameters(),
+        torch.optim.SGD,
+        lr=0.01,
+        grad_clipping=False,
+        defer_all_gather=True)
+    # No hook of model[0] would gather the parameters of model[1].
+    with self.assertRaises(ValueError):
+      opt.register_all_gather_hooks(model[0])
+    handles = opt.register_all_gather_hooks(model)
+    self.assertEqual(len(handles), 3)
+
+    x = torch.ones((8, 8), device=device)
+    model(x).sum().backward()
+    opt.step()
+    self.assertIn(id(model[0].weight), opt._pending_all_gather)
+    # The root hook gathers the tied weight before any submodule hook runs.
+    model[0].register_forward_pre_hook(
+        lambda m, args: self.assertNotIn(
+            id(model[0].weight), opt._pending_all_gather),
+        prepend=True)
+    model(x)
+    self.assertEqual(len(opt._pending_all_gather), 0)
+
+  @unittest.skipIf(xr.device_type() == 'TPU', "Crash on TPU")
+  @unittest.skipIf(xr.device_type() == 'CUDA', "Crash on CUDA")
+  def test_zero1_defer_all_gather_requires_hooks(self):
+    device = xm.xla_device()
+    model = nn.Linear(8, 8).to(device)
+    opt = ZeroRedundancyOptimizer(
+        model.parameters(),
+        torch.optim.SGD,
+        lr=0.01,
+        grad_clipping=False,
+        defer_all_gather=True)
+    model(torch.ones((8, 8), device=device)).sum().backward()
+    # Nothing would gather the updated parameters before the next forward.
+    with self.assertRaises(RuntimeError):
+      opt.step()
+    opt.register_all_gather_hooks(model)
+    opt.step()
+    self.assertEqual(len(opt._pending_all_gather), 2)
+
+  @unittest.skipIf(xr.device_type() == 'TPU', "Crash on TPU")
+  @unittest.skipIf(xr.device_type() == 'CUDA', "Crash on CUDA")
+  def test_zero1_flatten_shards(self):
+    model1, _ = self._train(3)
+    model2, opt2 = self._train(3, flatten_shards=True)
+    # A single flat shard per param group.
+    self.assertEqual(len(opt2.base_optimizer.param_groups[0]['params']), 1)
+    for p1, p2 in zip(model1.parameters(), model2.parameters()):
+      self.assertEqual(p1, p2)
+
+    with self.assertRaises(ValueError):
+      self._train(1, flatten_shards=True, defer_all_gather=True)
+
+  @unittest.skipIf(xr.device_type() == 'TPU', "Crash on TPU")
+  @unittest.skipIf(xr.device_type() == 'CUDA', "Crash on CUDA")
+  def test_zero1_offload_optimizer_state(self):
+    model1, opt1 = self._train(3)
+    # One parameter per bucket, and all parameters in one bucket.
+    for bucket_cap_bytes in (1, 1 << 20):
+      model2, opt2 = self._train(
+          3, offload_optimizer_state=True, bucket_cap_bytes=bucket_cap_bytes)
+      for p1, p2 in zip(model1.parameters(), model2.parameters()):
+        self.assertEqual(p1, p2)
+      # The momentum buffers live on the host.
+      for state in opt2.state_dict()['base_state'].values():
+        self.assertEqual(state['momentum_buffer'].device.type, 'cpu')
+
+    model3, _ = self._train(
+        3, flatten_shards=True, offload_optimizer_state=True)
+    for p1, p3 in zip(model1.parameters(), model3.parameters()):
+      self.assertEqual(p1, p3)
+
 
 if __name__ == '__main__':
   test = unittest.main()
@@ -1,7 +1,7 @@
 import torch
 from torch import Tensor
 import torch_xla
-from typing import List, Optional
+from typing import Dict, List, Optional
 
 
 def adam_step(found_inf: Tensor, state_steps: List[Tensor],
@@ -25,6 +25,60 @@ def adam_step(found_inf: Tensor, state_steps: List[Tensor],
                                               maximize, use_adamw)
 
 
+def flat_adam_step(found_inf: Optional[Tensor], state: Dict[str, Tensor],
+                   params: List[Tensor], *, amsgrad: bool, beta1: float,
+                   beta2: float, lr: float, weight_decay: float, eps: float,
+                   maximize: bool, use_adamw: bool):
+  r"""Functional API that performs PT-XLA sync-free Adam/AdamW algorithm computation
+  as a single fused update of all `params`, flattened and concatenated.
+
+  The step and the moments of all `params` are kept in `state` as flat
+  buffers. Every parameter in `params` must have a gradient. The parameters
+  and the gradients are concatenated, and the updated parameters copied back,
+  on every step. These ops are part of the same graph as the update, where XLA
+  fuses them, but they need temporary buffers of the size of `params`. A
+  single parameter, e.g. the flat shard of `ZeroRedundancyOptimizer` with
+  `flatten_shards=True`, is updated in place instead, with moments of its
+  shape.
+  """
+  if any(p.grad is None for p in params):
+    raise RuntimeError(
+        'Flattened optimizer states require all parameters of a param group to have gradients'
+    )
+  if len({p.dtype for p in params}) > 1:
+    raise RuntimeError(
+        'Flattened optimizer states require all parameters of a param group to have the same dtype'
+    )
+  if len(params) == 1:
+    flat_param, flat_grad = params[0], params[0].grad
+  else:
+    flat_param = torch.cat([p.detach().reshape(-1) for p in params])
+    flat_grad = torch.cat([p.grad.reshape(-1) for p in params])
+  if found_inf is None:
+    found_inf = torch.zeros((), dtype=torch.float, device=flat_param.device)
+
+  # Lazy state initialization
+  if not state:
+    state['step'] = torch.zeros_like(found_inf)
+    state['exp_avg'] = torch.zeros_like(flat_param)
+    state['exp_avg_sq'] = torch.zeros_like(flat_param)
+    if amsgrad:
+      state['max_exp_avg_sq'] = torch.zeros_like(flat_param)
+    else:
+      state['max_exp_avg_sq'] = torch.empty(
+          0, dtype=torch.float, device=flat_param.device)
+
+  torch_xla._XLAC._xla_adam_optimizer_step_(
+      found_inf, state['step'], flat_param, flat_grad, state['exp_avg'],
+      state['exp_avg_sq'], state['max_exp_avg_sq'], beta1, beta2, lr,
+      weight_decay, eps, amsgrad, maximize, use_adamw)
+
+  if len(params) > 1:
+    updated_params = torch.split(flat_param, [p.numel() for p in params])
+    for p, updated in zip(params, updated_params):
+      p.copy_(updated.view_as(p))
+
+
 def sgd_step(found_inf: Tensor, state_steps: List[Tensor], params: List[Tensor],
              d_p_list: List[Tensor],
              momentum_buffer_list: List[Optional[Tensor]], *,
@@ -29,6 +29,17 @@ class AdamW(torch.optim.AdamW):
             (default: False)
         maximize (bool, optional): maximize the params based on the objective, instead of
             minimizing (default: False)
+        flatten_state (bool, optional): keep the optimizer states of each
+            parameter group in flat buffers, and update all the parameters of
+            a group with a single fused step. This reduces the number of ops
+            in the graph for models with many parameters. All the parameters
+            of a group must have the same dtype, and must all have gradients
+            in a step, if any has one. The parameters and gradients of a
+            group are concatenated on every step, which needs temporary
+            buffers of the size of the group, except for a group with a
+            single parameter, which is updated in place. The states of a
+            group are saved under its first parameter in the state dict
+            (default: False)
 
     .. _Decoupled Weight Decay Regularization:
         https://arxiv.org/abs/1711.05101
@@ -36,6 +47,10 @@ class AdamW(torch.optim.AdamW):
         https://openreview.net/forum?id=ryQu7f-RZ
   """
 
+  def __init__(self, params, *args, flatten_state: bool = False, **kwargs):
+    super(AdamW, self).__init__(params, *args, **kwargs)
+    self.flatten_state = flatten_state
+
   @torch.no_grad()
   def step(self, closure=None, found_inf: Tensor = None):
     """Performs a single optimization step.
@@ -48,9 +63,9 @@ class AdamW(torch.optim.AdamW):
                 skipped (found_inf == 1).
         """
     if found_inf is None:
-      return super(AdamW, self).step(closure=closure)
-
-    if found_inf.shape:
+      if not self.flatten_state:
+        return super(AdamW, self).step(closure=closure)
+    elif found_inf.shape:
       raise ValueError("The found_inf tensor has to be scalar type")
 
     loss = None
@@ -59,6 +74,24 @@ class AdamW(torch.optim.AdamW):
         loss = closure()
 
     for group in self.param_groups:
+      if self.flatten_state:
+        if all(p.grad is None for p in group['params']):
+          continue
+        beta1, beta2 = group['betas']
+        F.flat_adam_step(
+            found_inf,
+            self.state[group['params'][0]],
+            group['params'],
+            amsgrad=group['amsgrad'],
+            beta1=beta1,
+            beta2=beta2,
+            lr=group['lr'],
+            weight_decay=group['weight_decay'],
+            eps=group['eps'],
+            maximize=group['maximize'],
+            use_adamw=True)
+        continue
+
       params_with_grad = []
       grads = []
       exp_avgs = []
@@ -1,13 +1,17 @@
+import collections
 import copy
 import dataclasses
+import json
 import operator
 import warnings
 
 import functools
 import itertools
 import os
+import threading
 import time
-from typing import Any, Dict, List, Set, Tuple
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, List, Optional, Set, Tuple
 
 import torch
 from torch.fx.passes.infra.partitioner import CapabilityBasedPartitioner
@@ -71,6 +75,208 @@ class GraphInputMatcher:
     return real_input
 
 
+class AsyncCompiler:
+  """
+  Compiles dynamo graphs on a background thread pool. The graph is traced and
+  captured synchronously by `_xla_prepare_warm_up_cache`, only the lowering and
+  the XLA compilation happen on the worker threads. Until the compilation of a
+  graph finishes, calls to it run eagerly on CPU instead, see `CPUFallback`.
+  """
+
+  def __init__(self, max_workers: int):
+    self._executor = ThreadPoolExecutor(
+        max_workers=max_workers, thread_name_prefix='xla_dynamo_compile')
+    self._lock = threading.Lock()
+    self._pending = 0
+    self._completed = 0
+    self._failed = 0
+    self._fallback_executions = 0
+    self._futures = set()
+
+  def submit(self, compile_fn: Callable[[], bool]) -> Future:
+    # Register the future before `_on_done` can run on a worker thread, which
+    # keeps `wait` from missing it and `_on_done` from discarding it too early.
+    with self._lock:
+      self._pending += 1
+      future = self._executor.submit(compile_fn)
+      self._futures.add(future)
+    future.add_done_callback(self._on_done)
+    return future
+
+  def _on_done(self, future: Future):
+    with self._lock:
+      self._pending -= 1
+      self._futures.discard(future)
+      if future.exception() is not None:
+        self._failed += 1
+      else:
+        self._completed += 1
+
+  def record_fallback(self):
+    with self._lock:
+      self._fallback_executions += 1
+
+  def wait(self, timeout: Optional[float] = None):
+    """Blocks until all the compilations submitted so far have finished."""
+    with self._lock:
+      futures = list(self._futures)
+    for future in futures:
+      future.exception(timeout=timeout)
+
+  def stats(self) -> Dict[str, int]:
+    with self._lock:
+      return {
+          'pending_compiles': self._pending,
+          'completed_compiles': self._completed,
+          'failed_compiles': self._failed,
+          'fallback_executions': self._fallback_executions,
+      }
+
+
+_async_compiler = None
+_async_compiler_lock = threading.Lock()
+
+
+def _get_async_compiler() -> AsyncCompiler:
+  global _async_compiler
+  with _async_compiler_lock:
+    if _async_compiler is None:
+      _async_compiler = AsyncCompiler(
+          xu.getenv_as('XLA_DYNAMO_ASYNC_COMPILE_THREADS', int, 1))
+    return _async_compiler
+
+
+def async_compile_enabled() -> bool:
+  return xu.getenv_as('XLA_DYNAMO_ASYNC_COMPILE', bool, False)
+
+
+def async_compile_stats() -> Dict[str, int]:
+  """
+  Returns the counters of the dynamo background compilation: the number of
+  pending, completed and failed compilations, and the number of calls which
+  were served by the lazy tensor fallback while their graph was compiling.
+  """
+  return _get_async_compiler().stats()
+
+
+def wait_async_compiles(timeout: Optional[float] = None):
+  """Blocks until all the pending dynamo background compilations finish."""
+  _get_async_compiler().wait(timeout=timeout)
+
+
+@dataclasses.dataclass
+class PartitionReport:
+  """
+  Statistics of one XLA partition of a dynamo FX graph. Times are in seconds.
+  `trace_time` and `compile_time` accumulate over the retraces caused by input
+  sharding changes, which are counted by `num_retraces`.
+  """
+  name: str
+  num_nodes: int
+  graph_hash: Optional[str] = None
+  trace_time: float = 0.0
+  compile_time: float = 0.0
+  num_retraces: int = 0
+  run_count: int = 0
+  total_run_time: float = 0.0
+  # Calls run eagerly on CPU while compiling in the background.
+  fallback_count: int = 0
+
+  @property
+  def avg_run_time(self) -> float:
+    return self.total_run_time / self.run_count if self.run_count else 0.0
+
+
+@dataclasses.dataclass
+class GraphReport:
+  """
+  Statistics of one FX graph handed to the bridge by dynamo. Every graph break
+  and every dynamo recompilation produces a new graph. `unsupported_nodes`
+  maps the nodes which split the graph into several partitions, because they
+  fall back to CPU or don't produce XLA tensors, to the reason why.
+  """
+  graph_id: int
+  num_nodes: int
+  partition_time: float = 0.0
+  unsupported_nodes: Dict[str, str] = dataclasses.field(default_factory=dict)
+  partitions: List[PartitionReport] = dataclasses.field(default_factory=list)
+
+
+# Only the reports of the most recent graphs are kept, so that a long running
+# process which keeps recompiling does not grow them without bound.
+_graph_reports: Deque[GraphReport] = collections.deque(
+    maxlen=xu.getenv_as('XLA_DYNAMO_MAX_GRAPH_REPORTS', int, 1000))
+_graph_reports_lock = threading.Lock()
+_next_graph_id = 0
+
+
+def _new_graph_report(num_nodes: int) -> GraphReport:
+  global _next_graph_id
+  with _graph_reports_lock:
+    report = GraphReport(graph_id=_next_graph_id, num_nodes=num_nodes)
+    _next_graph_id += 1
+    _graph_reports.append(report)
+    return report
+
+
+def get_graph_reports() -> List[GraphReport]:
+  """
+  Returns the report of the FX graphs compiled by the bridge since the last
+  `clear_graph_reports`, in compilation order. Only the last
+  `XLA_DYNAMO_MAX_GRAPH_REPORTS` graphs (1000 by default) are kept.
+  """
+  with _graph_reports_lock:
+    return list(_graph_reports)
+
+
+def clear_graph_reports():
+  global _next_graph_id
+  with _graph_reports_lock:
+    _graph_reports.clear()
+    _next_graph_id = 0
+
+
+def graph_reports_json(indent: Optional[int] = 2) -> str:
+  """Exports the graph reports as JSON."""
+  reports = []
+  for report in get_graph_reports():
+    report_dict = dataclasses.asdict(report)
+    for partition_dict, partition in zip(report_dict['partitions'],
+                                         report.partitions):
+      partition_dict['avg_run_time'] = partition.avg_run_time
+    reports.append(report_dict)
+  return json.dumps(reports, indent=indent)
+
+
+def graph_reports_table() -> str:
+  """Renders the graph reports as a text table, with times in milliseconds."""
+  header = ('graph', 'partition', 'nodes', 'trace ms', 'compile ms', 'retraces',
+            'runs', 'avg run ms', 'fallbacks')
+  rows = []
+  notes = []
+  for report in get_graph_reports():
+    for partition in report.partitions:
+      rows.append(
+          (str(report.graph_id), partition.name, str(partition.num_nodes),
+           f'{partition.trace_time * 1e3:.2f}',
+           f'{partition.compile_time * 1e3:.2f}', str(partition.num_retraces),
+           str(partition.run_count), f'{partition.avg_run_time * 1e3:.3f}',
+           str(partition.fallback_count)))
+    for node, reason in report.unsupported_nodes.items():
+      notes.append(
+          f'graph {report.graph_id}: {node} split the graph ({reason})')
+  widths = [
+      max(len(row[i]) for row in [header] + rows) for i in range(len(header))
+  ]
+  lines = [
+      '  '.join(cell.rjust(w)
+                for cell, w in zip(row, widths))
+      for row in [header] + rows
+  ]
+  lines.insert(1, '  '.join('-' * w for w in widths))
+  return '\n'.join(lines + notes)
+
+
 def get_fallback_ops():
   fallback_ops = []
   for opname in metrics.counter_names():
@@ -210,7 +416,9 @@ def is_xla_tensor(tensor: torch.Tensor) -> bool:
   return tensor.device.type == "xla"
 
 
-def extract_graph_helper(xla_model: torch.fx.GraphModule):
+def extract_graph_helper(xla_model: torch.fx.GraphModule,
+                         report: Optional[PartitionReport] = None):
+  trace_start = time.perf_counter()
   xla_args = xla_model.xla_args
   assert all(
       map(
@@ -306,8 +514,22 @@ def extract_graph_helper(xla_model: torch.fx.GraphModule):
                                           graph_input_tensor_ids,
                                           graph_input_xla_values)
 
+  if report is not None:
+    report.graph_hash = graph_hash.hex()
+    report.trace_time += time.perf_counter() - trace_start
+
   # compiles and cache graph rooted at tensors in 'args_and_out'
-  torch_xla._XLAC._xla_warm_up_cache(args_and_out, [])
+  if async_compile_enabled():
+    compile_fn = torch_xla._XLAC._xla_prepare_warm_up_cache(args_and_out, [])
+    if report is not None:
+      compile_fn = _timed_compile_fn(compile_fn, report)
+    compile_future = _get_async_compiler().submit(compile_fn)
+  else:
+    compile_start = time.perf_counter()
+    torch_xla._XLAC._xla_warm_up_cache(args_and_out, [])
+    if report is not None:
+      report.compile_time += time.perf_counter() - compile_start
+    compile_future = None
 
   # Restore the origional `xla_args`. Dynamo passed the real tensor as
   # `xla_args`` and we performend the tracing on them. During the tracing,
@@ -327,10 +549,78 @@ def extract_graph_helper(xla_model: torch.fx.GraphModule):
   torch_xla._XLAC._clear_pending_irs(str(xm.xla_device()))
   return (xla_args_sharding_spec, args_and_out, graph_hash,
           arg_index_to_need_update_index, none_remover, graph_input_matcher,
-          dumb_return_handler, xla_args_need_update)
+          dumb_return_handler, xla_args_need_update, compile_future)
 
 
-def extract_internal(xla_model: torch.fx.GraphModule):
+class CPUFallback:
+  """
+  Runs a traced graph eagerly on CPU, while its XLA executable is compiled in
+  the background. Running it lazily instead would leave pending IR on the
+  arguments, which the next `mark_step` compiles synchronously under another
+  hash. The graph constants are copied to CPU once, the arguments are copied
+  on every call and the results are transferred back to the XLA device, so no
+  XLA compilation happens on the calling thread.
+  """
+
+  def __init__(self, xla_model: torch.fx.GraphModule):
+    self._xla_model = xla_model
+    self._cpu_model = None
+
+  @staticmethod
+  def _to_cpu_device(value):
+    if isinstance(value, torch.device) and value.type == 'xla':
+      return torch.device('cpu')
+    return value
+
+  def _build_cpu_model(self) -> torch.fx.GraphModule:
+    graph = copy.deepcopy(self._xla_model.graph)
+    attrs = {}
+    for node in graph.nodes:
+      if node.op in ('get_attr', 'call_module'):
+        attr = functools.reduce(getattr, node.target.split('.'),
+                                self._xla_model)
+        if isinstance(attr, torch.nn.Module):
+          attr = copy.deepcopy(attr).cpu()
+        elif isinstance(attr, torch.Tensor):
+          attr = attr.detach().cpu()
+        attrs[node.target] = attr
+      # Tensor constructors were moved to the XLA device by
+      # `XLAConstructorMoverPass`, move them back.
+      node.args = torch.fx.node.map_aggregate(node.args, self._to_cpu_device)
+      node.kwargs = torch.fx.node.map_aggregate(node.kwargs,
+                                                self._to_cpu_device)
+    return torch.fx.GraphModule(attrs, graph)
+
+  def __call__(self, args, arg_indices_to_update):
+    if self._cpu_model is None:
+      self._cpu_model = self._build_cpu_model()
+    device = xm.xla_device()
+    cpu_args = [
+        a.cpu() if isinstance(a, torch.Tensor) and is_xla_tensor(a) else a
+        for a in args
+    ]
+    result = self._cpu_model(*cpu_args)
+    for arg_index in arg_indices_to_update:
+      args[arg_index].copy_(cpu_args[arg_index].to(device))
+    return torch.utils._pytree.tree_map(
+        lambda r: r.to(device) if isinstance(r, torch.Tensor) else r, result)
+
+
+def _timed_compile_fn(compile_fn: Callable[[], bool],
+                      report: PartitionReport) -> Callable[[], bool]:
+
+  def timed_compile_fn():
+    start = time.perf_counter()
+    try:
+      return compile_fn()
+    finally:
+      report.compile_time += time.perf_counter() - start
+
+  return timed_compile_fn
+
+
+def extract_internal(xla_model: torch.fx.GraphModule,
+                     report: Optional[PartitionReport] = None):
   if dynamo_debug:
     for xla_arg in xla_model.xla_args:
       if isinstance(xla_arg, torch.Tensor):
@@ -338,7 +628,9 @@ def extract_internal(xla_model: torch.fx.GraphModule):
   xm.mark_step()
   (xla_args_sharding_spec, args_and_out, graph_hash,
    arg_index_to_need_update_index, none_remover, graph_input_matcher,
-   dumb_return_handler, xla_args_need_update) = extract_graph_helper(xla_model)
+   dumb_return_handler, xla_args_need_update,
+   compile_future) = extract_graph_helper(xla_model, report)
+  cpu_fallback = CPUFallback(xla_model)
   skip_checking_input_sharding_threashold = xu.getenv_as(
       'XLA_DYNAMO_INPUT_SHARDING_CHECK_THRESHOLD', int, 5)
 
@@ -353,6 +645,7 @@ def extract_internal(xla_model: torch.fx.GraphModule):
     nonlocal dumb_return_handler
     nonlocal xla_args_need_update
     nonlocal skip_checking_input_sharding_threashold
+    nonlocal compile_future
 
     # mark_step needs to be blocking since we want to access args's XLADatas
     # and they can't be placeholder.
@@ -374,8 +667,10 @@ def extract_internal(xla_model: torch.fx.GraphModule):
           xla_model.xla_args = args
           (xla_args_sharding_spec, args_and_ou_copy, graph_hash,
            arg_index_to_need_update_index, none_remover, graph_input_matcher,
-           dumb_return_handler,
-           xla_args_need_update) = extract_graph_helper(xla_model)
+           dumb_return_handler, xla_args_need_update,
+           compile_future) = extract_graph_helper(xla_model, report)
+          if report is not None:
+            report.num_retraces += 1
           skip_checking_input_sharding_threashold = xu.getenv_as(
               'XLA_DYNAMO_INPUT_SHARDING_CHECK_THRESHOLD', int, 5)
         else:
@@ -385,9 +680,27 @@ def extract_internal(xla_model: torch.fx.GraphModule):
     if len(args_and_out) == 0:
       return ()
 
+    # While the graph is being compiled in the background, run the traced
+    # module eagerly on CPU. Once the compilation is done we switch to the
+    # cached graph for good.
+    if compile_future is not None:
+      if not compile_future.done():
+        _get_async_compiler().record_fallback()
+        if report is not None:
+          report.fallback_count += 1
+        if dynamo_debug:
+          print(f"graph {graph_hash} is still compiling, running it on CPU")
+        return cpu_fallback(args, arg_index_to_need_update_index.keys())
+      # Surface compilation errors on the calling thread.
+      compile_future.result()
+      compile_future = None
+
     graph_input = graph_input_matcher(args)
     start_ts = time.time()
     res = torch_xla._XLAC._run_cached_graph(graph_hash, graph_input)
+    if report is not None:
+      report.run_count += 1
+      report.total_run_time += time.time() - start_ts
     res = dumb_return_handler.addDumbReturn(args, res)
     if dynamo_debug:
       print(
@@ -425,6 +738,7 @@ class UnsupportedNodesCollector(torch.fx.Interpreter):
   def __init__(self, module):
     super().__init__(module)
     self._unsupported_nodes = []
+    self._unsupported_reasons = {}
 
   def run_node(self, n: torch.fx.Node):
     metrics.clear_counters()
@@ -432,6 +746,7 @@ class UnsupportedNodesCollector(torch.fx.Interpreter):
     fallback_ops = get_fallback_ops()
     if len(fallback_ops) > 0:
       self._unsupported_nodes.append(n)
+      self._unsupported_reasons[n] = 'fallback ops: ' + ', '.join(fallback_ops)
     else:
       # Check whether the tensors contained in value are all XLA tensors.
       def all_tensors_on_xla_device(value):
@@ -460,12 +775,18 @@ class UnsupportedNodesCollector(torch.fx.Interpreter):
       # the _unsupported_nodes list.
       if not (result_is_supported and args_are_supported):
         self._unsupported_nodes.append(n)
+        self._unsupported_reasons[n] = ('non-XLA tensor arguments'
+                                        if not args_are_supported else
+                                        'non-XLA tensor result')
 
     return result
 
   def get_unsupported_nodes(self):
     return self._unsupported_nodes
 
+  def get_unsupported_reasons(self):
+    return self._unsupported_reasons
+
 
 class InputCollector(torch.fx.Interpreter):
 
@@ -503,6 +824,8 @@ class XLAConstructorMoverPass(ConstructorMoverPass):
 
 
 def extract_compiled_graph(xla_model: torch.fx.GraphModule, xla_args):
+  partition_start = time.perf_counter()
+  report = _new_graph_report(len(xla_model.graph.nodes))
   # Synchronize xla_args, so that each FunctionalTensorWrapper argument updates its
   # value reference before actually computing it.
   for a in xla_args:
@@ -542,6 +865,11 @@ def extract_compiled_graph(xla_model: torch.fx.GraphModule, xla_args):
   collector = UnsupportedNodesCollector(xla_model)
   collector.run(*xla_args)
   unsupported_nodes = collector.get_unsupported_nodes()
+  report.unsupported_nodes = {
+      f'{node.name} ({node.target})': reason
+      for node, reason in collector.get_unsupported_reasons().items()
+      if node.target != operator.getitem
+  }
   if (ptxla_debug or dynamo_debug) and len(unsupported_nodes) > 0:
     print('Dynamo fallback ops are' + str(unsupported_nodes) +
           '. Please open a GitHub issue with the above op lowering requests.')
@@ -581,15 +909,21 @@ def extract_compiled_graph(xla_model: torch.fx.GraphModule, xla_args):
   # fuse partitions and exectue to collect inputs
   partitioned_graph = partitioner.fuse_partitions(partitions)
   InputCollector(partitioned_graph).run(*xla_args)
+  report.partition_time = time.perf_counter() - partition_start
 
   # compile each submodule and replace it with a call
   for node in partitioned_graph.graph.nodes:
     if node.op == "call_module" and "fused_" in node.name:
       fused_module = getattr(partitioned_graph, node.name)
       partitioned_graph.delete_submodule(node.target)
+      partition_report = PartitionReport(
+          name=node.name,
+          num_nodes=sum(1 for n in fused_module.graph.nodes
+                        if n.op not in ('placeholder', 'output')))
+      report.partitions.append(partition_report)
       with partitioned_graph.graph.inserting_after(node):
         new_node = partitioned_graph.graph.call_function(
-            extract_internal(fused_module), node.args, None)
+            extract_internal(fused_module, partition_report), node.args, None)
         node.replace_all_uses_with(new_node)
       partitioned_graph.graph.erase_node(node)
 
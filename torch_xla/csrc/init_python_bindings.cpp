@@ -544,6 +544,45 @@ void ClearPendingIrs(const std::string& device_str) {
   XLAGraphExecutor::Get()->ClearPendingIrs(tensors, opt_device.value());
 }
 
+// Returns the replica id and the indices into the global tensor of the shards
+// of the sharded `tensor` on `devices`. The indices are either a Python list of
+// slices for each dimension or an Ellipsis object for a replicated tensor.
+std::vector<std::pair<int, py::object>> GetShardReplicaAndIndices(
+    const at::Tensor& tensor, const std::vector<std::string>& devices) {
+  XLATensorPtr xtensor = bridge::GetXlaTensor(tensor);
+  XLA_CHECK(xtensor->sharding_spec() != nullptr) << "Tensor is not sharded";
+  auto sharding_spec = xtensor->sharding_spec();
+  auto shard_shape = ShardingUtil::GetShardShape(sharding_spec);
+  auto replica_and_indices = ShardingUtil::GetShardReplicaAndIndicesForDevices(
+      shard_shape, tensor.sizes().vec(), sharding_spec->sharding, devices);
+
+  // Convert each vector<TensorIndex> to List[py::slice] or py::ellipsis
+  std::vector<std::pair<int, py::object>> tensor_ind;
+  tensor_ind.reserve(devices.size());
+  for (auto& device_replica_and_indices : replica_and_indices) {
+    auto& replica_id = device_replica_and_indices.first;
+    auto& indices = device_replica_and_indices.second;
+    XLA_CHECK(indices.size() > 0)
+        << "Unexpected empty shard indices for tensor " << tensor;
+    if (indices[0].is_ellipsis()) {
+      tensor_ind.push_back(std::make_pair(replica_id, py::ellipsis()));
+    } else {
+      std::vector<py::object> index_slices;
+      for (auto& tensor_index : indices) {
+        XLA_CHECK(tensor_index.is_slice())
+            << "Unexpected TensorIndex type: " << tensor_index;
+        auto slice = tensor_index.slice();
+        ssize_t start = slice.start().expect_int();
+        ssize_t stop = slice.stop().expect_int();
+        ssize_t step = slice.step().expect_int();
+        index_slices.push_back(py::slice(start, stop, step));
+      }
+      tensor_ind.push_back(std::make_pair(replica_id, py::cast(index_slices)));
+    }
+  }
+  return tensor_ind;
+}
+
 std::ptrdiff_t GetTensorViewAliasId(const at::Tensor& tensor) {
   XLATensorPtr xtensor = bridge::GetXlaTensor(tensor);
   return xtensor->GetViewAliasId();
@@ -1015,6 +1054,45 @@ void InitXlaModuleBindings(py::module m) {
   m.def("_xla_computation_cache_is_initialized", []() {
     return XLAGraphExecutor::Get()->IsComputationCacheInitialized();
   });
+  m.def("_xla_computation_cache_entries", []() {
+    std::vector<XLAGraphExecutor::MemoryCache::EntryInfo> entries =
+        XLAGraphExecutor::Get()->GetMemoryComputationCache()->GetEntries();
+    py::list result;
+    for (const auto& entry : entries) {
+      py::dict info;
+      std::string hash_bin((const char*)&entry.key, sizeof(entry.key));
+      info["hash"] = py::bytes(hash_bin);
+      info["size_bytes"] = entry.size_bytes;
+      info["hits"] = entry.hits;
+      info["last_use_us"] = entry.last_use_us;
+      info["pinned"] = entry.pinned;
+      result.append(info);
+    }
+    return result;
+  });
+  m.def("_xla_computation_cache_stats", []() {
+    XLAGraphExecutor::MemoryCache::Stats stats =
+        XLAGraphExecutor::Get()->GetMemoryComputationCache()->GetStats();
+    py::dict result;
+    result["num_entries"] = stats.num_entries;
+    result["total_bytes"] = stats.total_bytes;
+    result["max_entries"] = stats.max_entries;
+    result["max_bytes"] = stats.max_bytes;
+    result["hits"] = stats.hits;
+    result["misses"] = stats.misses;
+    result["evictions"] = stats.evictions;
+    result["evicted_bytes"] = stats.evicted_bytes;
+    return result;
+  });
+  m.def(
+      "_xla_computation_cache_pin",
+      [](const std::string& hash_str, bool pinned) {
+        XLA_CHECK(hash_str.size() == sizeof(torch::lazy::hash_t));
+        torch::lazy::hash_t hash = *(torch::lazy::hash_t*)(hash_str.c_str());
+        return XLAGraphExecutor::Get()->GetMemoryComputationCache()->Pin(
+            hash, pinned);
+      },
+      py::arg("hash"), py::arg("pinned") = true);
   m.def("_get_git_revs", []() { return GetRevisions(); });
   m.def("_get_xla_tensor_dimension_size",
         [](const at::Tensor& tensor, int dim) {
@@ -1531,6 +1609,21 @@ void InitXlaModuleBindings(py::module m) {
                       /*warm_up_cache_only=*/true);
         },
         py::arg("tensors"), py::arg("devices"));
+  m.def("_xla_prepare_warm_up_cache",
+        [](const std::vector<at::Tensor>& tensors,
+           const std::vector<std::string>& devices, bool force_ltc_data) {
+          std::vector<XLATensorPtr> xtensors =
+              GetXlaTensors(tensors, /*want_all=*/false);
+          std::function<bool()> compile_fn =
+              XLAGraphExecutor::Get()->PrepareWarmUpCache(&xtensors, devices,
+                                                          force_ltc_data);
+          return py::cpp_function([compile_fn]() -> bool {
+            NoGilSection nogil;
+            return compile_fn();
+          });
+        },
+        py::arg("tensors"), py::arg("devices"),
+        py::arg("force_ltc_data") = false);
   m.def("_xla_sync_live_tensors",
         [](const std::string& device, const std::vector<std::string>& devices,
            bool wait) {
@@ -1781,6 +1874,17 @@ void InitXlaModuleBindings(py::module m) {
         [](const at::Tensor& input, xla::OpSharding sharding) {
           ShardingUtil::XlaMarkSharding(input, sharding);
         });
+  m.def("_xla_mark_sharding_many",
+        [](const std::vector<at::Tensor>& inputs,
+           const std::vector<xla::OpSharding>& shardings) {
+          tsl::profiler::TraceMe activity("_xla_mark_sharding_many",
+                                          tsl::profiler::TraceMeLevel::kInfo);
+          XLA_CHECK_EQ(inputs.size(), shardings.size())
+              << "Expected one sharding per tensor";
+          for (size_t i = 0; i < inputs.size(); ++i) {
+            ShardingUtil::XlaMarkSharding(inputs[i], shardings[i]);
+          }
+        });
   m.def("_xla_mark_sharding_dynamo_custom_op",
         [](const at::Tensor& input, const py::list& tile_assignment,
            const py::list& group_assignment, const py::list& replication_groups,
@@ -1965,6 +2069,58 @@ void InitXlaModuleBindings(py::module m) {
           }
           return result;
         });
+  // Returns the devices of the local shards of the tensor, in the order of
+  // `_get_local_shards`, without transferring their data.
+  m.def("_get_local_shard_devices",
+        [](const at::Tensor& input) -> std::vector<std::string> {
+          XLATensorPtr xtensor = bridge::GetXlaTensor(input);
+          XLA_CHECK(xtensor->GetXlaData() != nullptr)
+              << "Shard data is not available";
+          XLA_CHECK(xtensor->sharding_spec() != nullptr)
+              << "Tensor is not sharded";
+          auto handle =
+              std::dynamic_pointer_cast<runtime::ComputationClient::Data>(
+                  xtensor->GetXlaData());
+          std::vector<std::string> devices;
+          for (auto& shard :
+               runtime::GetComputationClient()->GetDataShards(handle)) {
+            devices.push_back(shard->device());
+          }
+          return devices;
+        });
+  // For each pair of input tensor and index, returns the local shard of the
+  // tensor at that index in the order of `_get_local_shards`. The shards are
+  // transferred to the host together, without transferring the other shards.
+  m.def("_get_local_shards_data",
+        [](const std::vector<at::Tensor>& input,
+           const std::vector<int64_t>& shard_indices)
+            -> std::vector<at::Tensor> {
+          XLA_CHECK_EQ(input.size(), shard_indices.size())
+              << "Expected one shard index per tensor";
+          std::vector<runtime::ComputationClient::DataPtr> handles;
+          std::vector<at::ScalarType> element_types;
+          handles.reserve(input.size());
+          element_types.reserve(input.size());
+          for (size_t i = 0; i < input.size(); ++i) {
+            XLATensorPtr xtensor = bridge::GetXlaTensor(input[i]);
+            XLA_CHECK(xtensor->GetXlaData() != nullptr)
+                << "Shard data is not available";
+            XLA_CHECK(xtensor->sharding_spec() != nullptr)
+                << "Tensor is not sharded";
+            auto handle =
+                std::dynamic_pointer_cast<runtime::ComputationClient::Data>(
+                    xtensor->GetXlaData());
+            std::vector<runtime::ComputationClient::DataPtr> shard_handles =
+                runtime::GetComputationClient()->GetDataShards(handle);
+            XLA_CHECK(shard_indices[i] >= 0 &&
+                      shard_indices[i] < shard_handles.size())
+                << "Shard index " << shard_indices[i] << " out of range";
+            handles.push_back(shard_handles[shard_indices[i]]);
+            element_types.push_back(MaybeUpcastToHostTorchType(
+                handles.back()->shape().element_type()));
+          }
+          return XlaDataToTensors(WrapXlaData(handles), element_types);
+        });
   // For each input tensors' local shards, returns the tuple:
   //        (replica_id: int, indices: Union[List[Slice], Ellipsis]),
   // where `replica_id` is the replica the shard belongs to and `indices` index
@@ -1990,42 +2146,20 @@ void InitXlaModuleBindings(py::module m) {
           for (auto& shard : shards) {
             shard_devices.push_back(shard->device());
           }
-          auto sharding_spec = xtensor->sharding_spec();
-          auto sharding = xtensor->sharding_spec()->sharding;
-          auto shard_shape = ShardingUtil::GetShardShape(sharding_spec);
-          auto replica_and_indices =
-              ShardingUtil::GetShardReplicaAndIndicesForDevices(
-                  shard_shape, tensor.sizes().vec(), sharding, shard_devices);
-
-          // Convert each vector<TensorIndex> to List[py::slice] or py::ellipsis
-          std::vector<std::pair<int, py::object>> tensor_ind;
-          tensor_ind.reserve(shard_devices.size());
-          for (auto& device_replica_and_indices : replica_and_indices) {
-            auto& replica_id = device_replica_and_indices.first;
-            auto& indices = device_replica_and_indices.second;
-            XLA_CHECK(indices.size() > 0)
-                << "Unexpected empty shard indices for tensor " << tensor;
-            if (indices[0].is_ellipsis()) {
-              tensor_ind.push_back(std::make_pair(replica_id, py::ellipsis()));
-            } else {
-              std::vector<py::object> index_slices;
-              for (auto& tensor_index : indices) {
-                XLA_CHECK(tensor_index.is_slice())
-                    << "Unexpected TensorIndex type: " << tensor_index;
-                auto slice = tensor_index.slice();
-                ssize_t start = slice.start().expect_int();
-                ssize_t stop = slice.stop().expect_int();
-                ssize_t step = slice.step().expect_int();
-                index_slices.push_back(py::slice(start, stop, step));
-              }
-              tensor_ind.push_back(
-                  std::make_pair(replica_id, py::cast(index_slices)));
-            }
-          }
-          result.push_back(tensor_ind);
+          result.push_back(GetShardReplicaAndIndices(tensor, shard_devices));
         }
         return result;
       });
+  // Returns the replica ids and indices of the shards of the tensor on
+  // `devices`, in the format of `_get_local_shard_replica_and_indices`. Only
+  // the sharding spec of the tensor is used, so this does not materialize the
+  // device data of the tensor, e.g. of a placeholder about to be loaded with
+  // `_load_local_shards`.
+  m.def("_get_shard_replica_and_indices_for_devices",
+        [](const at::Tensor& tensor, const std::vector<std::string>& devices)
+            -> std::vector<std::pair<int, py::object>> {
+          return GetShardReplicaAndIndices(tensor, devices);
+        });
   // Load a list of local shards into an explicitly-sharded tensor. A shard must
   // be provided for each device.
   m.def("_load_local_shards", [](const at::Tensor& tensor,
@@ -2082,6 +2216,43 @@ void InitXlaModuleBindings(py::module m) {
               xla::HloModule::CreateFromProto(module_proto, config).value());
           return module->ToString();
         });
+  // Compile the pending graph of the tensors with SPMD partitioning, without
+  // executing it, and return the memory stats of the executable per device.
+  // Returns None if the runtime cannot report them.
+  m.def("_xla_compiled_memory_stats",
+        [](const std::vector<at::Tensor>& tensors) -> py::object {
+          std::string hlo_text =
+              GetTensorsHloGraph(tensors, EmitMode::kHloReadable);
+          auto hlo_module_error = xla::ParseAndReturnUnverifiedModule(hlo_text);
+          XLA_CHECK_OK(hlo_module_error.status())
+              << "HLO Module loading failed: " << hlo_module_error.status();
+          xla::XlaComputation computation(hlo_module_error.value()->ToProto());
+
+          torch::lazy::BackendDevice device = GetDeviceOrCurrent("");
+          std::vector<runtime::ComputationClient::CompileInstance> instances;
+          instances.push_back(
+              {std::move(computation), device.toString(),
+               runtime::GetComputationClient()->GetCompilationDevices(
+                   device.toString(), {}),
+               /*output_shape=*/nullptr, /*parameter_is_tupled_arguments=*/false,
+               /*is_sharded=*/true});
+          std::map<std::string, int64_t> stats;
+          {
+            NoGilSection nogil;
+            std::vector<runtime::ComputationClient::ComputationPtr>
+                computations = runtime::GetComputationClient()->Compile(
+                    std::move(instances));
+            stats = computations[0]->GetMemoryStats();
+          }
+          if (stats.empty()) {
+            return py::none();
+          }
+          py::dict result;
+          for (const auto& [name, value] : stats) {
+            result[py::str(name)] = value;
+          }
+          return result;
+        });
   // Initialize the XlaCoordinator in the runtime if not already initialized.
   m.def("_ensure_xla_coordinator_initialized",
         [](int global_rank, int world_size, std::string master_addr,
@@ -2276,16 +2447,20 @@ void InitXlaModuleBindings(py::module m) {
           return check_materialization_helper(xtensors);
         });
 
-  m.def("_get_graph_hash", [](const std::vector<at::Tensor>& tensors) {
-    std::vector<XLATensorPtr> xtensors;
-    xtensors.reserve(tensors.size());
-    for (auto& tensor : tensors) {
-      xtensors.push_back(bridge::GetXlaTensor(tensor));
-    }
-    torch::lazy::hash_t hash = XLAGraphExecutor::Get()->GetGraphHash(xtensors);
-    std::string bin((const char*)&hash, sizeof(hash));
-    return py::bytes(bin);
-  });
+  m.def(
+      "_get_graph_hash",
+      [](const std::vector<at::Tensor>& tensors, bool force_ltc_data) {
+        std::vector<XLATensorPtr> xtensors;
+        xtensors.reserve(tensors.size());
+        for (auto& tensor : tensors) {
+          xtensors.push_back(bridge::GetXlaTensor(tensor));
+        }
+        torch::lazy::hash_t hash =
+            XLAGraphExecutor::Get()->GetGraphHash(xtensors, force_ltc_data);
+        std::string bin((const char*)&hash, sizeof(hash));
+        return py::bytes(bin);
+      },
+      py::arg("tensors"), py::arg("force_ltc_data") = false);
 
   m.def("_clear_pending_irs", [](const std::string& device) {
     // Use with caution. Those tensor whole ir was cleared with be replaced
@@ -2,17 +2,24 @@
 #define XLA_CLIENT_CACHE_H_
 
 #include <sys/stat.h>
+#include <unistd.h>
 #include <torch/csrc/lazy/core/metrics.h>
 
+#include <algorithm>
+#include <chrono>
 #include <filesystem>
 #include <fstream>
 #include <functional>
+#include <iterator>
 #include <list>
 #include <memory>
 #include <mutex>
+#include <random>
 #include <sstream>
+#include <thread>
 #include <unordered_map>
 #include <utility>
+#include <vector>
 
 namespace torch_xla {
 namespace runtime {
@@ -32,31 +39,60 @@ class AbstractCache {
 // Generic key and object cache with LRU expiration policy. The objects of type
 // T will be stored as std::shared_ptr<T> and taken and returned as such, by the
 // cache API.
+// The cache is bounded by its number of entries and, when a size function is
+// provided, by the total size in bytes of the stored objects. Pinned entries
+// are never evicted.
 template <typename K, typename T, typename H = std::hash<K>,
           typename E = std::equal_to<K>>
 class Cache : public AbstractCache<K, T, H, E> {
  public:
   using TypePtr = std::shared_ptr<T>;
-  using Element = std::pair<K, TypePtr>;
-  explicit Cache(size_t max_size) : max_size_(max_size) {}
+  using SizeFn = std::function<size_t(const TypePtr&)>;
+
+  struct EntryInfo {
+    K key;
+    size_t size_bytes = 0;
+    int64_t hits = 0;
+    // Time of the last Add or Get of the entry, in microseconds since epoch.
+    int64_t last_use_us = 0;
+    bool pinned = false;
+  };
+
+  struct Stats {
+    size_t num_entries = 0;
+    size_t total_bytes = 0;
+    size_t max_entries = 0;
+    size_t max_bytes = 0;
+    int64_t hits = 0;
+    int64_t misses = 0;
+    int64_t evictions = 0;
+    size_t evicted_bytes = 0;
+  };
+
+  explicit Cache(size_t max_size, size_t max_bytes = 0,
+                 SizeFn size_fn = nullptr)
+      : max_size_(max_size),
+        max_bytes_(max_bytes),
+        size_fn_(std::move(size_fn)) {}
 
   // Adds an object to the cache, unless it already exists. If the cache grows
-  // beyond the limit set during construction, the oldest used object will be
-  // removed from the cache.
+  // beyond the limits set during construction, the oldest used objects which
+  // are not pinned will be removed from the cache.
   TypePtr Add(K key, TypePtr object) override {
     std::lock_guard<std::mutex> slock(lock_);
-    element_list_.emplace_front(Element(std::move(key), std::move(object)));
+    element_list_.emplace_front(Element{std::move(object), {std::move(key)}});
     auto it = element_list_.begin();
-    auto emplace_result = element_map_.emplace(&it->first, it);
+    auto emplace_result = element_map_.emplace(&it->info.key, it);
     if (!emplace_result.second) {
       element_list_.erase(it);
       DoLRU(emplace_result.first->second);
-    } else if (element_list_.size() > max_size_) {
-      Element* last = &element_list_.back();
-      element_map_.erase(&last->first);
-      element_list_.pop_back();
+    } else {
+      it->info.size_bytes = size_fn_ ? size_fn_(it->object) : 0;
+      it->info.last_use_us = NowMicros();
+      total_bytes_ += it->info.size_bytes;
+      MaybeEvict();
     }
-    return emplace_result.first->second->second;
+    return emplace_result.first->second->object;
   }
 
   // Retrieves the existing object if it exists. If it does, it's position in
@@ -64,13 +100,33 @@ class Cache : public AbstractCache<K, T, H, E> {
   // Returns nullptr if no object with the specified key is found within the
   // cache.
   TypePtr Get(const K& key) override {
+    TypePtr object = Lookup(key);
+    RecordLookup(object != nullptr);
+    return object;
+  }
+
+  // Same as Get, but leaves the hit and miss counters alone, for a caller
+  // which only knows the outcome of the lookup later on and records it with
+  // RecordLookup, eg. a PersistentCache which falls back to the disk.
+  TypePtr Lookup(const K& key) {
     std::lock_guard<std::mutex> slock(lock_);
     auto it = element_map_.find(&key);
     if (it == element_map_.end()) {
       return nullptr;
     }
+    it->second->info.hits += 1;
+    it->second->info.last_use_us = NowMicros();
     DoLRU(it->second);
-    return it->second->second;
+    return it->second->object;
+  }
+
+  void RecordLookup(bool hit) {
+    std::lock_guard<std::mutex> slock(lock_);
+    if (hit) {
+      ++hits_;
+    } else {
+      ++misses_;
+    }
   }
 
   bool Erase(const K& key) override {
@@ -79,9 +135,7 @@ class Cache : public AbstractCache<K, T, H, E> {
     if (it == element_map_.end()) {
       return false;
     }
-    auto lit = it->second;
-    element_map_.erase(it);
-    element_list_.erase(lit);
+    EraseElement(it->second);
     return true;
   }
 
@@ -89,9 +143,55 @@ class Cache : public AbstractCache<K, T, H, E> {
     std::lock_guard<std::mutex> slock(lock_);
     element_map_.clear();
     element_list_.clear();
+    total_bytes_ = 0;
+  }
+
+  // Pins or unpins the entry with the given key. Pinned entries are not
+  // evicted. Returns false if the key is not in the cache.
+  bool Pin(const K& key, bool pinned = true) {
+    std::lock_guard<std::mutex> slock(lock_);
+    auto it = element_map_.find(&key);
+    if (it == element_map_.end()) {
+      return false;
+    }
+    it->second->info.pinned = pinned;
+    if (!pinned) {
+      MaybeEvict();
+    }
+    return true;
+  }
+
+  // Returns the information of all the entries, most recently used first.
+  std::vector<EntryInfo> GetEntries() {
+    std::lock_guard<std::mutex> slock(lock_);
+    std::vector<EntryInfo> entries;
+    entries.reserve(element_list_.size());
+    for (auto& element : element_list_) {
+      entries.push_back(element.info);
+    }
+    return entries;
+  }
+
+  Stats GetStats() {
+    std::lock_guard<std::mutex> slock(lock_);
+    Stats stats;
+    stats.num_entries = element_list_.size();
+    stats.total_bytes = total_bytes_;
+    stats.max_entries = max_size_;
+    stats.max_bytes = max_bytes_;
+    stats.hits = hits_;
+    stats.misses = misses_;
+    stats.evictions = evictions_;
+    stats.evicted_bytes = evicted_bytes_;
+    return stats;
   }
 
  private:
+  struct Element {
+    TypePtr object;
+    EntryInfo info;
+  };
+
   using ElementList = std::list<Element>;
 
   struct Hasher {
@@ -112,12 +212,55 @@ class Cache : public AbstractCache<K, T, H, E> {
       std::unordered_map<const K*, typename ElementList::iterator, Hasher,
                          Equaler>;
 
+  static int64_t NowMicros() {
+    return std::chrono::duration_cast<std::chrono::microseconds>(
+               std::chrono::system_clock::now().time_since_epoch())
+        .count();
+  }
+
   void DoLRU(typename ElementList::iterator it) {
     element_list_.splice(element_list_.begin(), element_list_, it);
   }
 
+  void EraseElement(typename ElementList::iterator it) {
+    total_bytes_ -= it->info.size_bytes;
+    element_map_.erase(&it->info.key);
+    element_list_.erase(it);
+  }
+
+  bool OverBudget() const {
+    return element_list_.size() > max_size_ ||
+           (max_bytes_ > 0 && total_bytes_ > max_bytes_);
+  }
+
+  // Evicts the least recently used entries which are not pinned, until the
+  // cache fits its limits. The most recently used entry is never evicted, so
+  // that an object just added is always returned to the caller.
+  void MaybeEvict() {
+    if (element_list_.empty()) {
+      return;
+    }
+    auto it = std::prev(element_list_.end());
+    while (OverBudget() && it != element_list_.begin()) {
+      auto victim = it--;
+      if (victim->info.pinned) {
+        continue;
+      }
+      ++evictions_;
+      evicted_bytes_ += victim->info.size_bytes;
+      EraseElement(victim);
+    }
+  }
+
   std::mutex lock_;
   size_t max_size_ = 0;
+  size_t max_bytes_ = 0;
+  SizeFn size_fn_;
+  size_t total_bytes_ = 0;
+  int64_t hits_ = 0;
+  int64_t misses_ = 0;
+  int64_t evictions_ = 0;
+  size_t evicted_bytes_ = 0;
   ElementList element_list_;
   ElementMap element_map_;
 };
@@ -125,6 +268,12 @@ class Cache : public AbstractCache<K, T, H, E> {
 // A persistent cache which serializes values to disk. This wraps a Cache
 // instance, so values will only be read from disk once and subsequent reads
 // will go through the wrapped Cache.
+// The cache directory can be shared by concurrent processes: values are
+// written to a temporary file which is atomically renamed into place. The
+// directory itself is the index of the cache, file names are the keys and
+// the modification time of a file records its last access. When
+// max_storage_bytes is set, the least recently accessed files are removed
+// once the directory grows beyond that size.
 template <typename K, typename T, typename H = std::hash<K>,
           typename E = std::equal_to<K>>
 class PersistentCache : public AbstractCache<K, T, H, E> {
@@ -134,10 +283,15 @@ class PersistentCache : public AbstractCache<K, T, H, E> {
   explicit PersistentCache(
       int kMaxMemoryCacheSize, std::string cache_dir, bool readonly_storage,
       std::function<std::string(const TypePtr&)> serialize,
-      std::function<TypePtr(const std::string&)> deserialize)
-      : memory_cache_(kMaxMemoryCacheSize),
+      std::function<TypePtr(const std::string&)> deserialize,
+      size_t max_memory_cache_bytes = 0,
+      typename Cache<K, T, H, E>::SizeFn size_fn = nullptr,
+      size_t max_storage_bytes = 0)
+      : memory_cache_(kMaxMemoryCacheSize, max_memory_cache_bytes,
+                      std::move(size_fn)),
         cache_dir_(cache_dir),
         readonly_storage_(readonly_storage),
+        max_storage_bytes_(max_storage_bytes),
         serialize_(serialize),
         deserialize_(deserialize) {
     std::filesystem::create_directories(cache_dir);
@@ -152,8 +306,11 @@ class PersistentCache : public AbstractCache<K, T, H, E> {
     std::lock_guard<std::mutex> slock(lock_);
     std::string path = GetPath(key);
     if (!Exists(path) && !readonly_storage_) {
-      std::ofstream out(path, std::ios::binary);
-      out << serialize_(obj);
+      {
+        TORCH_LAZY_TIMED("PersistentCacheWriteTime");
+        WriteAtomically(path, serialize_(obj));
+      }
+      MaybeEvictStorage();
     }
     return memory_cache_.Add(key, obj);
   }
@@ -163,29 +320,41 @@ class PersistentCache : public AbstractCache<K, T, H, E> {
   // version on disk.
   TypePtr Get(const K& key) override {
     std::lock_guard<std::mutex> slock(lock_);
-    TypePtr mem = memory_cache_.Get(key);
+    // A value served from disk is a hit of the memory cache stats as well, so
+    // the miss is only recorded once the disk lookup failed.
+    TypePtr mem = memory_cache_.Lookup(key);
     if (mem) {
+      memory_cache_.RecordLookup(/*hit=*/true);
       return mem;
     }
 
     std::string path = GetPath(key);
-    if (!Exists(path)) {
-      TORCH_LAZY_COUNTER("PersistentCacheMiss", 1);
-      return nullptr;
+    TypePtr val;
+    {
+      TORCH_LAZY_TIMED("PersistentCacheLoadTime");
+      // The file can be evicted by another process at any point, so a failure
+      // to open it is a miss.
+      std::ifstream in(path, std::ios::binary);
+      if (!in) {
+        TORCH_LAZY_COUNTER("PersistentCacheMiss", 1);
+        memory_cache_.RecordLookup(/*hit=*/false);
+        return nullptr;
+      }
+      std::stringstream ss;
+      ss << in.rdbuf();
+      std::string serialization = ss.str();
+      val = deserialize_(serialization);
     }
-    std::stringstream ss;
-    std::ifstream in(path, std::ios::binary);
-    ss << in.rdbuf();
-    std::string serialization = ss.str();
-
-    TypePtr val = deserialize_(serialization);
     if (!val) {
       TORCH_LAZY_COUNTER("PersistentCacheDeserializeFailure", 1);
       // Remove the serialized value from disk to allow a new value to be stored
       EraseImpl(key);
+      memory_cache_.RecordLookup(/*hit=*/false);
       return nullptr;
     }
     TORCH_LAZY_COUNTER("PersistentCacheHit", 1);
+    memory_cache_.RecordLookup(/*hit=*/true);
+    Touch(path);
     // Make sure the memory_cache_ tracks the value to prevent multiple loads
     return memory_cache_.Add(key, val);
   }
@@ -208,6 +377,9 @@ class PersistentCache : public AbstractCache<K, T, H, E> {
   Cache<K, T, H, E>& GetMemoryCache() { return memory_cache_; }
 
  private:
+  // Prefix of the files being written, which are not part of the cache yet.
+  static constexpr char kTempPrefix[] = ".tmp-";
+
   std::string GetPath(K key) {
     std::stringstream ss;
     ss << key;
@@ -221,7 +393,91 @@ class PersistentCache : public AbstractCache<K, T, H, E> {
 
   bool EraseImpl(const K& key) {
     memory_cache_.Erase(key);
-    return !readonly_storage_ && std::filesystem::remove(GetPath(key));
+    std::error_code ec;
+    return !readonly_storage_ && std::filesystem::remove(GetPath(key), ec);
+  }
+
+  // Writes the data to a temporary file and renames it into place, so that
+  // concurrent readers never observe a partially written value.
+  void WriteAtomically(const std::string& path, const std::string& data) {
+    // The directory can be shared by processes on several hosts, where the
+    // pid and the thread id are not unique, so a random suffix is added.
+    std::random_device random;
+    std::stringstream tmp_name;
+    tmp_name << kTempPrefix << std::filesystem::path(path).filename().string()
+             << "-" << getpid() << "-" << std::this_thread::get_id() << "-"
+             << std::hex << random() << random();
+    std::filesystem::path tmp_path = cache_dir_ / tmp_name.str();
+    bool written;
+    {
+      std::ofstream out(tmp_path, std::ios::binary);
+      out << data;
+      written = static_cast<bool>(out);
+    }
+    std::error_code ec;
+    if (written) {
+      std::filesystem::rename(tmp_path, path, ec);
+    }
+    if (!written || ec) {
+      TORCH_LAZY_COUNTER("PersistentCacheWriteFailure", 1);
+      std::filesystem::remove(tmp_path, ec);
+    }
+  }
+
+  // Records an access to the file by updating its modification time.
+  void Touch(const std::string& path) {
+    if (readonly_storage_) {
+      return;
+    }
+    std::error_code ec;
+    std::filesystem::last_write_time(
+        path, std::filesystem::file_time_type::clock::now(), ec);
+  }
+
+  // Removes the least recently accessed files until the cache directory fits
+  // within max_storage_bytes_.
+  void MaybeEvictStorage() {
+    if (max_storage_bytes_ == 0) {
+      return;
+    }
+    struct StorageEntry {
+      std::filesystem::path path;
+      std::filesystem::file_time_type last_access;
+      uintmax_t size;
+    };
+    std::vector<StorageEntry> entries;
+    uintmax_t total_size = 0;
+    std::error_code ec;
+    for (const auto& dir_entry :
+         std::filesystem::directory_iterator(cache_dir_, ec)) {
+      std::string name = dir_entry.path().filename().string();
+      if (name.rfind(kTempPrefix, 0) == 0 || !dir_entry.is_regular_file(ec)) {
+        continue;
+      }
+      uintmax_t size = dir_entry.file_size(ec);
+      if (ec) continue;
+      auto last_access = dir_entry.last_write_time(ec);
+      if (ec) continue;
+      entries.push_back({dir_entry.path(), last_access, size});
+      total_size += size;
+    }
+    if (total_size <= max_storage_bytes_) {
+      return;
+    }
+    std::sort(entries.begin(), entries.end(),
+              [](const StorageEntry& a, const StorageEntry& b) {
+                return a.last_access < b.last_access;
+              });
+    for (const auto& entry : entries) {
+      if (total_size <= max_storage_bytes_) {
+        break;
+      }
+      // Another process might have evicted the same file already.
+      if (std::filesystem::remove(entry.path, ec)) {
+        TORCH_LAZY_COUNTER("PersistentCacheEviction", 1);
+      }
+      total_size -= entry.size;
+    }
   }
 
   Cache<K, T, H, E> memory_cache_;
@@ -234,6 +490,8 @@ class PersistentCache : public AbstractCache<K, T, H, E> {
   // Erase and Add, are not written to disk, but they are still applied to the
   // in-memory cache.
   const bool readonly_storage_;
+  // Max size of the cache directory, 0 if unbounded.
+  const size_t max_storage_bytes_;
 };
 
 }  // namespace util
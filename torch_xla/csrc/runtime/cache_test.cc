@@ -3,6 +3,8 @@
 #include <gmock/gmock.h>
 #include <gtest/gtest.h>
 
+#include <chrono>
+#include <filesystem>
 #include <iostream>
 #include <memory>
 #include <string>
@@ -38,6 +40,58 @@ TEST(UtilTest, XlaUtilCacheTest) {
   EXPECT_EQ(ptr, nullptr);
 }
 
+TEST(UtilTest, XlaUtilCacheByteBudgetTest) {
+  static const int kMaxBytes = 100;
+  auto size_fn = [](const std::shared_ptr<std::string>& value) -> size_t {
+    return value->size();
+  };
+  torch_xla::runtime::util::Cache<int, std::string> cache(
+      /*max_size=*/1024, kMaxBytes, size_fn);
+
+  // Four 30 byte entries do not fit in the 100 bytes budget, the least
+  // recently used one is evicted.
+  for (int i = 0; i < 4; ++i) {
+    cache.Add(i, std::make_shared<std::string>(30, 'a' + i));
+  }
+  EXPECT_EQ(cache.Get(0), nullptr);
+  for (int i = 1; i < 4; ++i) {
+    EXPECT_NE(cache.Get(i), nullptr);
+  }
+  auto stats = cache.GetStats();
+  EXPECT_EQ(stats.num_entries, 3);
+  EXPECT_EQ(stats.total_bytes, 90);
+  EXPECT_EQ(stats.evictions, 1);
+  EXPECT_EQ(stats.evicted_bytes, 30);
+  EXPECT_EQ(stats.hits, 3);
+  EXPECT_EQ(stats.misses, 1);
+
+  // Pinned entries are not evicted, even when they are the least recently
+  // used ones.
+  EXPECT_TRUE(cache.Pin(1));
+  EXPECT_FALSE(cache.Pin(0));
+  cache.Get(2);
+  cache.Get(3);
+  cache.Add(4, std::make_shared<std::string>(30, 'e'));
+  EXPECT_NE(cache.Get(1), nullptr);
+  EXPECT_EQ(cache.Get(2), nullptr);
+
+  // An entry larger than the whole budget is still returned by Add.
+  auto ptr = cache.Add(5, std::make_shared<std::string>(200, 'f'));
+  ASSERT_NE(ptr, nullptr);
+  EXPECT_EQ(ptr->size(), 200);
+
+  std::vector<Cache<int, std::string>::EntryInfo> entries = cache.GetEntries();
+  ASSERT_FALSE(entries.empty());
+  EXPECT_EQ(entries.front().key, 5);
+  EXPECT_EQ(entries.front().size_bytes, 200);
+  for (const auto& entry : entries) {
+    if (entry.key == 1) {
+      EXPECT_TRUE(entry.pinned);
+      EXPECT_EQ(entry.hits, 2);
+    }
+  }
+}
+
 TEST(UtilTest, XlaUtilPersistentCacheTest) {
   static const int kMaxSize = 64;
   auto serialize_fn = [](std::shared_ptr<std::string> value) -> std::string {
@@ -155,6 +209,87 @@ TEST(UtilTest, XlaUtilPersistentCacheTest) {
   unlink(tmpdir);
 }
 
+TEST(UtilTest, XlaUtilPersistentCacheStatsTest) {
+  static const int kMaxSize = 64;
+  auto serialize_fn = [](std::shared_ptr<std::string> value) -> std::string {
+    return *value;
+  };
+  auto deserialize_fn = [](std::string value) -> std::shared_ptr<std::string> {
+    return std::make_shared<std::string>(value);
+  };
+  char format[] = "/tmp/tmp.XXXXXX";
+  char* tmpdir = mkdtemp(format);
+  ASSERT_NE(tmpdir, nullptr);
+  auto writer = std::make_unique<PersistentCache<int, std::string>>(
+      kMaxSize, std::string(tmpdir), /*readonly=*/false, serialize_fn,
+      deserialize_fn);
+  writer->Add(0, std::make_shared<std::string>("0"));
+
+  // A value served from disk is a hit, and is not counted as a miss of the
+  // memory cache.
+  auto cache = std::make_unique<PersistentCache<int, std::string>>(
+      kMaxSize, std::string(tmpdir), /*readonly=*/true, serialize_fn,
+      deserialize_fn);
+  ASSERT_NE(cache->Get(0), nullptr);
+  ASSERT_NE(cache->Get(0), nullptr);
+  ASSERT_EQ(cache->Get(1), nullptr);
+  auto stats = cache->GetMemoryCache().GetStats();
+  EXPECT_EQ(stats.hits, 2);
+  EXPECT_EQ(stats.misses, 1);
+
+  writer->Clear();
+  unlink(tmpdir);
+}
+
+TEST(UtilTest, XlaUtilPersistentCacheStorageLimitTest) {
+  static const int kMaxSize = 64;
+  static const int kValueSize = 100;
+  auto serialize_fn = [](std::shared_ptr<std::string> value) -> std::string {
+    return *value;
+  };
+  auto deserialize_fn = [](std::string value) -> std::shared_ptr<std::string> {
+    return std::make_shared<std::string>(value);
+  };
+  char format[] = "/tmp/tmp.XXXXXX";
+  char* tmpdir = mkdtemp(format);
+  ASSERT_NE(tmpdir, nullptr);
+  // The directory fits three values.
+  auto cache = std::make_unique<PersistentCache<int, std::string>>(
+      kMaxSize, std::string(tmpdir), /*readonly=*/false, serialize_fn,
+      deserialize_fn, /*max_memory_cache_bytes=*/0, /*size_fn=*/nullptr,
+      /*max_storage_bytes=*/3 * kValueSize);
+
+  auto now = std::filesystem::file_time_type::clock::now();
+  for (int i = 0; i < 3; ++i) {
+    cache->Add(i, std::make_shared<std::string>(kValueSize, 'a' + i));
+    // Make the access times distinct, value 0 being the oldest.
+    std::filesystem::last_write_time(std::filesystem::path(tmpdir) /
+                                         std::to_string(i),
+                                     now - std::chrono::hours(3 - i));
+  }
+  // Reading value 0 from disk makes it the most recently accessed one.
+  cache->GetMemoryCache().Clear();
+  ASSERT_NE(cache->Get(0), nullptr);
+
+  cache->Add(3, std::make_shared<std::string>(kValueSize, 'd'));
+  cache->GetMemoryCache().Clear();
+  EXPECT_NE(cache->Get(0), nullptr);
+  EXPECT_EQ(cache->Get(1), nullptr);
+  EXPECT_NE(cache->Get(2), nullptr);
+  EXPECT_NE(cache->Get(3), nullptr);
+
+  // No temporary files are left behind by the writes.
+  int num_files = 0;
+  for (const auto& entry : std::filesystem::directory_iterator(tmpdir)) {
+    EXPECT_NE(entry.path().filename().string().rfind(".tmp-", 0), 0);
+    ++num_files;
+  }
+  EXPECT_EQ(num_files, 3);
+
+  cache->Clear();
+  unlink(tmpdir);
+}
+
 }  // namespace util
 }  // namespace runtime
 }  // namespace torch_xla
@@ -155,6 +155,19 @@ class ComputationClient {
 
     const xla::ProgramShape& program_shape() const { return program_shape_; }
 
+    // Returns the size of the computation in bytes. This is the size of the
+    // HLO, plus the size of the compiled executable when the runtime can
+    // report it.
+    virtual size_t SizeInBytes() const {
+      return computation_moved_ ? 0 : computation_.proto().ByteSizeLong();
+    }
+
+    // Returns the memory stats of the compiled executable per device in bytes,
+    // keyed by name, or an empty map if the runtime cannot report them.
+    virtual std::map<std::string, int64_t> GetMemoryStats() const {
+      return {};
+    }
+
     const torch::lazy::hash_t& hash() const { return hash_; }
 
     int parameters_size() const override {
@@ -253,6 +253,25 @@ class PjRtComputationClient : public ComputationClient {
       output_shardings_ = this->executable->GetOutputShardings();
     }
 
+    size_t SizeInBytes() const override {
+      int64_t code_size = executable->SizeOfGeneratedCodeInBytes();
+      return Computation::SizeInBytes() + (code_size > 0 ? code_size : 0);
+    }
+
+    std::map<std::string, int64_t> GetMemoryStats() const override {
+      absl::StatusOr<xla::CompiledMemoryStats> stats =
+          executable->GetCompiledMemoryStats();
+      if (!stats.ok()) {
+        return {};
+      }
+      return {{"argument_size_in_bytes", stats->argument_size_in_bytes},
+              {"output_size_in_bytes", stats->output_size_in_bytes},
+              {"alias_size_in_bytes", stats->alias_size_in_bytes},
+              {"temp_size_in_bytes", stats->temp_size_in_bytes},
+              {"generated_code_size_in_bytes",
+               stats->generated_code_size_in_bytes}};
+    }
+
     std::unique_ptr<xla::PjRtLoadedExecutable> executable;
     std::optional<std::vector<xla::OpSharding>> output_shardings_;
   };
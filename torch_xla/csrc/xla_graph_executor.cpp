@@ -79,10 +79,18 @@ bool ShouldSyncIrValue(const torch::lazy::Value& ir_value) {
 XLAGraphExecutor::ComputationCache* CreateComputationCache() {
   static const size_t kMaxCacheSize =
       runtime::sys_util::GetEnvInt("XLA_COMPILATION_CACHE_SIZE", 1024);
+  // Zero means that the in-memory cache is only bounded by its entry count.
+  static const size_t kMaxCacheBytes =
+      runtime::sys_util::GetEnvInt("XLA_COMPILATION_CACHE_MAX_BYTES", 0);
   static const bool readonlyPersistentCache =
       runtime::sys_util::GetEnvBool("XLA_PERSISTENT_CACHE_READ_ONLY", false);
   static std::string persistentCacheDir =
       runtime::sys_util::GetEnvString("XLA_PERSISTENT_CACHE_PATH", "");
+  static const size_t kMaxPersistentCacheBytes =
+      runtime::sys_util::GetEnvInt("XLA_PERSISTENT_CACHE_MAX_BYTES", 0);
+  auto size_fn =
+      [](const XLAGraphExecutor::ComputationCache::TypePtr& computation)
+      -> size_t { return computation->computation->SizeInBytes(); };
   if (!persistentCacheDir.empty()) {
     auto serialize_fn =
         [](XLAGraphExecutor::ComputationCache::TypePtr computation)
@@ -101,9 +109,11 @@ XLAGraphExecutor::ComputationCache* CreateComputationCache() {
     };
     return new XLAGraphExecutor::PersistentCache(
         kMaxCacheSize, persistentCacheDir, readonlyPersistentCache,
-        serialize_fn, deserialize_fn);
+        serialize_fn, deserialize_fn, kMaxCacheBytes, size_fn,
+        kMaxPersistentCacheBytes);
   }
-  return new XLAGraphExecutor::MemoryCache(kMaxCacheSize);
+  return new XLAGraphExecutor::MemoryCache(kMaxCacheSize, kMaxCacheBytes,
+                                           size_fn);
 }
 
 }  // namespace
@@ -385,6 +395,50 @@ void XLAGraphExecutor::SyncTensorsGraph(std::vector<XLATensorPtr>* tensors,
   }
 }
 
+std::function<bool()> XLAGraphExecutor::PrepareWarmUpCache(
+    std::vector<XLATensorPtr>* tensors, absl::Span<const std::string> devices,
+    bool force_ltc_data) {
+  tsl::profiler::TraceMe activity("PrepareWarmUpCache",
+                                  tsl::profiler::TraceMeLevel::kInfo);
+  SyncTensorsConfig config;
+  // A step barrier syncs with both flags set, which also enables the input
+  // output aliasing of the compiled graph.
+  config.sync_ltc_data = force_ltc_data;
+  config.force_ltc_data = force_ltc_data;
+  auto coll = std::make_shared<SyncTensorCollection>(
+      CollectSyncTensors(*tensors, config));
+  if (coll->indices.empty()) {
+    return []() { return false; };
+  }
+  // Unlike ExtractIRAndPrepareXlaData_, keep the IR values of the tensors even
+  // with force_ltc_data, as the graph is only captured here.
+  auto ir_values = std::make_shared<std::vector<torch::lazy::Value>>();
+  ir_values->reserve(coll->indices.size());
+  for (auto index : coll->indices) {
+    ir_values->push_back((*tensors)[index]->CurrentIrValue());
+  }
+  auto po_data =
+      std::make_shared<PostOrderData>(RunPostOrder(*ir_values, coll.get()));
+  coll->hash = torch::lazy::HashCombine(
+      coll->hash, torch::lazy::Hash(po_data->parameter_sequence));
+  TF_VLOG(4) << "Prepared warm up of graph hash "
+             << torch::lazy::HashToString(coll->hash);
+  auto tensors_copy = std::make_shared<std::vector<XLATensorPtr>>(*tensors);
+  std::vector<std::string> compile_devices(devices.begin(), devices.end());
+  return [this, coll, po_data, ir_values, tensors_copy, compile_devices]() {
+    if (LookupCachedCompile(coll->hash) != nullptr) {
+      return false;
+    }
+    CompilationResult compile_result = Compile(
+        *tensors_copy, compile_devices, *coll, po_data.get(), *ir_values);
+    TORCH_LAZY_VALUE_METRIC("TensorsGraphSize", compile_result.emitted_nodes);
+    auto cached_computation = std::make_shared<CachedComputation>(
+        std::move(compile_result.computation), compile_result.is_sharded);
+    GetComputationCache()->Add(coll->hash, cached_computation);
+    return true;
+  };
+}
+
 void XLAGraphExecutor::SyncLiveTensorsGraph(
     const torch::lazy::BackendDevice* device,
     c10::ArrayRef<std::string> devices, bool wait) {
@@ -452,10 +506,10 @@ std::vector<at::Tensor> XLAGraphExecutor::GetTensors(
 }
 
 torch::lazy::hash_t XLAGraphExecutor::GetGraphHash(
-    const std::vector<XLATensorPtr>& tensors) {
+    const std::vector<XLATensorPtr>& tensors, bool force_ltc_data) {
   SyncTensorsConfig config;
   config.sync_ltc_data = true;
-  config.force_ltc_data = false;
+  config.force_ltc_data = force_ltc_data;
 
   SyncTensorCollection coll = CollectSyncTensors(tensors, config);
   absl::Span<const size_t> indices = coll.indices;
@@ -506,6 +560,17 @@ XLAGraphExecutor::ComputationCache* XLAGraphExecutor::GetComputationCache() {
   return computation_cache_;
 }
 
+XLAGraphExecutor::MemoryCache*
+XLAGraphExecutor::GetMemoryComputationCache() {
+  ComputationCache* cache = GetComputationCache();
+  if (auto* persistent_cache = dynamic_cast<PersistentCache*>(cache)) {
+    return &persistent_cache->GetMemoryCache();
+  }
+  auto* memory_cache = dynamic_cast<MemoryCache*>(cache);
+  XLA_CHECK(memory_cache != nullptr) << "Unknown computation cache type";
+  return memory_cache;
+}
+
 void XLAGraphExecutor::ClearPendingIrs(
     std::vector<XLATensorPtr> tensors,
     const torch::lazy::BackendDevice& device) {
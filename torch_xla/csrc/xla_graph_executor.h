@@ -5,6 +5,7 @@
 #include <torch/csrc/autograd/variable.h>
 #include <torch/csrc/lazy/core/ir_util.h>
 
+#include <functional>
 #include <iostream>
 #include <memory>
 #include <string>
@@ -118,6 +119,19 @@ class XLAGraphExecutor : public torch::lazy::LazyGraphExecutor {
                         absl::Span<const std::string> devices, bool wait,
                         bool sync_ltc_data, bool warm_up_cache_only = false);
 
+  // Captures the pending IR graph rooted at the tensors and returns a closure
+  // which lowers and compiles it into the computation cache. The closure holds
+  // its own references to the IR values, so the pending IRs of the tensors can
+  // be cleared before it runs. This allows the compilation to be performed on
+  // a background thread. The closure returns false if the graph was already
+  // cached, and true if it had to be compiled. The force_ltc_data flag is part
+  // of the graph hash: set it to capture the graph the way a step barrier
+  // (mark_step) syncs it, leave it unset to match GetGraphHash and
+  // _run_cached_graph.
+  std::function<bool()> PrepareWarmUpCache(
+      std::vector<XLATensorPtr>* tensors, absl::Span<const std::string> devices,
+      bool force_ltc_data = false);
+
   // Makes sure that any outstanding IR operation accumulated over live tensors,
   // gets turned into device data. If wait is true, the sync operation will be
   // run synchronously. The devices argument, if not empty, tells the devices
@@ -143,7 +157,10 @@ class XLAGraphExecutor : public torch::lazy::LazyGraphExecutor {
   std::vector<at::Tensor> GetTensors(std::vector<XLATensorPtr>* tensors);
 
   // We don't use the upstream GetGraphHash as XLATensorPtr is used instead.
-  torch::lazy::hash_t GetGraphHash(const std::vector<XLATensorPtr>& tensors);
+  // The force_ltc_data flag has to match the one of the sync which runs the
+  // graph, it is set by mark_step.
+  torch::lazy::hash_t GetGraphHash(const std::vector<XLATensorPtr>& tensors,
+                                   bool force_ltc_data = false);
 
   void MaybeDumpGraph(std::string name, torch::lazy::hash_t hash);
 
@@ -170,6 +187,9 @@ class XLAGraphExecutor : public torch::lazy::LazyGraphExecutor {
 
   ComputationCache* GetComputationCache();
   bool IsComputationCacheInitialized();
+  // Returns the in-memory layer of the computation cache, which is the
+  // computation cache itself unless the persistent cache is enabled.
+  MemoryCache* GetMemoryComputationCache();
 
   std::vector<torch::lazy::BackendDataPtr> ExecuteComputationWithBarrier(
       torch::lazy::hash_t hash, const std::vector<at::IValue>& graph_inputs,
@@ -79,3 +79,52 @@ def short_metrics_report(counter_names: list = None, metric_names: list = None):
         'TransferToDeviceTime', 'TransferFromDeviceTime'
     ]
   return torch_xla._XLAC._short_xla_metrics_report(counter_names, metric_names)
+
+
+def computation_cache_entries():
+  """Lists the graphs in the in-memory computation cache.
+
+  Returns:
+    A list of dicts, most recently used first, with the graph `hash` (as a hex
+    string), the `size_bytes` of its executable, the number of cache `hits`,
+    its `last_use` time (in seconds since the epoch) and whether it is
+    `pinned`.
+  """
+  entries = []
+  for entry in torch_xla._XLAC._xla_computation_cache_entries():
+    entries.append({
+        'hash': entry['hash'].hex(),
+        'size_bytes': entry['size_bytes'],
+        'hits': entry['hits'],
+        'last_use': entry['last_use_us'] / 1e6,
+        'pinned': entry['pinned'],
+    })
+  return entries
+
+
+def computation_cache_stats():
+  """Returns the usage, limits, hit/miss and eviction counts of the in-memory
+  computation cache.
+
+  The cache is bounded by `XLA_COMPILATION_CACHE_SIZE` entries and, if set, by
+  `XLA_COMPILATION_CACHE_MAX_BYTES` bytes of executables.
+  """
+  return torch_xla._XLAC._xla_computation_cache_stats()
+
+
+def pin_computation(graph_hash, pinned=True):
+  """Pins (or unpins) a graph in the in-memory computation cache, so that it is
+  never evicted.
+
+  Args:
+    graph_hash (bytes or string): The graph hash, either as returned by
+      `torch_xla._XLAC._get_graph_hash` or as the hex string listed by
+      `computation_cache_entries`.
+    pinned (bool): Whether to pin or unpin the graph.
+
+  Returns:
+    Whether the graph was found in the cache.
+  """
+  if isinstance(graph_hash, str):
+    graph_hash = bytes.fromhex(graph_hash)
+  return torch_xla._XLAC._xla_computation_cache_pin(graph_hash, pinned)
@@ -0,0 +1,180 @@
+"""Inspects and prunes a persistent compilation cache directory.
+
+The directory written by `torch_xla.runtime.initialize_cache` is its own index:
+every file is named after the hash of a graph and holds its serialized
+executable, and the modification time of a file records its last access.
+
+Usage:
+  python -m torch_xla.debug.persistent_cache list /path/to/cache
+  python -m torch_xla.debug.persistent_cache stats /path/to/cache
+  python -m torch_xla.debug.persistent_cache prune /path/to/cache \\
+      --max-bytes 10G --max-age 7d
+"""
+
+import dataclasses
+import os
+import time
+from argparse import ArgumentParser
+from typing import List, Optional
+
+# Must match the prefix of the temporary files written by PersistentCache.
+_TEMP_PREFIX = '.tmp-'
+# Temporary files older than this are leftovers of crashed writers.
+_STALE_TEMP_SECONDS = 3600
+
+_SIZE_UNITS = {'K': 1 << 10, 'M': 1 << 20, 'G': 1 << 30, 'T': 1 << 40}
+_AGE_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+@dataclasses.dataclass
+class CacheEntry:
+  name: str
+  size_bytes: int
+  # Last access time, in seconds since the epoch.
+  last_access: float
+
+
+def list_entries(cache_dir: str) -> List[CacheEntry]:
+  """Lists the entries of the cache, most recently accessed first."""
+  entries = []
+  with os.scandir(cache_dir) as it:
+    for dir_entry in it:
+      if dir_entry.name.startswith(_TEMP_PREFIX) or not dir_entry.is_file():
+        continue
+      try:
+        stat = dir_entry.stat()
+      except FileNotFoundError:
+        # Evicted by a concurrent writer.
+        continue
+      entries.append(CacheEntry(dir_entry.name, stat.st_size, stat.st_mtime))
+  entries.sort(key=lambda e: e.last_access, reverse=True)
+  return entries
+
+
+def cache_stats(cache_dir: str) -> dict:
+  """Returns the number of entries, the total size and the access time range
+  of the cache."""
+  entries = list_entries(cache_dir)
+  return {
+      'num_entries': len(entries),
+      'total_bytes': sum(e.size_bytes for e in entries),
+      'oldest_access': min((e.last_access for e in entries), default=None),
+      'newest_access': max((e.last_access for e in entries), default=None),
+  }
+
+
+def prune(cache_dir: str,
+          max_bytes: Optional[int] = None,
+          max_age: Optional[float] = None,
+          dry_run: bool = False) -> List[CacheEntry]:
+  """Removes the least recently accessed entries of the cache.
+
+  Args:
+    cache_dir: The cache directory.
+    max_bytes: Remove entries until the cache is at most this size.
+    max_age: Remove the entries not accessed for more than this many seconds.
+    dry_run: Only report the entries which would be removed.
+
+  Returns:
+    The removed entries.
+  """
+  now = time.time()
+  entries = list_entries(cache_dir)
+  total_bytes = sum(e.size_bytes for e in entries)
+  removed = []
+  # Least recently accessed first.
+  for entry in reversed(entries):
+    too_old = max_age is not None and now - entry.last_access > max_age
+    too_big = max_bytes is not None and total_bytes > max_bytes
+    if not (too_old or too_big):
+      continue
+    if not dry_run:
+      try:
+        os.remove(os.path.join(cache_dir, entry.name))
+      except FileNotFoundError:
+        pass
+    total_bytes -= entry.size_bytes
+    removed.append(entry)
+
+  if not dry_run:
+    with os.scandir(cache_dir) as it:
+      for dir_entry in it:
+        if not dir_entry.name.startswith(_TEMP_PREFIX):
+          continue
+        try:
+          if now - dir_entry.stat().st_mtime > _STALE_TEMP_SECONDS:
+            os.remove(dir_entry.path)
+        except FileNotFoundError:
+          pass
+  return removed
+
+
+def _parse_size(value: str) -> int:
+  value = value.strip().upper().rstrip('B')
+  if value and value[-1] in _SIZE_UNITS:
+    return int(float(value[:-1]) * _SIZE_UNITS[value[-1]])
+  return int(value)
+
+
+def _parse_age(value: str) -> float:
+  value = value.strip()
+  if value and value[-1] in _AGE_UNITS:
+    return float(value[:-1]) * _AGE_UNITS[value[-1]]
+  return float(value)
+
+
+def _format_time(timestamp: Optional[float]) -> str:
+  if timestamp is None:
+    return '-'
+  return time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(timestamp))
+
+
+def main():
+  parser = ArgumentParser(
+      description='Inspect and prune a persistent compilation cache.')
+  subparsers = parser.add_subparsers(dest='command', required=True)
+  list_parser = subparsers.add_parser(
+      'list', help='List the entries, most recently accessed first.')
+  list_parser.add_argument('cache_dir')
+  stats_parser = subparsers.add_parser('stats', help='Summarize the cache.')
+  stats_parser.add_argument('cache_dir')
+  prune_parser = subparsers.add_parser(
+      'prune', help='Remove the least recently accessed entries.')
+  prune_parser.add_argument('cache_dir')
+  prune_parser.add_argument(
+      '--max-bytes',
+      type=_parse_size,
+      default=None,
+      help='Target max size of the cache, eg. 500M or 10G.')
+  prune_parser.add_argument(
+      '--max-age',
+      type=_parse_age,
+      default=None,
+      help='Remove entries not accessed for this long, eg. 12h or 7d.')
+  prune_parser.add_argument(
+      '--dry-run',
+      action='store_true',
+      help='Only print the entries which would be removed.')
+  args = parser.parse_args()
+
+  if args.command == 'list':
+    for entry in list_entries(args.cache_dir):
+      print(f'{entry.name}\t{entry.size_bytes}\t'
+            f'{_format_time(entry.last_access)}')
+  elif args.command == 'stats':
+    stats = cache_stats(args.cache_dir)
+    print(f"entries: {stats['num_entries']}")
+    print(f"total bytes: {stats['total_bytes']}")
+    print(f"oldest access: {_format_time(stats['oldest_access'])}")
+    print(f"newest access: {_format_time(stats['newest_access'])}")
+  elif args.command == 'prune':
+    if args.max_bytes is None and args.max_age is None:
+      parser.error('prune requires --max-bytes and/or --max-age')
+    removed = prune(args.cache_dir, args.max_bytes, args.max_age, args.dry_run)
+    verb = 'Would remove' if args.dry_run else 'Removed'
+    print(f'{verb} {len(removed)} entries, '
+          f'{sum(e.size_bytes for e in removed)} bytes')
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,240 @@
+from concurrent import futures
+from typing import (Any, Dict, Iterator, List, Optional, Type)
+
+import torch
+from torch import Tensor
+from torch.optim import Optimizer
+
+import torch_xla
+import torch_xla.core.xla_model as xm
+
+
+def get_buckets(tensors: List[Tensor],
+                bucket_cap_bytes: int) -> List[List[int]]:
+  """
+  Split the indices of `tensors` into consecutive buckets of at most
+  `bucket_cap_bytes`. A tensor larger than `bucket_cap_bytes` gets its own
+  bucket.
+  """
+  buckets, bucket, bucket_bytes = [], [], 0
+  for i, tensor in enumerate(tensors):
+    size = tensor.numel() * tensor.element_size()
+    if bucket and bucket_bytes + size > bucket_cap_bytes:
+      buckets.append(bucket)
+      bucket, bucket_bytes = [], 0
+    bucket.append(i)
+    bucket_bytes += size
+  if bucket:
+    buckets.append(bucket)
+  return buckets
+
+
+class _Bucket(object):
+
+  def __init__(self, params: List[Tensor], group_index: int):
+    self.params = params
+    self.group_index = group_index
+    self.master: Optional[Tensor] = None
+    # The wrapped optimizer which updates `master`.
+    self.optimizer: Optional[Optimizer] = None
+
+
+class CPUOffloadOptimizer(Optimizer):
+  r"""
+    Optimizer wrapper which keeps the master weights and the states of the
+    wrapped optimizer in host memory, and runs its step on the CPU.
+
+    The parameters of each parameter group are packed into buckets of at most
+    ``bucket_cap_bytes``, and each bucket is backed by a single flat master
+    tensor on the CPU, updated by its own instance of the wrapped optimizer.
+    In ``step``, each bucket is updated once, while the gradients of the next
+    buckets are copied to the host and the updated masters of the previous
+    buckets are copied back to the device.
+
+    This can be used with the sharded parameters of
+    :class:`XlaFullyShardedDataParallel`, and by
+    :class:`ZeroRedundancyOptimizer` with ``offload_optimizer_state=True``.
+
+    Arguments:
+        params (``Iterable``): an ``Iterable`` of :class:`torch.Tensor` s
+            or :class:`dict` s giving the device parameters to optimize.
+        optimizer_class (:class:`torch.nn.Optimizer`): the class of the
+            optimizer to run on the CPU. It must be elementwise (e.g. SGD,
+            Adam or AdamW), as it sees the flattened buckets instead of the
+            original parameters.
+        optimizer_dtype (:class:`torch.dtype`, optional): the data type of the
+            master weights and the gradients on the CPU.
+            Default: ``torch.float32``
+        bucket_cap_bytes (int, Optional): the max size in bytes of the device
+            parameters of a bucket. Default: 25 MiB
+        **defaults: any trailing arguments, which are forwarded to the wrapped
+            optimizer.
+
+    .. note:: ``step`` executes the pending graph with ``xm.mark_step()`` to
+        materialize the gradients before copying them to the host. All the
+        parameters of a bucket must have gradients in a step, if any has one.
+    """
+
+  def __init__(
+      self,
+      params: Iterator[Tensor],
+      optimizer_class: Type[Optimizer],
+      optimizer_dtype: Optional[Any] = None,
+      bucket_cap_bytes: int = 25 * 1024 * 1024,
+      **defaults: Any,
+  ):
+    super().__init__(params, defaults)
+    if bucket_cap_bytes <= 0:
+      raise ValueError(
+          f"bucket_cap_bytes must be positive, got {bucket_cap_bytes}")
+    self.optimizer_class = optimizer_class
+    self.optimizer_dtype = optimizer_dtype if optimizer_dtype is not None else torch.float32
+    self.bucket_cap_bytes = bucket_cap_bytes
+
+    self._buckets: List[_Bucket] = []
+    for group_index, param_group in enumerate(self.param_groups):
+      params = param_group['params']
+      options = {k: v for k, v in param_group.items() if k != 'params'}
+      for bucket in get_buckets(params, bucket_cap_bytes):
+        bucket = _Bucket([params[i] for i in bucket], group_index)
+        self._load_master(bucket)
+        # Each bucket has its own wrapped optimizer, so that its step runs
+        # once per bucket and the buckets can be copied back one by one.
+        bucket.optimizer = optimizer_class(
+            [dict(options, params=[bucket.master])], **defaults)
+        self._buckets.append(bucket)
+    self.device = self._buckets[0].params[0].device if self._buckets else None
+    # Copy the gradients to the host, and the updated masters to the device,
+    # while the CPU updates the other buckets.
+    self._d2h_executor = futures.ThreadPoolExecutor(max_workers=1)
+    self._h2d_executor = futures.ThreadPoolExecutor(max_workers=1)
+
+  @staticmethod
+  def _sync_param_groups(
+      src_param_groups: List[Dict[Any, Any]],
+      dst_param_groups: List[Dict[Any, Any]],
+  ) -> None:
+    """
+    Syncs the attributes from the source parameter groups to the destination
+    parameter groups, except the parameters.
+    """
+    for src_param_group, dst_param_group in zip(src_param_groups,
+                                                dst_param_groups):
+      for attr in filter(lambda x: x != "params", src_param_group.keys()):
+        dst_param_group[attr] = src_param_group[attr]
+
+  @torch.no_grad()
+  def _load_master(self, bucket: _Bucket) -> None:
+    """Copy the device parameters of ``bucket`` into its master weights."""
+    cpu_params = xm._maybe_convert_to_cpu(
+        [param.detach() for param in bucket.params])
+    master = torch.cat([param.reshape(-1) for param in cpu_params
+                       ]).to(dtype=self.optimizer_dtype)
+    if bucket.master is None:
+      bucket.master = master
+    else:
+      bucket.master.copy_(master)
+
+  def _fetch_flat_grad(self, bucket: _Bucket) -> Tensor:
+    """Copy the gradients of ``bucket`` to the host as a flat tensor."""
+    grads = torch_xla._XLAC._xla_get_cpu_tensors(
+        [param.grad for param in bucket.params])
+    return torch.cat([grad.reshape(-1) for grad in grads
+                     ]).to(dtype=self.optimizer_dtype)
+
+  def _send_master(self, bucket: _Bucket) -> Tensor:
+    """Copy the master weights of ``bucket`` to the device."""
+    return xm.send_cpu_data_to_device(bucket.master, self.device)[0]
+
+  @torch.no_grad()
+  def _copy_to_device(self, bucket: _Bucket, flat_param: Tensor) -> None:
+    """
+    Copy ``flat_param``, the master weights of ``bucket`` sent to the device
+    by :func:`_send_master`, into the device parameters of ``bucket``.
+    """
+    offset = 0
+    for param in bucket.params:
+      numel = param.numel()
+      param.data.copy_(flat_param[offset:offset + numel].view_as(param))
+      offset += numel
+
+  def _get_buckets_to_step(self) -> List[_Bucket]:
+    buckets = []
+    for bucket in self._buckets:
+      has_grad = [param.grad is not None for param in bucket.params]
+      if not any(has_grad):
+        continue
+      if not all(has_grad):
+        raise RuntimeError(
+            "CPUOffloadOptimizer requires all parameters of a bucket to have gradients"
+        )
+      buckets.append(bucket)
+    return buckets
+
+  @torch.no_grad()
+  def step(self, closure=None, **kwargs):
+    """
+    Performs a single optimizer step on the CPU and copies the updated
+    parameters back to the device.
+    """
+    loss = None
+    if closure is not None:
+      with torch.enable_grad():
+        loss = closure()
+
+    buckets = self._get_buckets_to_step()
+    if not buckets:
+      return loss
+
+    # Materialize the gradients on the device, so that copying them to the
+    # host does not re-execute the graph for each bucket.
+    xm.mark_step()
+    flat_grads = [
+        self._d2h_executor.submit(self._fetch_flat_grad, bucket)
+        for bucket in buckets
+    ]
+    flat_params = []
+    for bucket, flat_grad in zip(buckets, flat_grads):
+      self._sync_param_groups([self.param_groups[bucket.group_index]],
+                              bucket.optimizer.param_groups)
+      bucket.master.grad = flat_grad.result()
+      bucket.optimizer.step(**kwargs)
+      bucket.master.grad = None
+      flat_params.append(self._h2d_executor.submit(self._send_master, bucket))
+    for bucket, flat_param in zip(buckets, flat_params):
+      self._copy_to_device(bucket, flat_param.result())
+    return loss
+
+  def state_dict(self) -> Dict[str, Any]:
+    """
+    Returns the states of the wrapped optimizers, in the format of the state
+    dict of a single wrapped optimizer whose parameters are the masters of
+    all the buckets.
+    """
+    state = {}
+    param_groups = [
+        dict(param_group, params=[]) for param_group in self.param_groups
+    ]
+    for index, bucket in enumerate(self._buckets):
+      bucket_state_dict = bucket.optimizer.state_dict()
+      if 0 in bucket_state_dict['state']:
+        state[index] = bucket_state_dict['state'][0]
+      param_group = param_groups[bucket.group_index]
+      # The options of the wrapped optimizer, with its own defaults.
+      param_group.update(
+          bucket_state_dict['param_groups'][0],
+          params=param_group['params'] + [index])
+    return {'state': state, 'param_groups': param_groups}
+
+  def load_state_dict(self, state_dict: Dict[str, Any]) -> None:
+    for index, bucket in enumerate(self._buckets):
+      # The device parameters may have been loaded from a checkpoint too.
+      self._load_master(bucket)
+      param_group = state_dict['param_groups'][bucket.group_index]
+      bucket.optimizer.load_state_dict({
+          'state': {
+              0: state_dict['state'][index]
+          } if index in state_dict['state'] else {},
+          'param_groups': [dict(param_group, params=[0])],
+      })
+    self._sync_param_groups(state_dict['param_groups'], self.param_groups)
@@ -1,4 +1,5 @@
 import collections
+import hashlib
 import warnings
 from typing import (
     Any,
@@ -15,9 +16,12 @@ from typing import (
     Type,
     Union,
 )
+from itertools import chain
 
 import torch
 import torch.nn as nn
+from torch.utils._python_dispatch import TorchDispatchMode
+from torch.utils._pytree import tree_flatten
 import torch_xla.core.xla_model as xm
 
 from .xla_flatten_params_wrapper import FlatParameter
@@ -98,3 +102,171 @@ def _get_orig_params(
         yield param
   except StopIteration:
     pass
+
+
+aten = torch.ops.aten
+
+# Ops which overwrite all the elements of a tensor with i.i.d. random values.
+_RANDOM_INIT_OPS = (aten.uniform_.default, aten.normal_.default)
+# Ops which overwrite all the elements of a tensor with a constant.
+_FILL_INIT_OPS = (aten.fill_.Scalar, aten.zero_.default)
+# The random values of a parameter are generated in blocks of this many
+# elements, each with its own seed, so that any slice of the parameter can be
+# initialized without generating the values before it.
+_INIT_BLOCK_SIZE = 1 << 16
+
+
+def _stable_seed(*parts: Any) -> int:
+  """A seed derived from ``parts``, which is the same in all processes."""
+  digest = hashlib.sha256(repr(parts).encode()).hexdigest()
+  return int(digest[:15], 16)
+
+
+class _InitRecipeRecorder(TorchDispatchMode):
+  """
+    Records the in-place elementwise ops run on meta tensors by their
+    initialization. The recorded ops (the recipe of a tensor) can then be
+    replayed on any slice of the tensor.
+    """
+
+  def __init__(self, tensors: List[torch.Tensor]):
+    super().__init__()
+    self.recipes = {id(t): [] for t in tensors}
+    self.unsupported = set()
+    # Maps the id of a view of a recorded tensor to the view and the id of
+    # the tensor. The view is kept alive so that its id is not reused.
+    self.aliases = {}
+
+  def __torch_dispatch__(self, func, types, args=(), kwargs=None):
+    kwargs = kwargs or {}
+    out = func(*args, **kwargs)
+    target = args[0] if args and isinstance(args[0], torch.Tensor) else None
+    if target is None:
+      return out
+    key = id(target)
+    if func.is_view and (key in self.recipes or key in self.aliases):
+      base = key if key in self.recipes else self.aliases[key][1]
+      self.aliases[id(out)] = (out, base)
+    elif func._schema.is_mutable and key in self.aliases:
+      # Writes to a part of a tensor cannot be replayed on a slice.
+      self.unsupported.add(self.aliases[key][1])
+    elif func._schema.is_mutable and key in self.recipes:
+      other_args = [
+          a for a in tree_flatten((args[1:], kwargs))[0]
+          if isinstance(a, torch.Tensor)
+      ]
+      if func in _RANDOM_INIT_OPS or func in _FILL_INIT_OPS:
+        self.recipes[key] = [(func, args[1:], kwargs)]
+      elif torch.Tag.pointwise in func.tags and not other_args:
+        self.recipes[key].append((func, args[1:], kwargs))
+      else:
+        self.unsupported.add(key)
+    return out
+
+
+def _reset_parameters(module: nn.Module, check_fn: Callable) -> None:
+  """
+    Calls ``reset_parameters()`` on ``module`` and its submodules which have
+    meta parameters or buffers.
+    """
+  if not check_fn(module):
+    return
+  has_meta_tensors = any(
+      t is not None and t.is_meta for t in chain(
+          module.parameters(recurse=False), module.buffers(recurse=False)))
+  if has_meta_tensors and hasattr(module, "reset_parameters"):
+    module.reset_parameters()
+  for child in module.children():
+    _reset_parameters(child, check_fn)
+
+
+def _record_init_recipes(
+    module: nn.Module,
+    param_init_fn: Optional[Callable[[nn.Module], None]],
+    check_fn: Callable,
+) -> Dict[Tuple[nn.Module, str], Tuple[str, List[Any]]]:
+  """
+    Runs the initialization of the meta parameters and buffers of ``module``
+    on the meta device, and records the ops it runs on each of them. The
+    initialization is ``param_init_fn`` if it is not ``None``, and otherwise
+    the ``reset_parameters()`` method of each submodule for which ``check_fn``
+    returns ``True``. Only initializations made of random fills (``uniform_``
+    and ``normal_``), constant fills, and in-place elementwise ops with scalar
+    arguments (such as ``nn.init.trunc_normal_``) can be recorded.
+    Returns:
+        A dict mapping the module and attribute name of each meta tensor to its
+        qualified name and its recipe.
+    """
+  tensors = collections.OrderedDict()
+  for module_name, m in module.named_modules():
+    for n, t in chain(
+        m.named_parameters(recurse=False), m.named_buffers(recurse=False)):
+      if t is not None and t.is_meta and id(t) not in tensors:
+        name = f"{module_name}.{n}" if module_name else n
+        tensors[id(t)] = (m, n, name, t)
+
+  recorder = _InitRecipeRecorder([t for _, _, _, t in tensors.values()])
+  with torch.no_grad(), recorder:
+    if param_init_fn is not None:
+      param_init_fn(module)
+    else:
+      _reset_parameters(module, check_fn)
+
+  recipes = {}
+  failed = []
+  for key, (m, n, name, _) in tensors.items():
+    if key in recorder.unsupported or not recorder.recipes[key]:
+      failed.append(name)
+    recipes[(m, n)] = (name, recorder.recipes[key])
+  if failed:
+    raise ValueError(
+        f"Cannot initialize {failed} shard by shard, their initialization "
+        "is not made of random fills, constant fills and elementwise ops. "
+        "Use sharded_param_init=False for this module.")
+  return recipes
+
+
+def _init_slice(recipe: List[Any], begin: int, end: int, dtype: torch.dtype,
+                seed: int) -> torch.Tensor:
+  """
+    Replays ``recipe`` on the elements ``[begin, end)`` of a flattened
+    tensor. The values do not depend on the slice boundaries.
+    """
+  out = torch.zeros(end - begin, dtype=dtype)
+  if end <= begin:
+    return out
+  for op_index, (func, args, kwargs) in enumerate(recipe):
+    if func not in _RANDOM_INIT_OPS:
+      func(out, *args, **kwargs)
+      continue
+    values = []
+    for block in range(begin // _INIT_BLOCK_SIZE,
+                       (end - 1) // _INIT_BLOCK_SIZE + 1):
+      block_begin = block * _INIT_BLOCK_SIZE
+      generator = torch.Generator().manual_seed(
+          _stable_seed(seed, op_index, block))
+      block_values = func(
+          torch.empty(_INIT_BLOCK_SIZE, dtype=dtype), *args,
+          **dict(kwargs, generator=generator))
+      values.append(block_values[max(begin - block_begin, 0):end - block_begin])
+    out.copy_(torch.cat(values))
+  return out
+
+
+def _init_flat_shard(components: List[Tuple[int, List[Any], int]], begin: int,
+                     end: int, dtype: torch.dtype) -> torch.Tensor:
+  """
+    Initializes the elements ``[begin, end)`` of the concatenation of the
+    flattened tensors described by ``components``, a list of
+    ``(seed, recipe, numel)``, without building the full tensors. The
+    elements past the end of the concatenation (the padding) are zeros.
+    """
+  out = torch.zeros(end - begin, dtype=dtype)
+  offset = 0
+  for seed, recipe, numel in components:
+    lo, hi = max(begin, offset), min(end, offset + numel)
+    if lo < hi:
+      out[lo - begin:hi - begin] = _init_slice(recipe, lo - offset, hi - offset,
+                                               dtype, seed)
+    offset += numel
+  return out
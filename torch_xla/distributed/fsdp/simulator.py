@@ -0,0 +1,259 @@
+import dataclasses
+import itertools
+from typing import Any, Callable, Dict, List, Optional
+
+import torch
+import torch.nn as nn
+
+from .wrap import recursive_wrap
+
+
+@dataclasses.dataclass
+class FsdpSimulation:
+  """
+  The per-device collectives and memory of one training step of a model
+  wrapped with :class:`XlaFullyShardedDataParallel`, as computed by
+  :func:`simulate_fsdp`. Bytes are in the compute dtype.
+  """
+  config: Dict[str, Any]
+  num_units: int
+  # The number of collective ops, and the bytes of their full (unsharded)
+  # tensors, in the forward and backward passes.
+  all_gather_ops: int
+  all_gather_bytes: int
+  reduce_scatter_ops: int
+  reduce_scatter_bytes: int
+  # The bytes of the parameter shards of a device.
+  sharded_param_bytes: int
+  # The max bytes of the full parameters gathered at the same time.
+  peak_full_param_bytes: int
+  # The bytes added by padding the parameters to the world size.
+  padding_bytes: int
+
+  @property
+  def collective_ops(self) -> int:
+    return self.all_gather_ops + self.reduce_scatter_ops
+
+  @property
+  def peak_param_bytes(self) -> int:
+    return self.sharded_param_bytes + self.peak_full_param_bytes
+
+
+class _Unit(object):
+
+  def __init__(self, module: nn.Module, params: List[nn.Parameter]):
+    self.module = module
+    self.params = params
+    self.parent = None
+
+
+def _collect_units(module: nn.Module,
+                   auto_wrap_policy: Optional[Callable]) -> List[_Unit]:
+  """
+  Run the auto wrapping of FSDP on ``module`` with a wrapper which records the
+  FSDP units and their parameters instead of wrapping the modules. The root
+  unit is the last one.
+  """
+  units = []
+  claimed = set()
+
+  def _record_unit(m: nn.Module, **kwargs) -> nn.Module:
+    params = [p for p in m.parameters() if p not in claimed]
+    claimed.update(params)
+    unit = _Unit(m, params)
+    submodules = set(m.modules())
+    for child in units:
+      if child.parent is None and child.module in submodules:
+        child.parent = unit
+    units.append(unit)
+    return m
+
+  if auto_wrap_policy is not None:
+    recursive_wrap(
+        module,
+        auto_wrap_policy=auto_wrap_policy,
+        wrapper_cls=_record_unit,
+        ignored_modules=set(),
+        ignored_params=set(),
+        only_wrap_children=True)
+  _record_unit(module)
+  return units
+
+
+def simulate_fsdp(
+    module: nn.Module,
+    world_size: int,
+    auto_wrap_policy: Optional[Callable] = None,
+    reshard_after_forward: bool = True,
+    flatten_parameters: bool = False,
+    shard_size_multiple: int = 128,
+    coalesce_all_gather_ops: bool = False,
+    coalesce_reduce_scatter_ops: bool = False,
+    reduce_scatter_bucket_bytes: int = 25 * 1024 * 1024,
+    disable_reshard_on_root: bool = True,
+    compute_dtype: Optional[torch.dtype] = None,
+) -> FsdpSimulation:
+  """
+  Compute the collectives and the parameter memory of a training step of
+  ``module`` wrapped with :class:`XlaFullyShardedDataParallel` with the given
+  arguments, without any device. Only the shapes of the parameters are used,
+  so ``module`` can be on the meta device, and it is not modified.
+
+  The FSDP units are found with the same auto wrapping as FSDP, and the
+  parameters are padded to a multiple of ``world_size * shard_size_multiple``
+  as in ``_flatten_and_pad_to_world_size``. The full parameters of a unit are
+  gathered during its forward pass, and again during its backward pass if it
+  is resharded after the forward pass, while the full parameters of the units
+  around it stay gathered.
+  """
+  pad_multiple = world_size * shard_size_multiple
+
+  def _bytes(numel: int, dtype: torch.dtype) -> int:
+    return numel * torch.finfo(compute_dtype or dtype).bits // 8
+
+  units = _collect_units(module, auto_wrap_policy)
+  root = units[-1]
+  all_gather_ops = all_gather_bytes = 0
+  reduce_scatter_bytes = padding_bytes = 0
+  grad_bytes = {}
+  full_bytes = {}
+  for unit in units:
+    # The tensors gathered and reduced by FSDP, as (numel, dtype, trainable).
+    if flatten_parameters:
+      tensors = []
+      for trainable in (True, False):
+        group = [p for p in unit.params if p.requires_grad == trainable]
+        if group:
+          tensors.append(
+              (sum(p.numel() for p in group), group[0].dtype, trainable))
+    else:
+      tensors = [(p.numel(), p.dtype, p.requires_grad) for p in unit.params]
+
+    sizes = [
+        _bytes(-(-numel // pad_multiple) * pad_multiple, dtype)
+        for numel, dtype, _ in tensors
+    ]
+    full_bytes[unit] = sum(sizes)
+    padding_bytes += full_bytes[unit] - sum(
+        _bytes(numel, dtype) for numel, dtype, _ in tensors)
+    num_gathers = 1 if coalesce_all_gather_ops and tensors else len(tensors)
+    reshard = reshard_after_forward and not (unit is root and
+                                             disable_reshard_on_root)
+    num_passes = 2 if reshard else 1
+    all_gather_ops += num_passes * num_gathers
+    all_gather_bytes += num_passes * full_bytes[unit]
+    grad_bytes[unit] = [
+        size for size, (_, _, trainable) in zip(sizes, tensors) if trainable
+    ]
+    reduce_scatter_bytes += sum(grad_bytes[unit])
+
+  reduce_scatter_ops = 0
+  for sizes in grad_bytes.values():
+    if not coalesce_reduce_scatter_ops:
+      reduce_scatter_ops += len(sizes)
+      continue
+    # Each unit fills its own buckets, and reduces its last partial bucket
+    # once all its gradients are in.
+    bucket_bytes = 0
+    for size in sizes:
+      bucket_bytes += size
+      if bucket_bytes >= reduce_scatter_bucket_bytes:
+        reduce_scatter_ops += 1
+        bucket_bytes = 0
+    reduce_scatter_ops += 1 if bucket_bytes else 0
+
+  if reshard_after_forward:
+    # A unit runs inside the forward pass of all the units around it.
+    peak_full_param_bytes = 0
+    for unit in units:
+      path_bytes = 0
+      while unit is not None:
+        path_bytes += full_bytes[unit]
+        unit = unit.parent
+      peak_full_param_bytes = max(peak_full_param_bytes, path_bytes)
+  else:
+    peak_full_param_bytes = sum(full_bytes.values())
+
+  config = dict(
+      world_size=world_size,
+      auto_wrap_policy=auto_wrap_policy,
+      reshard_after_forward=reshard_after_forward,
+      flatten_parameters=flatten_parameters,
+      shard_size_multiple=shard_size_multiple,
+      coalesce_all_gather_ops=coalesce_all_gather_ops,
+      coalesce_reduce_scatter_ops=coalesce_reduce_scatter_ops,
+      reduce_scatter_bucket_bytes=reduce_scatter_bucket_bytes,
+  )
+  return FsdpSimulation(
+      config=config,
+      num_units=len(units),
+      all_gather_ops=all_gather_ops,
+      all_gather_bytes=all_gather_bytes,
+      reduce_scatter_ops=reduce_scatter_ops,
+      reduce_scatter_bytes=reduce_scatter_bytes,
+      sharded_param_bytes=sum(full_bytes.values()) // world_size,
+      peak_full_param_bytes=peak_full_param_bytes,
+      padding_bytes=padding_bytes,
+  )
+
+
+def default_fsdp_configs(
+    auto_wrap_policies: Optional[List[Callable]] = None
+) -> List[Dict[str, Any]]:
+  """
+  The candidate configurations ranked by default by
+  :func:`rank_fsdp_configs`: all the combinations of ``auto_wrap_policies``
+  (no auto wrapping by default), ``reshard_after_forward``,
+  ``flatten_parameters``, ``coalesce_all_gather_ops`` and a
+  ``shard_size_multiple`` of 1 or 128.
+  """
+  if auto_wrap_policies is None:
+    auto_wrap_policies = [None]
+  return [
+      dict(
+          auto_wrap_policy=policy,
+          reshard_after_forward=reshard,
+          flatten_parameters=flatten,
+          coalesce_all_gather_ops=coalesce,
+          shard_size_multiple=multiple,
+      ) for policy, reshard, flatten, coalesce, multiple in itertools.product(
+          auto_wrap_policies, (True, False), (False, True), (False,
+                                                             True), (1, 128))
+  ]
+
+
+def rank_fsdp_configs(
+    module: nn.Module,
+    world_size: int,
+    configs: Optional[List[Dict[str, Any]]] = None,
+    memory_budget_bytes: Optional[int] = None,
+) -> List[FsdpSimulation]:
+  """
+  Simulate ``module`` with each of ``configs`` (keyword arguments of
+  :func:`simulate_fsdp`, :func:`default_fsdp_configs` by default), and sort
+  the results from the best to the worst. The configurations whose peak
+  parameter memory fits ``memory_budget_bytes`` come first, and they are then
+  sorted by number of collective ops, bytes communicated and peak parameter
+  memory.
+
+  Example::
+
+      >>> with torch.device('meta'):
+      >>>   model = MyModel()
+      >>> for sim in rank_fsdp_configs(model, world_size=64)[:3]:
+      >>>   print(sim)
+  """
+  if configs is None:
+    configs = default_fsdp_configs()
+  simulations = [
+      simulate_fsdp(module, world_size, **config) for config in configs
+  ]
+
+  def _key(sim: FsdpSimulation):
+    fits = (
+        memory_budget_bytes is None or
+        sim.peak_param_bytes <= memory_budget_bytes)
+    comm_bytes = sim.all_gather_bytes + sim.reduce_scatter_bytes
+    return (not fits, sim.collective_ops, comm_bytes, sim.peak_param_bytes)
+
+  return sorted(simulations, key=_key)
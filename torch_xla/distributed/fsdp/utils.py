@@ -5,10 +5,14 @@ import torch_xla.core.xla_model as xm
 from torch_xla.utils.checkpoint import checkpoint
 
 
-def checkpoint_module(module):
+def checkpoint_module(module, policy=None):
   """
   Wrap a `module`'s `forward` method with gradient checkpointing (also called
   activation checkpointing) via `torch_xla.utils.checkpoint.checkpoint`.
+
+  If `policy` is given, only the ops it rejects are recomputed in the backward
+  pass, and the outputs of the others are saved (selective checkpointing). See
+  `torch_xla.utils.checkpoint.flops_per_byte_policy`.
   """
 
   def _xla_checkpointed_forward_no_kwargs(m, num_args, num_kwargs,
@@ -27,8 +31,12 @@ def checkpoint_module(module):
     input_requires_grad = any(
         isinstance(t, torch.Tensor) and t.requires_grad for t in packed_args)
     if input_requires_grad:
-      outputs = checkpoint(m._xla_checkpointed_forward_no_kwargs, len(args),
-                           len(kwargs), *packed_args)
+      outputs = checkpoint(
+          m._xla_checkpointed_forward_no_kwargs,
+          len(args),
+          len(kwargs),
+          *packed_args,
+          policy=policy)
     else:
       # No input requires gradients so we won't checkpoint this forward pass.
       # Note that `m`` might have parameters that require gradients, but they
@@ -45,6 +53,33 @@ def checkpoint_module(module):
   return module
 
 
+def get_hybrid_shard_groups(shard_size, world_size=None):
+  """
+  Build the sharding and replica groups to shard parameters over groups of
+  `shard_size` consecutive ranks and replicate them across these groups, e.g.
+  with `shard_size=4` and `world_size=8`:
+
+      sharding_groups = [[0, 1, 2, 3], [4, 5, 6, 7]]
+      replica_groups = [[0, 4], [1, 5], [2, 6], [3, 7]]
+
+  Both are in the format of the `groups` argument of `xm.all_reduce`.
+  """
+  world_size = world_size or xm.xrt_world_size()
+  if shard_size <= 0 or world_size % shard_size != 0:
+    raise ValueError(
+        f"The world size {world_size} is not a multiple of the shard size {shard_size}"
+    )
+  num_replicas = world_size // shard_size
+  sharding_groups = [
+      list(range(i * shard_size, (i + 1) * shard_size))
+      for i in range(num_replicas)
+  ]
+  replica_groups = [
+      list(range(i, world_size, shard_size)) for i in range(shard_size)
+  ]
+  return sharding_groups, replica_groups
+
+
 def dummy_all_gather(value, dim=0, groups=None):
   """A dummy op for debugging with the same output shape as all_gather"""
   repeat_num = [1] * value.dim()
@@ -64,8 +99,14 @@ def dummy_reduce_scatter(reduce_type,
                          scale,
                          scatter_dim,
                          shard_count,
-                         groups=None):
+                         groups=None,
+                         output=None):
   """A dummy op for debugging with the same output shape as reduce_scatter"""
+  if isinstance(input, list):
+    return [
+        dummy_reduce_scatter(reduce_type, t, scale, scatter_dim, shard_count,
+                             groups) for t in input
+    ]
   assert shard_count == xm.xrt_world_size()
   full_size = input.size(scatter_dim)
   shard_size = full_size // xm.xrt_world_size()
@@ -1,9 +1,15 @@
 # This file is largely adapted from ``torch.distributed.fsdp.wrap`` in
 # https://github.com/pytorch/pytorch/blob/v1.13.0/torch/distributed/fsdp/wrap.py
 
-from typing import Any, Callable, Set, Tuple, Optional, Type, cast
+import dataclasses
+import functools
+import json
+import warnings
+from typing import Any, Callable, Dict, List, Set, Tuple, Optional, Type, cast
 
+import torch
 import torch.nn as nn
+import torch_xla.utils.utils as xu
 
 
 def always_wrap_policy(*args, **kwargs) -> bool:
@@ -134,6 +140,243 @@ size_based_auto_wrap_policy.EXCLUDE_WRAP_MODULES = {
 size_based_auto_wrap_policy.FORCE_LEAF_MODULES = {nn.MultiheadAttention}
 
 
+def planned_auto_wrap_policy(
+    module: nn.Module,
+    recurse: bool,
+    unwrapped_params: int,
+    wrap_modules: Set[nn.Module],
+) -> bool:
+  """
+  An auto wrap policy which wraps the modules chosen by an
+  :class:`AutoWrapPlan`. Use ``AutoWrapPlan.auto_wrap_policy`` to build it.
+  The first three parameters are required by :func:`_recursive_wrap`.
+  Args:
+     module (nn.Module):
+         The module to be considered in this decision.
+     recurse (bool):
+         Indicate if this is called to make a decision on whether we
+         should recurse down a subgraph of the module structure.
+         If False, it means this function is called to make a decision
+         on whether we should wrap the said module.
+     unwrapped_params (int):
+         The number of parameters yet to be wrapped in this module.
+     wrap_modules (Set[nn.Module]):
+         The modules to wrap as separated FSDP units.
+  """
+  if recurse:
+    # always recurse
+    return True
+  else:
+    return module in wrap_modules
+
+
+@dataclasses.dataclass
+class ModuleProfile:
+  """The sizes measured for a module by :func:`profile_module`."""
+  # The bytes of the parameters of the module and its submodules, in the
+  # compute dtype.
+  param_bytes: int
+  # The bytes of the outputs of the module forward.
+  activation_bytes: int
+
+
+def _tensor_bytes(value: Any) -> int:
+  sizes = []
+  xu.for_each_instance(value, lambda x: isinstance(x, torch.Tensor),
+                       lambda t: sizes.append(t.numel() * t.element_size()))
+  return sum(sizes)
+
+
+def _param_bytes(module: nn.Module,
+                 compute_dtype: Optional[torch.dtype]) -> int:
+  return sum(p.numel() * (p.element_size(
+  ) if compute_dtype is None else torch.finfo(compute_dtype).bits // 8)
+             for p in module.parameters())
+
+
+@torch.no_grad()
+def profile_module(module: nn.Module,
+                   *args: Any,
+                   compute_dtype: Optional[torch.dtype] = None,
+                   **kwargs: Any) -> Dict[str, ModuleProfile]:
+  """
+  Run a forward pass of ``module`` on the sample inputs and measure the
+  parameter and output bytes of each of its submodules. On XLA devices the
+  forward pass is only traced, so the sizes are known without executing it.
+  The forward pass runs without autograd and the buffers it updates in place
+  (e.g. the running statistics of batch norm) are restored afterwards, so the
+  traced graph is dropped with its outputs and no pending computation is left
+  on the module.
+
+  Returns:
+      A dict mapping the qualified name of each submodule (``''`` for
+      ``module`` itself) to its :class:`ModuleProfile`.
+  """
+  profiles = {
+      name: ModuleProfile(_param_bytes(m, compute_dtype), 0)
+      for name, m in module.named_modules()
+  }
+
+  def _record_output(name, m, inputs, output):
+    profiles[name].activation_bytes += _tensor_bytes(output)
+
+  handles = [
+      m.register_forward_hook(functools.partial(_record_output, name))
+      for name, m in module.named_modules()
+  ]
+  buffers = list(module.buffers())
+  saved_buffers = [buffer.detach().clone() for buffer in buffers]
+  try:
+    with torch.no_grad():
+      module(*args, **kwargs)
+  finally:
+    for handle in handles:
+      handle.remove()
+    with torch.no_grad():
+      for buffer, saved in zip(buffers, saved_buffers):
+        buffer.copy_(saved)
+  return profiles
+
+
+@dataclasses.dataclass
+class AutoWrapPlan:
+  """
+  The FSDP units chosen by :func:`plan_auto_wrap`. It can be saved to JSON with
+  ``to_json`` and reloaded with ``from_json``, to skip the profiling in later
+  runs.
+  """
+  # The qualified names of the submodules to wrap as inner FSDP units. The
+  # root module is always wrapped by the outermost FSDP unit.
+  wrap_module_names: List[str]
+  memory_budget_bytes: int
+  world_size: int
+  # The bytes of all the parameters, and of the outputs of the leaf modules.
+  param_bytes: int
+  activation_bytes: int
+  # The sharded parameters, the activations and the largest unit gathered.
+  estimated_peak_bytes: int
+
+  @property
+  def num_units(self) -> int:
+    return len(self.wrap_module_names) + 1
+
+  def auto_wrap_policy(self, module: nn.Module) -> Callable:
+    """Build the ``auto_wrap_policy`` applying this plan to ``module``."""
+    wrap_modules = {
+        module.get_submodule(name) for name in self.wrap_module_names
+    }
+    return functools.partial(
+        planned_auto_wrap_policy, wrap_modules=wrap_modules)
+
+  def to_json(self) -> str:
+    return json.dumps(dataclasses.asdict(self), indent=2)
+
+  @classmethod
+  def from_json(cls, text: str) -> 'AutoWrapPlan':
+    return cls(**json.loads(text))
+
+
+def plan_auto_wrap(
+    module: nn.Module,
+    *args: Any,
+    memory_budget_bytes: int,
+    world_size: int,
+    compute_dtype: Optional[torch.dtype] = None,
+    force_leaf_modules: Optional[Set[Type[nn.Module]]] = None,
+    exclude_wrap_modules: Optional[Set[Type[nn.Module]]] = None,
+    **kwargs: Any,
+) -> AutoWrapPlan:
+  """
+  Choose the FSDP units of ``module`` with the fewest units (and thus the
+  fewest all-gathers and reduce-scatters) whose estimated peak memory per
+  device fits ``memory_budget_bytes``.
+
+  The parameter and activation bytes are measured by :func:`profile_module`
+  with the sample inputs ``args`` and ``kwargs`` of one device. The peak
+  memory is estimated as the sharded parameters, plus the outputs of all the
+  leaf modules (which are kept for the backward pass), plus the full
+  parameters of the largest unit, which are gathered while it runs. Units are
+  split top-down, wrapping the largest submodules first, until each unit fits.
+
+  Args:
+     module (nn.Module):
+         The module to be wrapped with FSDP.
+     memory_budget_bytes (int):
+         The memory budget of a device.
+     world_size (int):
+         The number of ranks the parameters are sharded across.
+     compute_dtype (torch.dtype, Optional):
+         The dtype of the full parameters, as in FSDP. Defaults to the dtype
+         of each parameter.
+     force_leaf_modules (Set[Type[nn.Module]]): set of module types whose
+         children are never wrapped. Defaults to the ones of
+         ``size_based_auto_wrap_policy``.
+     exclude_wrap_modules (Set[Type[nn.Module]]): set of module types never
+         wrapped (their children can be). Defaults to the ones of
+         ``size_based_auto_wrap_policy``.
+  """
+  force_leaf_modules = (
+      size_based_auto_wrap_policy.FORCE_LEAF_MODULES
+      if force_leaf_modules is None else force_leaf_modules)
+  exclude_wrap_modules = (
+      size_based_auto_wrap_policy.EXCLUDE_WRAP_MODULES
+      if exclude_wrap_modules is None else exclude_wrap_modules)
+  profiles = profile_module(
+      module, *args, compute_dtype=compute_dtype, **kwargs)
+  param_bytes = profiles[''].param_bytes
+  activation_bytes = sum(profiles[name].activation_bytes
+                         for name, m in module.named_modules()
+                         if next(m.children(), None) is None)
+  unit_budget = (
+      memory_budget_bytes - -(-param_bytes // world_size) - activation_bytes)
+  if unit_budget <= 0:
+    raise ValueError(
+        f"memory_budget_bytes={memory_budget_bytes} does not fit the sharded "
+        f"parameters and the activations "
+        f"({-(-param_bytes // world_size) + activation_bytes} bytes)")
+
+  wrap_module_names = []
+  unit_bytes = []
+
+  def _split_unit(name: str, unit: nn.Module) -> None:
+    remainder = profiles[name].param_bytes
+    # Candidate submodules to split off, the largest first.
+    candidates = [
+        (f'{name}.{n}' if name else n, c) for n, c in unit.named_children()
+    ]
+    while remainder > unit_budget and not isinstance(unit,
+                                                     tuple(force_leaf_modules)):
+      candidates = [(n, c) for n, c in candidates if profiles[n].param_bytes]
+      if not candidates:
+        break
+      candidates.sort(key=lambda item: profiles[item[0]].param_bytes)
+      child_name, child = candidates.pop()
+      if isinstance(child, tuple(exclude_wrap_modules)):
+        candidates.extend(
+            (f'{child_name}.{n}', c) for n, c in child.named_children())
+        continue
+      wrap_module_names.append(child_name)
+      _split_unit(child_name, child)
+      remainder -= profiles[child_name].param_bytes
+    if remainder > unit_budget:
+      warnings.warn(f"FSDP unit '{name}' ({remainder} bytes) cannot be split "
+                    f"to fit the unit budget of {unit_budget} bytes")
+    unit_bytes.append(remainder)
+
+  _split_unit('', module)
+  # Keep the names in module order.
+  order = {name: i for i, (name, _) in enumerate(module.named_modules())}
+  wrap_module_names.sort(key=order.get)
+  return AutoWrapPlan(
+      wrap_module_names=wrap_module_names,
+      memory_budget_bytes=memory_budget_bytes,
+      world_size=world_size,
+      param_bytes=param_bytes,
+      activation_bytes=activation_bytes,
+      estimated_peak_bytes=-(-param_bytes // world_size) + activation_bytes +
+      max(unit_bytes))
+
+
 def _wrap(module: nn.Module, wrapper_cls: Callable, **kwargs) -> nn.Module:
   assert wrapper_cls is not None
   if hasattr(module, '_wrap_overrides'):
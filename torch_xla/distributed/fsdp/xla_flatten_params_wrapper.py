@@ -129,7 +129,14 @@ class FlatParameter(nn.Parameter):
 
   def to(self, *args, **kwargs) -> nn.Parameter:
     """Make a copy of the flat parameter onto the specified device and dtype"""
-    out = FlatParameter([self.data.to(*args, **kwargs)], self.requires_grad)
+    return self._new_with_data(self.data.to(*args, **kwargs))
+
+  def to_empty(self, device: torch.device) -> nn.Parameter:
+    """Make an uninitialized flat parameter of the same size on ``device``"""
+    return self._new_with_data(torch.empty_like(self.data, device=device))
+
+  def _new_with_data(self, data: Tensor) -> nn.Parameter:
+    out = FlatParameter([data], self.requires_grad)
     out._param_numels = self._param_numels.copy()
     out._param_shapes = self._param_shapes.copy()
     out._param_infos = self._param_infos.copy()
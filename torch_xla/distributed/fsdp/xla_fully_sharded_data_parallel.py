@@ -34,10 +34,11 @@ from torch.nn.utils.rnn import PackedSequence
 import torch_xla
 import torch_xla.core.xla_model as xm
 
-from .xla_flatten_params_wrapper import XlaFlattenParamsWrapper
-from .utils import dummy_all_gather, dummy_all_reduce, dummy_reduce_scatter, apply_xla_patch_to_nn_linear
+from .xla_flatten_params_wrapper import FlatParameter, XlaFlattenParamsWrapper
+from .utils import dummy_all_gather, dummy_all_reduce, dummy_reduce_scatter, apply_xla_patch_to_nn_linear, get_hybrid_shard_groups
 from .wrap import recursive_wrap
-from ._init_utils import _materialize_module
+from ._init_utils import (_init_flat_shard, _materialize_module,
+                          _record_init_recipes, _stable_seed)
 
 import os
 
@@ -193,6 +194,23 @@ class XlaFullyShardedDataParallel(nn.Module):
           The world_size of this sharding instance. This must be specified if
           ``sharding_groups`` is provided. Otherwise it defaults to
           ``xm.xrt_world_size()``.
+      replica_groups (list, Optional):
+          If specified (together with ``sharding_groups``), FSDP will
+          all-reduce the reduce-scattered gradient shards over this
+          ``replica_groups``, in the format of the ``groups`` argument of
+          `xm.all_reduce`. Each replica group must contain the ranks holding
+          the same shard (i.e. the same ``sharding_rank``) in different
+          sharding groups. This replicates the sharded parameters and
+          optimizer states across the sharding groups (hybrid sharding).
+      hybrid_shard_size (int, Optional):
+          If specified, shard the parameters over groups of
+          ``hybrid_shard_size`` consecutive ranks (e.g. the devices of a host),
+          and replicate them across these groups. This builds the
+          ``sharding_groups``, ``replica_groups``, ``sharding_rank`` and
+          ``sharding_world_size`` arguments with ``get_hybrid_shard_groups``,
+          which must not be specified. All-gathers and reduce-scatters then
+          only involve the devices of a sharding group, and the gradient
+          shards are all-reduced across sharding groups.
       pin_layout_in_collective_ops (bool, Optional):
           if ``True``, then pin the layout in the collective ops (all_reduce,
           all_gather, and reduce_scatter) in FSDP. See `xm.all_reduce` for
@@ -202,6 +220,40 @@ class XlaFullyShardedDataParallel(nn.Module):
           dimension (dim 0) *without* flattening them. This is a workaround for
           those compilers that may have trouble handling flattened parameters.
           This option has no effect if ``flatten_parameters`` is ``True``.
+      coalesce_all_gather_ops (bool, Optional):
+          if ``True``, then all-gather the parameters sharded on dim 0 of
+          this FSDP module with a single coalesced all-gather op.
+      coalesce_reduce_scatter_ops (bool, Optional):
+          if ``True``, then accumulate the flattened gradients in the
+          post-backward hooks into buckets of ``reduce_scatter_bucket_bytes``
+          and reduce-scatter each bucket with a single coalesced op (instead
+          of one reduce-scatter op per parameter). This reduces the number of
+          collectives for modules with many small parameters, at the cost of
+          keeping the full gradients of a bucket alive until it is reduced.
+          Coalesced reduce-scatter ops may require
+          ``pin_layout_in_collective_ops=False``.
+      reduce_scatter_bucket_bytes (int, Optional):
+          the size of the gradient buckets in bytes when
+          ``coalesce_reduce_scatter_ops`` is ``True``. A bucket is reduced as
+          soon as it reaches this size, and the last partial bucket of a FSDP
+          module is reduced as soon as the post-backward hooks of all its
+          parameters have fired. Default: 25 MiB.
+      forward_prefetch (bool, Optional):
+          if ``True``, then all-gather the full parameters of the next
+          ``prefetch_limit`` FSDP modules in the forward pass while running
+          this module. The execution order of the FSDP modules is recorded in
+          the first iteration, and is assumed to be the same in every
+          iteration. Prefetching starts from the second iteration.
+      backward_prefetch (bool, Optional):
+          same as ``forward_prefetch``, for the backward pass.
+      prefetch_limit (int, Optional):
+          the number of FSDP modules to prefetch ahead of the running one.
+          Default: 1.
+      prefetch_max_bytes (int, Optional):
+          if specified, the max total size in bytes of the full parameters
+          gathered ahead of the running FSDP module, including the ones
+          prefetched by the previous modules. This bounds the extra XLA device
+          memory used by prefetching. Default: ``None``.
       auto_wrap_policy (Optional[Callable[[nn.Module, bool, int], bool]]):
           A callable specifying a policy to recursively wrap layers with FSDP.
           Note that this policy currently will only apply to child modules of
@@ -275,6 +327,19 @@ class XlaFullyShardedDataParallel(nn.Module):
                 >>> module = deferred_init.deferred_init(MyModule, device="cuda")
                 >>> # Will initialize via deferred_init.materialize_module().
                 >>> fsdp_model = FSDP(module, auto_wrap_policy=size_based_auto_wrap_policy)
+        sharded_param_init (bool, Optional):
+            if ``True``, initialize the parameters of a module on the meta device
+            directly into their shards: each rank only runs the initialization
+            (``param_init_fn``, or the ``reset_parameters`` methods) on its own
+            slice of each parameter, and the full parameters are never built. The
+            initialization ops are recorded on the meta device and replayed on
+            the slices, so it must be made of random fills (``uniform_`` and
+            ``normal_``, e.g. ``nn.init.kaiming_uniform_``), constant fills and
+            in-place elementwise ops with scalar arguments. The random values
+            are generated from a seed per parameter drawn from the torch RNG,
+            which must be seeded identically on all ranks. They are independent
+            of the world size, but differ from the values of the unsharded
+            initialization.
   """
 
   def __init__(
@@ -293,12 +358,21 @@ class XlaFullyShardedDataParallel(nn.Module):
       sharding_groups: Optional[List[List[int]]] = None,
       sharding_rank: Optional[int] = None,
       sharding_world_size: Optional[int] = None,
+      replica_groups: Optional[List[List[int]]] = None,
+      hybrid_shard_size: Optional[int] = None,
       shard_param_on_dim_0: bool = False,
       pin_layout_in_collective_ops: bool = True,
       coalesce_all_gather_ops: bool = False,
+      coalesce_reduce_scatter_ops: bool = False,
+      reduce_scatter_bucket_bytes: int = 25 * 1024 * 1024,
+      forward_prefetch: bool = False,
+      backward_prefetch: bool = False,
+      prefetch_limit: int = 1,
+      prefetch_max_bytes: Optional[int] = None,
       auto_wrap_policy: Optional[Callable] = None,
       auto_wrapper_callable: Optional[Callable] = None,
       param_init_fn: Optional[Callable[[nn.Module], None]] = None,
+      sharded_param_init: bool = False,
       _shard_size_multiple: int = 128,
       _use_xla_patched_linear: bool = True,
       _debug_dummy_forward_pass: bool = False,
@@ -353,11 +427,20 @@ class XlaFullyShardedDataParallel(nn.Module):
           sharding_groups=sharding_groups,
           sharding_rank=sharding_rank,
           sharding_world_size=sharding_world_size,
+          replica_groups=replica_groups,
+          hybrid_shard_size=hybrid_shard_size,
           shard_param_on_dim_0=shard_param_on_dim_0,
           pin_layout_in_collective_ops=pin_layout_in_collective_ops,
+          coalesce_reduce_scatter_ops=coalesce_reduce_scatter_ops,
+          reduce_scatter_bucket_bytes=reduce_scatter_bucket_bytes,
+          forward_prefetch=forward_prefetch,
+          backward_prefetch=backward_prefetch,
+          prefetch_limit=prefetch_limit,
+          prefetch_max_bytes=prefetch_max_bytes,
           # `auto_wrap_policy` doesn't need to be specified in auto-wrapping
           # `auto_wrapper_callable`` doesn't need to be specified in auto-wrapping
           param_init_fn=param_init_fn,
+          sharded_param_init=sharded_param_init,
           _shard_size_multiple=_shard_size_multiple,
           _use_xla_patched_linear=_use_xla_patched_linear,
           _debug_dummy_forward_pass=_debug_dummy_forward_pass,
@@ -399,6 +482,25 @@ class XlaFullyShardedDataParallel(nn.Module):
     # only along their dim 0 without flattening the parameter
     self._shard_param_on_dim_0 = shard_param_on_dim_0 and not flatten_parameters
     self.coalesce_all_gather_ops = coalesce_all_gather_ops
+    if reduce_scatter_bucket_bytes <= 0:
+      raise ValueError(
+          f"reduce_scatter_bucket_bytes must be positive, not {reduce_scatter_bucket_bytes}"
+      )
+    self.coalesce_reduce_scatter_ops = coalesce_reduce_scatter_ops
+    self.reduce_scatter_bucket_bytes = reduce_scatter_bucket_bytes
+    # (param, full grad, flattened and padded grad) waiting to be reduced
+    self._reduce_scatter_bucket: List[Tuple[Parameter, torch.Tensor,
+                                            torch.Tensor]] = []
+    self._reduce_scatter_bucket_size = 0
+    # The params whose post-backward hooks have not fired yet in the current
+    # backward pass. The last partial bucket is reduced once they all have.
+    self._params_pending_post_backward: Set[Parameter] = set()
+    if prefetch_limit < 1:
+      raise ValueError(f"prefetch_limit must be positive, not {prefetch_limit}")
+    self.forward_prefetch = forward_prefetch
+    self.backward_prefetch = backward_prefetch
+    self.prefetch_limit = prefetch_limit
+    self.prefetch_max_bytes = prefetch_max_bytes
     # Set layout pinning to False in all_gather, all_reduce, and reduce_scatter so that they can work together
     # TODO (ronghanghu): change the default layout pinning to True after it's supported simultaneously
     # on all collective ops (see https://github.com/pytorch/xla/pull/3511 for details)
@@ -424,7 +526,22 @@ class XlaFullyShardedDataParallel(nn.Module):
 
     # Allow specifying groups for the sharding collective ops, useful for mixing
     # FSDP data parallelism with model parallelism (e.g. Megatron)
+    if hybrid_shard_size is not None:
+      if any(
+          arg is not None for arg in (sharding_groups, sharding_rank,
+                                      sharding_world_size, replica_groups)):
+        raise ValueError(
+            "sharding_groups, sharding_rank, sharding_world_size and replica_groups "
+            "must not be provided when hybrid_shard_size is specified")
+      sharding_groups, replica_groups = get_hybrid_shard_groups(
+          hybrid_shard_size)
+      sharding_rank = xm.get_ordinal() % hybrid_shard_size
+      sharding_world_size = hybrid_shard_size
+    if replica_groups is not None and sharding_groups is None:
+      raise ValueError(
+          "sharding_groups must be provided when replica_groups is specified")
     self.sharding_groups = sharding_groups
+    self.replica_groups = replica_groups
     if sharding_groups is None:
       self.rank = xm.get_ordinal()
       self.world_size = xm.xrt_world_size()
@@ -443,9 +560,12 @@ class XlaFullyShardedDataParallel(nn.Module):
     self._debug_msg = _debug_msg
     self._debug_print = _debug_print
 
+    # The gradients are averaged over all sharding groups in hybrid sharding.
+    num_replicas = 1 if replica_groups is None else len(replica_groups[0])
+    grad_reduce_world_size = self.world_size * num_replicas
     self.gradient_predivide_factor: float = self._get_gradient_predivide_factor(
-        self.world_size)
-    self.gradient_postdivide_factor: float = self.world_size / self.gradient_predivide_factor
+        grad_reduce_world_size)
+    self.gradient_postdivide_factor: float = grad_reduce_world_size / self.gradient_predivide_factor
 
     self._tstart = time.time()
 
@@ -455,11 +575,22 @@ class XlaFullyShardedDataParallel(nn.Module):
       # (see https://github.com/pytorch/xla/issues/3811 for details)
       module = apply_xla_patch_to_nn_linear(module)
 
-    _materialize_module(
-        module,
-        param_init_fn,
-        [],  # TODO: ignored_params is set to empty now, pass in correct params when this feature is fully enabled
-        deferred_init_check_fn=lambda k: not isinstance(k, wrapper_cls))
+    # Maps the module and name of each meta parameter to its qualified name and
+    # its initialization ops, when they are initialized shard by shard.
+    self._init_recipes = None
+    if sharded_param_init and any(p.is_meta for p in module.parameters()):
+      self._init_seed = int(torch.randint(2**62, ()).item())
+      self._init_recipes = _record_init_recipes(
+          module,
+          param_init_fn,
+          check_fn=lambda k: not isinstance(k, wrapper_cls))
+      self._materialize_meta_buffers()
+    else:
+      _materialize_module(
+          module,
+          param_init_fn,
+          [],  # TODO: ignored_params is set to empty now, pass in correct params when this feature is fully enabled
+          deferred_init_check_fn=lambda k: not isinstance(k, wrapper_cls))
 
     # Only handle params which are not already sharded. This enables
     # sharding individual layers of a Module, with an outer wrapper to
@@ -584,7 +715,9 @@ class XlaFullyShardedDataParallel(nn.Module):
             for infinity norm.
         groups (list, optional): A list of list, representing the replica
             groups for the all-reduce operation to compute global norms.
-            See `xm.all_reduce` for details.
+            See `xm.all_reduce` for details. Defaults to ``sharding_groups``
+            when ``replica_groups`` is specified, since the gradient shards
+            are replicated across sharding groups.
 
     Returns:
         Total norm of the parameters (viewed as a single vector).
@@ -604,6 +737,8 @@ class XlaFullyShardedDataParallel(nn.Module):
 
     max_norm = float(max_norm)
     norm_type = float(norm_type)
+    if groups is None and self.replica_groups is not None:
+      groups = self.sharding_groups
     params_with_grad = self.params_with_grad
     # Computes the max norm for this shard's gradients and sync's across workers
     local_norm = _calc_grad_norm(params_with_grad, norm_type)
@@ -692,7 +827,10 @@ class XlaFullyShardedDataParallel(nn.Module):
       p = self.full_params[idx]
       assert not hasattr(p, "_is_sharded")
 
-      shard_data = self._get_shard(p)
+      if p.is_meta:
+        shard_data = self._get_sharded_init(p, m, n)
+      else:
+        shard_data = self._get_shard(p)
       if shard_data.device != self.xla_device:
         # cast to XLA device if not already on XLA
         shard_data = shard_data.to(self.xla_device)
@@ -704,7 +842,15 @@ class XlaFullyShardedDataParallel(nn.Module):
           ".", "_FSDP_SHARD_SEPARATOR_")
       self.register_parameter(p_shard._name, p_shard)
       self.sharded_params.append(p_shard)
-      if p.device != self.xla_device:
+      if p.is_meta:
+        # the full parameter is only a placeholder, which is never materialized
+        if isinstance(p, FlatParameter):
+          full_p = p.to_empty(self.xla_device)
+        else:
+          full_p = torch.empty_like(p, device=self.xla_device)
+        p = full_p.requires_grad_(p.requires_grad)
+        self.full_params[idx] = p
+      elif p.device != self.xla_device:
         # cast to XLA device if not already on XLA
         p = p.to(self.xla_device).requires_grad_(p.requires_grad)
         # update p in full_params since id(p) changed after the casting
@@ -742,6 +888,53 @@ class XlaFullyShardedDataParallel(nn.Module):
     tensor = tensor[begin:end].clone()
     return tensor
 
+  def _init_components(self, keys: List[Tuple[nn.Module, str]],
+                       numels: List[int]) -> List[Tuple[int, List, int]]:
+    components = []
+    for key, numel in zip(keys, numels):
+      name, recipe = self._init_recipes[key]
+      components.append((_stable_seed(self._init_seed, name), recipe, numel))
+    return components
+
+  @torch.no_grad()
+  def _get_sharded_init(self, p: torch.Tensor, m: nn.Module,
+                        n: str) -> torch.Tensor:
+    """
+    Return the local shard of the meta parameter ``p`` (the attribute ``n`` of
+    ``m``), initialized by replaying its recorded initialization on the slice
+    of this rank only.
+    """
+    if isinstance(p, FlatParameter):
+      components = self._init_components(
+          [(pm, pn) for _, pm, pn in p._param_infos], p._param_numels)
+    else:
+      components = self._init_components([(m, n)], [p.numel()])
+    pad_multiple = self.world_size * self._shard_size_multiple
+    if self._shard_param_on_dim_0:
+      # shard whole rows, as in `_flatten_and_pad_to_world_size`
+      row_numel = p[0].numel() if p.dim() > 1 else 1
+      padded_rows = -(-p.size(0) // pad_multiple) * pad_multiple
+      local_rows = padded_rows // self.world_size
+      shard_shape = (local_rows,) + tuple(p.size()[1:])
+      local_size = local_rows * row_numel
+    else:
+      padded_numel = -(-p.numel() // pad_multiple) * pad_multiple
+      local_size = padded_numel // self.world_size
+      shard_shape = (local_size,)
+    begin = self.rank * local_size
+    return _init_flat_shard(components, begin, begin + local_size,
+                            p.dtype).view(shard_shape)
+
+  @torch.no_grad()
+  def _materialize_meta_buffers(self) -> None:
+    """Initialize the meta buffers (which are not sharded) on the CPU."""
+    for (m, n) in self._init_recipes:
+      buf = m._buffers.get(n)
+      if buf is not None and buf.is_meta:
+        components = self._init_components([(m, n)], [buf.numel()])
+        m._buffers[n] = _init_flat_shard(components, 0, buf.numel(),
+                                         buf.dtype).view(buf.size())
+
   @torch.no_grad()
   def _cast_buffers(self,
                     dtype: Optional[torch.dtype] = None,
@@ -786,7 +979,8 @@ class XlaFullyShardedDataParallel(nn.Module):
             f"buffer_dtype={self.buffer_dtype}, "
             f"flatten_parameters={self.flatten_parameters}, "
             f"reshard_after_forward={self.reshard_after_forward}, "
-            f"sharding_groups={self.sharding_groups}")
+            f"sharding_groups={self.sharding_groups}, "
+            f"replica_groups={self.replica_groups}")
     return repr
 
   def __getattr__(self, name: str) -> Union[torch.Tensor, nn.Module]:
@@ -840,6 +1034,7 @@ class XlaFullyShardedDataParallel(nn.Module):
     self._output_pre_backward_hook_registered: Optional[Set] = None
     self._backward_opt_barrier_tensors: Optional[List] = None
     self._backward_opt_barrier_tensor_ids: Optional[Set] = None
+    self._exec_order: Optional[_ExecutionOrder] = None
     self.reshard_after_forward = self._orig_reshard_after_forward
 
   def _lazy_init(self) -> None:
@@ -899,16 +1094,19 @@ class XlaFullyShardedDataParallel(nn.Module):
     """
     Set up a list to avoid registering pre-backward hooks incorrectly.
     And a list to apply optimization barrier on backward pass tensors.
+    And the execution order of the FSDP modules for prefetching.
     """
     assert self._is_root, "This should only be called on the root"
     self._output_pre_backward_hook_registered = set()
     self._backward_opt_barrier_tensors = []
     self._backward_opt_barrier_tensor_ids = set()
+    self._exec_order = _ExecutionOrder()
     for n, m in self.named_modules():
       if n != "" and isinstance(m, XlaFullyShardedDataParallel):
         m._output_pre_backward_hook_registered = self._output_pre_backward_hook_registered
         m._backward_opt_barrier_tensors = self._backward_opt_barrier_tensors
         m._backward_opt_barrier_tensor_ids = self._backward_opt_barrier_tensor_ids
+        m._exec_order = self._exec_order
 
   def forward(self, *args: Any, **kwargs: Any) -> torch.Tensor:
     self._lazy_init()
@@ -930,6 +1128,16 @@ class XlaFullyShardedDataParallel(nn.Module):
     self._rebuild_full_params(
         dependency_tensors=input_opt_barrier_tensors,
         apply_opt_barrier=self.optimization_barrier_in_forward)
+    if not self._exec_order.forward_recorded:
+      self._exec_order.forward.append(self)
+    elif self.forward_prefetch and not self._exec_order.in_backward:
+      # The prefetched all-gathers only depend on this module's inputs, so
+      # that they can overlap with this module's computation. Skipped in the
+      # recomputation of checkpointed modules in the backward pass.
+      self._prefetch_full_params(
+          self._exec_order.forward,
+          dependency_tensors=input_opt_barrier_tensors,
+          apply_opt_barrier=self.optimization_barrier_in_forward)
 
     # Register backward hooks to reshard params and reduce-scatter grads.
     # These need to be re-registered every forward pass.
@@ -971,6 +1179,8 @@ class XlaFullyShardedDataParallel(nn.Module):
 
     # Done with a forward pass.
     self.training_state = TrainingState.IDLE
+    if self._is_root:
+      self._exec_order.forward_recorded = True
 
     return outputs
 
@@ -1053,25 +1263,35 @@ class XlaFullyShardedDataParallel(nn.Module):
       # calls are completed.
       if self._is_root:
         self._queue_wait_for_post_backward()
+      self._exec_order.in_backward = True
 
       if self.optimization_barrier_in_backward:
         self._try_adding_to_backward_opt_barrier_lists(t_grad)
       # All-gather full parameters or switching to the full params.
       # Note, ``self._rebuild_full_params`` is idempotent. So in case it is called
       # unnecessarily, it doesn't incur much overhead.
+      dependency_tensors = []
+      if self.optimization_barrier_in_backward:
+        # Ensure that backward pass ops of feature gradients, parameter
+        # gradient and sharding, and full-param freeing (which are usually
+        # performed in previous modules and are registered to
+        # self._backward_opt_barrier_tensors in _grad_opt_barrier_hook,
+        # _pre_backward_hook, and _post_backward_hook) are finished before
+        # rebuilding the full params of this FSDP module.
+        dependency_tensors = self._backward_opt_barrier_tensors
       if self.reshard_after_forward:
-        dependency_tensors = []
-        if self.optimization_barrier_in_backward:
-          # Ensure that backward pass ops of feature gradients, parameter
-          # gradient and sharding, and full-param freeing (which are usually
-          # performed in previous modules and are registered to
-          # self._backward_opt_barrier_tensors in _grad_opt_barrier_hook,
-          # _pre_backward_hook, and _post_backward_hook) are finished before
-          # rebuilding the full params of this FSDP module.
-          dependency_tensors = self._backward_opt_barrier_tensors
         self._rebuild_full_params(
             dependency_tensors=dependency_tensors,
             apply_opt_barrier=self.optimization_barrier_in_backward)
+      if not self._pre_backward_hook_has_run:
+        if not self._exec_order.backward_recorded:
+          self._exec_order.backward.append(self)
+        elif self.backward_prefetch:
+          self._prefetch_full_params(
+              self._exec_order.backward,
+              dependency_tensors=dependency_tensors,
+              apply_opt_barrier=self.optimization_barrier_in_backward)
+      if self.reshard_after_forward:
         self._clear_backward_opt_barrier_lists()
 
       # Only run the following once per iteration (i.e. in case
@@ -1157,6 +1377,7 @@ class XlaFullyShardedDataParallel(nn.Module):
         handle = grad_acc.register_hook(
             functools.partial(self._post_backward_hook, p))
         p._shard_bwd_hook = (grad_acc, handle)
+        self._params_pending_post_backward.add(p)
 
   @torch.no_grad()
   def _post_backward_hook(self, param: Parameter, *unused: Any) -> None:
@@ -1183,7 +1404,10 @@ class XlaFullyShardedDataParallel(nn.Module):
     # then subsequent hook callbacks will see POST state.
     self.assert_state([TrainingState.BACKWARD_PRE, TrainingState.BACKWARD_POST])
     self.training_state = TrainingState.BACKWARD_POST
+    self._params_pending_post_backward.discard(param)
     if param.grad is None:
+      if not self._params_pending_post_backward:
+        self._flush_reduce_scatter_bucket()
       return
 
     assert param.grad is not None, param.shape
@@ -1215,6 +1439,22 @@ class XlaFullyShardedDataParallel(nn.Module):
     param.grad = None
     grad_flat = self._flatten_and_pad_to_world_size(
         grad, self.world_size * self._shard_size_multiple)
+    if self.coalesce_reduce_scatter_ops:
+      # Defer the reduce-scatter until the bucket is full, the optimization
+      # barrier is applied to the whole bucket in this case.
+      if grad_flat.dtype != torch.float32 and self.fp32_reduce_scatter:
+        grad_flat = grad_flat.to(torch.float32)
+      self._reduce_scatter_bucket.append((param, grad, grad_flat))
+      self._reduce_scatter_bucket_size += grad_flat.numel(
+      ) * grad_flat.element_size()
+      # Reduce the last partial bucket of this module as soon as all its
+      # gradients are in, instead of keeping the full gradients alive until
+      # the end of the backward pass.
+      if (self._reduce_scatter_bucket_size >= self.reduce_scatter_bucket_bytes
+          or not self._params_pending_post_backward):
+        self._flush_reduce_scatter_bucket()
+      return
+
     if self.optimization_barrier_in_backward:
       self.optimization_barrier_op([grad_flat])
     if grad_flat.dtype != torch.float32 and self.fp32_reduce_scatter:
@@ -1226,31 +1466,79 @@ class XlaFullyShardedDataParallel(nn.Module):
         scatter_dim=0,
         shard_count=self.world_size,
         groups=self.sharding_groups)
-    if reduced_grad.dtype != torch.float32:
-      reduced_grad = reduced_grad.to(torch.float32)
+    self._accumulate_reduced_grads([param], [grad, grad_flat], [reduced_grad])
+
+  @torch.no_grad()
+  def _flush_reduce_scatter_bucket(self) -> None:
+    """
+    Reduce-scatter the gradients accumulated by :func:`_post_backward_hook`
+    when ``coalesce_reduce_scatter_ops`` is ``True``, with a single coalesced
+    reduce-scatter op.
+    """
+    if not self._reduce_scatter_bucket:
+      return
+    params, grads, grad_flats = (
+        list(t) for t in zip(*self._reduce_scatter_bucket))
+    self._reduce_scatter_bucket = []
+    self._reduce_scatter_bucket_size = 0
+
     if self.optimization_barrier_in_backward:
-      self.optimization_barrier_op([reduced_grad])
+      self.optimization_barrier_op(grad_flats)
+    grad_flats = [g.detach() for g in grad_flats]
+    outputs = [
+        g.new_zeros((g.size(0) // self.world_size,) + tuple(g.shape[1:]))
+        for g in grad_flats
+    ]
+    reduced_grads = self.reduce_scatter_op(
+        xm.REDUCE_SUM,
+        grad_flats,
+        scale=1.0,
+        scatter_dim=0,
+        shard_count=self.world_size,
+        groups=self.sharding_groups,
+        output=outputs)
+    self._accumulate_reduced_grads(params, grads + grad_flats, reduced_grads)
+
+  def _accumulate_reduced_grads(self, params: List[Parameter],
+                                full_grads: List[torch.Tensor],
+                                reduced_grads: List[torch.Tensor]) -> None:
+    """
+    Free the full gradients ``full_grads`` and accumulate ``reduced_grads``
+    into the gradient shards of ``params``.
+    """
+    if self.replica_groups is not None:
+      # Hybrid sharding: sum the gradient shards across the sharding groups.
+      reduced_grads = self.all_reduce_op(
+          xm.REDUCE_SUM, list(reduced_grads), groups=self.replica_groups)
+    reduced_grads = [
+        g.to(torch.float32) if g.dtype != torch.float32 else g
+        for g in reduced_grads
+    ]
+    if self.optimization_barrier_in_backward:
+      self.optimization_barrier_op(reduced_grads)
     if self.gradient_postdivide_factor > 1:
       # Average grad by world_size for consistency with PyTorch DDP.
-      reduced_grad.div_(self.gradient_postdivide_factor)
+      for reduced_grad in reduced_grads:
+        reduced_grad.div_(self.gradient_postdivide_factor)
 
-    grad._has_full_param = True
-    grad_flat._has_full_param = True
+    for grad in full_grads:
+      grad._has_full_param = True
     self._free_full_params(
-        [grad, grad_flat],
-        dependency_tensors=[reduced_grad],
+        full_grads,
+        dependency_tensors=reduced_grads,
         apply_opt_barrier=self.optimization_barrier_in_backward)
-    self._try_adding_to_backward_opt_barrier_lists(reduced_grad)
 
-    # Accumulate into the gradient shard.
-    assert hasattr(param, "_sharded_param")
-    p_shard = param._sharded_param
-    if p_shard.grad is None:
-      p_shard.grad = reduced_grad
-    else:
-      assert p_shard.grad.shape == reduced_grad.shape
-      assert p_shard.grad.device == reduced_grad.device
-      p_shard.grad += reduced_grad
+    for param, reduced_grad in zip(params, reduced_grads):
+      self._try_adding_to_backward_opt_barrier_lists(reduced_grad)
+      # Accumulate into the gradient shard.
+      assert hasattr(param, "_sharded_param")
+      p_shard = param._sharded_param
+      if p_shard.grad is None:
+        p_shard.grad = reduced_grad
+      else:
+        assert p_shard.grad.shape == reduced_grad.shape
+        assert p_shard.grad.device == reduced_grad.device
+        p_shard.grad += reduced_grad
 
   def _queue_wait_for_post_backward(self) -> None:
     """
@@ -1309,12 +1597,19 @@ class XlaFullyShardedDataParallel(nn.Module):
           assert len(p._shard_bwd_hook) == 2, len(p._shard_bwd_hook)
           p._shard_bwd_hook[1].remove()
           delattr(p, "_shard_bwd_hook")
+      fsdp_module._params_pending_post_backward.clear()
       # Free the full params with `requires_grad==False`
       if frozen_params:
         fsdp_module._free_full_params(
             frozen_params,
             apply_opt_barrier=self.optimization_barrier_in_backward)
 
+    # Reduce the gradients left in partially filled buckets, e.g. of the
+    # modules with params which did not get a gradient.
+    for m in self.modules():  # includes self
+      if isinstance(m, XlaFullyShardedDataParallel):
+        m._flush_reduce_scatter_bucket()
+
     # Update root and nested FSDP's hooks and flags.
     for m in self.modules():  # includes self
       if isinstance(m, XlaFullyShardedDataParallel):
@@ -1368,6 +1663,9 @@ class XlaFullyShardedDataParallel(nn.Module):
             self.optimization_barrier_op(dependency_tensors)
           self._clear_backward_opt_barrier_lists()
 
+    self._exec_order.backward_recorded = True
+    self._exec_order.in_backward = False
+
     if self.mark_step_on_finalization:
       # Forcing an execution at the end of backward pass to avoid any XLA compiler
       # fusion between backward and optimizer (e.g. AdamW and SGD) step.
@@ -1459,6 +1757,42 @@ class XlaFullyShardedDataParallel(nn.Module):
 
     self.has_full_params = True
 
+  def _prefetch_full_params(self, exec_order: List[nn.Module],
+                            dependency_tensors: List[torch.Tensor],
+                            apply_opt_barrier: bool) -> None:
+    """
+    Gather the full params of the FSDP modules running after this one in
+    ``exec_order``, within the ``prefetch_limit`` and ``prefetch_max_bytes``
+    limits. Their own :func:`_rebuild_full_params` calls are then no-ops.
+    """
+    try:
+      index = exec_order.index(self)
+    except ValueError:
+      # This module did not run in the first iteration.
+      return
+    budget = self.prefetch_max_bytes
+    for m in exec_order[index + 1:index + 1 + self.prefetch_limit]:
+      if budget is not None:
+        # The full params gathered by the previous modules count towards the
+        # budget too, so that they stay bounded as the window slides.
+        budget -= m._full_params_bytes()
+        if budget < 0:
+          break
+      if m.has_full_params:
+        continue
+      if self._debug_print:
+        xm.master_print(
+            f"prefetching full params of {m._debug_msg} (_debug_msg: {self._debug_msg})",
+            flush=True)
+      m._rebuild_full_params(
+          dependency_tensors=dependency_tensors,
+          apply_opt_barrier=apply_opt_barrier)
+
+  def _full_params_bytes(self) -> int:
+    """The size in bytes of the full params of this FSDP module."""
+    numel = sum(p_shard._orig_size.numel() for p_shard in self.sharded_params)
+    return numel * torch.finfo(self.compute_dtype).bits // 8
+
   @torch.no_grad()
   def _free_full_params(self,
                         params: Optional[List[Parameter]] = None,
@@ -1594,6 +1928,7 @@ class XlaFullyShardedDataParallel(nn.Module):
         "buffer_info": buffer_info,
         "world_size": self.world_size,
         "rank": self.rank,
+        "replica_groups": self.replica_groups,
     }
     return metadata
 
@@ -1653,6 +1988,22 @@ class XlaFullyShardedDataParallel(nn.Module):
     recursive_wrap(**auto_wrap_kwargs, **fsdp_kwargs)
 
 
+class _ExecutionOrder:
+  """
+  The order in which the FSDP modules under a root FSDP module run their
+  forward and backward passes, recorded in the first iteration.
+  """
+
+  def __init__(self):
+    self.forward: List[XlaFullyShardedDataParallel] = []
+    self.backward: List[XlaFullyShardedDataParallel] = []
+    self.forward_recorded = False
+    self.backward_recorded = False
+    # Whether a backward pass is running, in which case forward passes are
+    # recomputations of checkpointed modules.
+    self.in_backward = False
+
+
 def apply_to_tensors(
     fn: Callable, container: Union[torch.Tensor, Dict, List, Tuple, Set]
 ) -> Union[torch.Tensor, Dict, List, Tuple, Set]:
@@ -1,21 +1,39 @@
-from .xla_sharded_tensor import XLAShard, XLAShardedTensor
+from .xla_sharded_tensor import (XLAShard, XLAShardHandle, XLAShardedTensor,
+                                 fetch_shards)
 from .xla_sharding import (Mesh, HybridMesh, ShardingType, ShardingSpec,
-                           XLAPatchedLinear, mark_sharding, clear_sharding,
+                           XLAPatchedLinear, mark_sharding, mark_sharding_many,
+                           make_global_tensor_from_local_shards, clear_sharding,
                            wrap_if_sharded, xla_patched_nn_linear_forward)
 from .api import xla_distribute_tensor, xla_distribute_module
+from .topology import VirtualTopology, MeshAxisLocality, mesh_locality
+from .reshard import ReshardPlan, ReshardStep, plan_reshard, reshard
+from .memory_estimator import MemoryEstimate, estimate_memory
 
 __all__ = [
     "XLAShard",
+    "XLAShardHandle",
     "XLAShardedTensor",
+    "fetch_shards",
     "Mesh",
     "HybridMesh",
     "ShardingType",
     "ShardingSpec",
     "XLAPatchedLinear",
     "mark_sharding",
+    "mark_sharding_many",
+    "make_global_tensor_from_local_shards",
     "clear_sharding",
     "wrap_if_sharded",
     "xla_distribute_tensor",
     "xla_distribute_module",
     "xla_patched_nn_linear_forward",
+    "VirtualTopology",
+    "MeshAxisLocality",
+    "mesh_locality",
+    "ReshardPlan",
+    "ReshardStep",
+    "plan_reshard",
+    "reshard",
+    "MemoryEstimate",
+    "estimate_memory",
 ]
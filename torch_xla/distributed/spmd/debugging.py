@@ -1,8 +1,13 @@
 from collections.abc import Sequence
+import dataclasses
 import functools
+import html
+import json
+import math
+import re
 import string
 import sys
-from typing import Any, Callable, Optional, Union
+from typing import Any, Callable, Dict, List, Mapping, Optional, Tuple, Union
 import weakref
 
 import numpy as np
@@ -164,3 +169,173 @@ def visualize_tensor_sharding(t, **kwargs):
 
   sharding = torch_xla._XLAC._get_xla_sharding_spec(maybe_unwrap(t))
   return visualize_sharding(sharding, **kwargs)
+
+
+@dataclasses.dataclass
+class ShardingReportEntry:
+  """The sharding of a tensor in a `ShardingReport`."""
+  name: str
+  shape: List[int]
+  dtype: str
+  # The HLO sharding of the tensor, as `_get_xla_sharding_spec` returns it.
+  sharding: str
+  # One of 'REPLICATED', 'MAXIMAL', 'TILED' or 'PARTIAL'.
+  sharding_type: str
+  # The number of distinct shards, and of devices holding each of them.
+  num_shards: int
+  replication_factor: int
+  # The bytes of a shard, including its padding.
+  bytes_per_device: int
+  # The bytes of padding added to the global tensor to split it into shards.
+  padding_bytes: int
+
+
+@dataclasses.dataclass
+class ShardingReport:
+  """
+  A summary of the shardings of many tensors, e.g. all the parameters of a
+  model, computed from their sharding specs only. It renders as a text table,
+  and exports to JSON and HTML.
+  """
+  entries: List[ShardingReportEntry]
+  num_devices: int
+
+  @property
+  def total_bytes_per_device(self) -> int:
+    return sum(e.bytes_per_device for e in self.entries)
+
+  @property
+  def total_padding_bytes(self) -> int:
+    return sum(e.padding_bytes for e in self.entries)
+
+  def totals(self) -> Dict[str, Any]:
+    sharding_types = {}
+    for e in self.entries:
+      sharding_types[e.sharding_type] = sharding_types.get(e.sharding_type,
+                                                           0) + 1
+    return {
+        'num_tensors': len(self.entries),
+        'num_devices': self.num_devices,
+        'bytes_per_device': self.total_bytes_per_device,
+        'padding_bytes': self.total_padding_bytes,
+        'sharding_types': sharding_types,
+    }
+
+  def to_json(self) -> str:
+    return json.dumps({
+        'entries': [dataclasses.asdict(e) for e in self.entries],
+        'totals': self.totals(),
+    })
+
+  def _rows(self) -> List[List[str]]:
+    rows = [[
+        'name', 'shape', 'dtype', 'type', 'shards', 'replication',
+        'bytes/device', 'padding bytes'
+    ]]
+    for e in self.entries:
+      rows.append([
+          e.name,
+          str(tuple(e.shape)), e.dtype, e.sharding_type,
+          str(e.num_shards),
+          str(e.replication_factor),
+          str(e.bytes_per_device),
+          str(e.padding_bytes)
+      ])
+    rows.append([
+        'total', '', '', '', '', '',
+        str(self.total_bytes_per_device),
+        str(self.total_padding_bytes)
+    ])
+    return rows
+
+  def to_html(self) -> str:
+    rows = self._rows()
+    lines = ['<table>']
+    lines.append('<tr>' +
+                 ''.join(f'<th>{html.escape(c)}</th>' for c in rows[0]) +
+                 '</tr>')
+    for row in rows[1:]:
+      lines.append('<tr>' + ''.join(f'<td>{html.escape(c)}</td>' for c in row) +
+                   '</tr>')
+    lines.append('</table>')
+    return '\n'.join(lines)
+
+  def __str__(self) -> str:
+    rows = self._rows()
+    widths = [max(len(row[i]) for row in rows) for i in range(len(rows[0]))]
+    return '\n'.join('  '.join(c.ljust(w)
+                               for c, w in zip(row, widths)).rstrip()
+                     for row in rows)
+
+
+def _tiling(sharding: str, rank: int,
+            num_devices: int) -> Tuple[str, List[int], int]:
+  """
+  Parse the sharding type, the number of tiles of each dim and the
+  replication factor of an HLO sharding string.
+  """
+  # eg: '{devices=[2,2]0,1,2,3}'
+  # eg: '{replicated}'
+  # eg: '{devices=[2,1,2]0,1,2,3 last_tile_dim_replicate}'
+  match = re.search(r'devices=\[([\d,]+)\]', sharding)
+  if match is None:
+    if sharding.startswith('{maximal'):
+      return 'MAXIMAL', [1] * rank, 1
+    return 'REPLICATED', [1] * rank, num_devices
+  dims = [int(d) for d in match.group(1).split(',')]
+  if len(dims) > rank:
+    return 'PARTIAL', dims[:rank], math.prod(dims[rank:])
+  return 'TILED', dims, 1
+
+
+def _sharding_report_entry(name: str, shape: Sequence[int], dtype: torch.dtype,
+                           sharding: str,
+                           num_devices: int) -> ShardingReportEntry:
+  sharding_type, tiles, replication = _tiling(sharding, len(shape), num_devices)
+  element_size = torch.empty((), dtype=dtype).element_size()
+  shard_shape = [-(-size // t) for size, t in zip(shape, tiles)]
+  num_shards = math.prod(tiles)
+  padded_numel = math.prod(shard_shape) * num_shards
+  return ShardingReportEntry(
+      name=name,
+      shape=list(shape),
+      dtype=str(dtype).replace('torch.', ''),
+      sharding=sharding,
+      sharding_type=sharding_type,
+      num_shards=num_shards,
+      replication_factor=replication,
+      bytes_per_device=math.prod(shard_shape) * element_size,
+      padding_bytes=(padded_numel - math.prod(shape)) * element_size)
+
+
+def sharding_report(tensors: Union[torch.nn.Module, Mapping[str, torch.Tensor]],
+                    num_devices: Optional[int] = None) -> ShardingReport:
+  """
+  Summarize the sharded tensors of a module, i.e. its parameters and buffers,
+  or of a mapping from names to tensors. Only the sharding specs of the
+  tensors are read, and their data is not accessed, so the report is cheap
+  for large meshes and many tensors. Tensors without a sharding annotation
+  are left out.
+
+  Example:
+    report = sharding_report(model)
+    print(report)
+    open('sharding.html', 'w').write(report.to_html())
+  """
+  if isinstance(tensors, torch.nn.Module):
+    tensors = dict(
+        list(tensors.named_parameters()) + list(tensors.named_buffers()))
+  if num_devices is None:
+    num_devices = xr.global_runtime_device_count()
+  entries = []
+  for name, t in tensors.items():
+    if isinstance(t, XLAShardedTensor):
+      t = t.global_tensor
+    if t.device.type != 'xla':
+      continue
+    sharding = torch_xla._XLAC._get_xla_sharding_spec(t)
+    if not sharding:
+      continue
+    entries.append(
+        _sharding_report_entry(name, t.shape, t.dtype, sharding, num_devices))
+  return ShardingReport(entries, num_devices)
@@ -0,0 +1,159 @@
+import dataclasses
+import re
+from typing import Dict, List, Sequence
+
+import torch
+import torch_xla
+import torch_xla.runtime as xr
+
+_DTYPE_BYTES = {
+    'pred': 1,
+    's4': 1,
+    'u4': 1,
+    's8': 1,
+    'u8': 1,
+    'f8e4m3fn': 1,
+    'f8e5m2': 1,
+    's16': 2,
+    'u16': 2,
+    'f16': 2,
+    'bf16': 2,
+    's32': 4,
+    'u32': 4,
+    'f32': 4,
+    's64': 8,
+    'u64': 8,
+    'f64': 8,
+    'c64': 8,
+    'c128': 16,
+}
+
+# eg: '  ROOT %dot.3 = f32[4,16]{1,0} dot(f32[4,8]{1,0} %p0.1, ...), ...'
+_INSTRUCTION_RE = re.compile(
+    r'^\s*(ROOT\s+)?%?([\w.\-]+)\s*=\s*(.+?)\s+([\w\-]+)\((.*)$')
+_ARRAY_RE = re.compile(r'\b([a-z]+\d*(?:e\dm\dfn|e\dm\d)?)\[([\d,]*)\]')
+_OPERAND_RE = re.compile(r'%([\w.\-]+)')
+
+# Instructions which do not allocate a buffer of their own.
+_ALIASING_OPCODES = {'parameter', 'tuple', 'get-tuple-element', 'bitcast'}
+
+
+@dataclasses.dataclass
+class MemoryEstimate:
+  """The estimated memory of a graph on each device, in bytes."""
+  # The inputs of the graph, e.g. the parameters and the batch.
+  parameter_bytes: int
+  # The outputs of the graph, which stay alive on the devices after it runs,
+  # without the outputs which reuse the buffers of inputs.
+  activation_bytes: int
+  # The peak of the intermediate buffers while the graph runs.
+  temp_bytes: int
+  # Whether the estimate is given by the compiled executable, or computed from
+  # the partitioned HLO.
+  compiled: bool
+
+  @property
+  def total_bytes(self) -> int:
+    return self.parameter_bytes + self.activation_bytes + self.temp_bytes
+
+
+def _shape_bytes(shape: str) -> int:
+  """The bytes of the arrays of an HLO shape, which can be a tuple."""
+  total = 0
+  for dtype, dims in _ARRAY_RE.findall(shape):
+    if dtype not in _DTYPE_BYTES:
+      continue
+    numel = 1
+    for d in dims.split(',') if dims else []:
+      numel *= int(d)
+    total += numel * _DTYPE_BYTES[dtype]
+  return total
+
+
+def _entry_instructions(hlo: str) -> List[str]:
+  lines = hlo.splitlines()
+  start = next(i for i, line in enumerate(lines) if line.startswith('ENTRY'))
+  instructions = []
+  for line in lines[start + 1:]:
+    if line.startswith('}'):
+      break
+    instructions.append(line)
+  return instructions
+
+
+def _estimate_from_hlo(hlo: str) -> MemoryEstimate:
+  """
+  Estimate the memory of the entry computation of a partitioned HLO module,
+  with the buffer of each instruction alive from its definition to its last
+  use, in program order.
+  """
+  parsed = []
+  for line in _entry_instructions(hlo):
+    match = _INSTRUCTION_RE.match(line)
+    if match is None:
+      continue
+    is_root, name, shape, opcode, rest = match.groups()
+    parsed.append((bool(is_root), name, _shape_bytes(shape), opcode,
+                   _OPERAND_RE.findall(rest)))
+
+  last_use: Dict[str, int] = {}
+  for i, (_, _, _, _, operands) in enumerate(parsed):
+    for operand in operands:
+      last_use[operand] = i
+
+  parameter_bytes = activation_bytes = 0
+  outputs = set()
+  for is_root, name, nbytes, opcode, operands in parsed:
+    if opcode == 'parameter':
+      parameter_bytes += nbytes
+    if is_root:
+      activation_bytes = nbytes
+      outputs = set(operands) if opcode == 'tuple' else {name}
+      # The outputs which are inputs do not take more memory.
+      activation_bytes -= sum(
+          b for _, n, b, op, _ in parsed if n in outputs and op == 'parameter')
+
+  live = peak = 0
+  freed_at: Dict[int, int] = {}
+  for i, (_, name, nbytes, opcode, operands) in enumerate(parsed):
+    if opcode not in _ALIASING_OPCODES and name not in outputs:
+      live += nbytes
+      last = last_use.get(name, i)
+      freed_at[last] = freed_at.get(last, 0) + nbytes
+    peak = max(peak, live)
+    live -= freed_at.pop(i, 0)
+  return MemoryEstimate(parameter_bytes, activation_bytes, peak, compiled=False)
+
+
+def estimate_memory(tensors: Sequence[torch.Tensor],
+                    use_compiled_stats: bool = False) -> MemoryEstimate:
+  """
+  Estimate the memory on each device of the pending graph of `tensors` after
+  SPMD partitioning, without running it. By default, the estimate is computed
+  from the partitioned HLO of the graph, which only runs the SPMD partitioner,
+  e.g. as a quick check on CPU before a long compilation:
+
+    PJRT_DEVICE=CPU XLA_USE_SPMD=1 python check_memory.py
+
+  If `use_compiled_stats` is set and the runtime reports the memory stats of
+  compiled executables, the graph is fully compiled and its stats are returned
+  instead, which is more accurate but as slow as the compilation.
+
+  Example:
+    loss = model(batch)
+    loss.backward()
+    estimate = xs.estimate_memory([loss] + [p.grad for p in model.parameters()])
+    assert estimate.total_bytes < hbm_bytes
+  """
+  tensors = list(tensors)
+  if use_compiled_stats:
+    stats = torch_xla._XLAC._xla_compiled_memory_stats(tensors)
+    if stats is not None:
+      return MemoryEstimate(
+          stats['argument_size_in_bytes'],
+          stats['output_size_in_bytes'] - stats['alias_size_in_bytes'],
+          stats['temp_size_in_bytes'],
+          compiled=True)
+  hlo = torch_xla._XLAC._xla_partitioning_pass(tensors, 1,
+                                               xr.global_runtime_device_count())
+  return _estimate_from_hlo(hlo)
@@ -0,0 +1,252 @@
+import dataclasses
+import itertools
+import math
+import re
+from typing import List, Optional, Tuple, Union
+
+import numpy as np
+import torch
+import torch_xla
+import torch_xla.core.xla_model as xm
+from torch_xla.distributed.spmd.xla_sharded_tensor import XLAShardedTensor
+from torch_xla.distributed.spmd.xla_sharding import (
+    Mesh, _get_tile_assignment, _normalize_partition_spec,
+    _translate_named_partition_spec, mark_sharding, unwrap_sharded_tensor)
+
+
+@dataclasses.dataclass
+class ReshardStep:
+  """A collective of a `ReshardPlan`, over a single mesh axis."""
+  # One of 'all_to_all', 'all_gather', 'dynamic_slice' or 'collective_permute'.
+  collective: str
+  # The mesh axis of the collective, or None for a collective permute.
+  mesh_axis: Optional[int]
+  # The tensor dimensions gathered from and split into, if any.
+  src_dim: Optional[int]
+  dst_dim: Optional[int]
+  # The bytes sent by each device.
+  bytes_per_device: int
+  # The partition spec of the tensor after the step, with mesh axis indices.
+  partition_spec: Tuple
+
+
+@dataclasses.dataclass
+class ReshardPlan:
+  """The steps of `reshard` from a partition spec to another."""
+  src_spec: Tuple
+  dst_spec: Tuple
+  steps: List[ReshardStep]
+  num_devices: int
+
+  @property
+  def bytes_per_device(self) -> int:
+    return sum(step.bytes_per_device for step in self.steps)
+
+  @property
+  def bytes_moved(self) -> int:
+    """The total bytes sent between the devices."""
+    return self.bytes_per_device * self.num_devices
+
+
+def _parse_hlo_sharding(sharding: str,
+                        rank: int) -> Optional[Tuple[List[int], np.ndarray]]:
+  """
+  Parse the tiling of an HLO sharding string into the number of tiles of each
+  tensor dimension and the device tile assignment, with any replication as
+  the last dimension. Returns None for a replicated tensor.
+  """
+  # eg: '{devices=[2,1,2]0,1,2,3 last_tile_dim_replicate}'
+  # eg: '{devices=[2,2]<=[2,2]T(1,0)}'
+  match = re.search(r'devices=\[([\d,]+)\]([^ }]+)', sharding)
+  if match is None:
+    return None
+  dims = [int(d) for d in match.group(1).split(',')]
+  devices = match.group(2)
+  iota = re.match(r'<=\[([\d,]+)\](?:T\(([\d,]+)\))?', devices)
+  if iota is not None:
+    iota_dims = [int(d) for d in iota.group(1).split(',')]
+    ids = np.arange(math.prod(iota_dims)).reshape(iota_dims)
+    if iota.group(2):
+      ids = ids.transpose([int(d) for d in iota.group(2).split(',')])
+  else:
+    ids = np.array([int(d) for d in devices.split(',')])
+  ids = ids.reshape(dims)
+  if len(dims) == rank:
+    ids = ids.reshape(dims + [1])
+  return dims[:rank], ids
+
+
+def _tile_coords(tile_assignment: np.ndarray, rank: int) -> dict:
+  """Map each device to the coordinates of its tile along the tensor dims."""
+  coords = {}
+  for index in np.ndindex(*tile_assignment.shape):
+    coords[int(tile_assignment[index])] = index[:rank]
+  return coords
+
+
+def _candidate_specs(rank: int, num_axes: int):
+  """Enumerate the partition specs of a tensor over a mesh."""
+  # Each mesh axis shards one tensor dim or none; the order of the axes of a
+  # dim is a permutation of them.
+  for dims in itertools.product([None] + list(range(rank)), repeat=num_axes):
+    dim_axes = [
+        [a for a, d in enumerate(dims) if d == dim] for dim in range(rank)
+    ]
+    for perms in itertools.product(
+        *[itertools.permutations(axes) for axes in dim_axes]):
+      yield tuple(
+          None if not axes else axes[0] if len(axes) == 1 else tuple(axes)
+          for axes in perms)
+
+
+def get_partition_spec(t: torch.Tensor, mesh: Mesh) -> Tuple:
+  """
+  Find the partition spec over `mesh`, with mesh axis indices, of the current
+  sharding of `t`, as given by `_get_xla_sharding_spec`. Raises a ValueError
+  if the sharding cannot be expressed over `mesh`.
+  """
+  t = unwrap_sharded_tensor(t)
+  rank = len(t.shape)
+  parsed = _parse_hlo_sharding(torch_xla._XLAC._get_xla_sharding_spec(t), rank)
+  if parsed is None:
+    return (None,) * rank
+  tiles, tile_assignment = parsed
+  coords = _tile_coords(tile_assignment, rank)
+  for spec in _candidate_specs(rank, len(mesh.mesh_shape)):
+    # The tiled mesh axes come first in the tile assignment, in the order of
+    # the tensor dims.
+    tiled_dims = [d for d, p in enumerate(spec) if p is not None]
+    candidate = _get_tile_assignment(mesh, spec)
+    candidate_tiles = [1] * rank
+    for i, d in enumerate(tiled_dims):
+      candidate_tiles[d] = candidate.shape[i]
+    if candidate_tiles != tiles:
+      continue
+    candidate_coords = {}
+    for index in np.ndindex(*candidate.shape):
+      coord = [0] * rank
+      for i, d in enumerate(tiled_dims):
+        coord[d] = index[i]
+      candidate_coords[int(candidate[index])] = tuple(coord)
+    if candidate_coords == coords:
+      return spec
+  raise ValueError(
+      f"The sharding of the tensor cannot be expressed over mesh {mesh.mesh_shape}"
+  )
+
+
+def _to_axes(spec: Tuple) -> List[List[int]]:
+  return [[] if p is None else list(p) if isinstance(p, tuple) else [p]
+          for p in spec]
+
+
+def _from_axes(axes: List[List[int]]) -> Tuple:
+  return tuple(
+      None if not a else a[0] if len(a) == 1 else tuple(a) for a in axes)
+
+
+def plan_reshard(t: torch.Tensor,
+                 mesh: Mesh,
+                 partition_spec: Tuple,
+                 src_spec: Optional[Tuple] = None) -> ReshardPlan:
+  """
+  Compute the collectives to reshard `t` from its current sharding (or
+  `src_spec`) to `partition_spec` over `mesh`, with the fewest bytes sent:
+
+  * A mesh axis which moves from a tensor dim to another is exchanged with an
+    all-to-all, if it is the minor-most axis of its source dim.
+  * The other mesh axes leaving a dim are all-gathered.
+  * The mesh axes added to a dim are split locally with a dynamic slice.
+  * If the axes of the dims are then in a different order than the target, a
+    collective permute moves each shard to its device.
+  """
+  rank = len(t.shape)
+  if src_spec is None:
+    src_spec = get_partition_spec(t, mesh)
+  src_spec = _translate_named_partition_spec(
+      mesh, _normalize_partition_spec(src_spec))
+  dst_spec = _translate_named_partition_spec(
+      mesh, _normalize_partition_spec(partition_spec))
+  if len(src_spec) != rank or len(dst_spec) != rank:
+    raise ValueError(f"Partition specs should have the tensor rank {rank}")
+
+  sizes = mesh.mesh_shape
+  global_bytes = t.numel() * t.element_size()
+  current = _to_axes(src_spec)
+  target = _to_axes(dst_spec)
+  dst_dims = {a: d for d, axes in enumerate(target) for a in axes}
+  steps = []
+
+  def _shard_bytes():
+    return global_bytes // math.prod(sizes[a] for axes in current for a in axes)
+
+  def _dim_of(axis):
+    for d, axes in enumerate(current):
+      if axis in axes:
+        return d
+    return None
+
+  def _add_step(collective, axis, src_dim, dst_dim, nbytes):
+    steps.append(
+        ReshardStep(collective, axis, src_dim, dst_dim, int(nbytes),
+                    _from_axes(current)))
+
+  for axis, n in enumerate(sizes):
+    src_dim, dst_dim = _dim_of(axis), dst_dims.get(axis)
+    if (src_dim is not None and dst_dim is not None and src_dim != dst_dim and
+        current[src_dim][-1] == axis):
+      nbytes = _shard_bytes() * (n - 1) / n
+      current[src_dim].pop()
+      current[dst_dim].append(axis)
+      _add_step('all_to_all', axis, src_dim, dst_dim, nbytes)
+  for axis, n in enumerate(sizes):
+    src_dim, dst_dim = _dim_of(axis), dst_dims.get(axis)
+    if src_dim is not None and src_dim != dst_dim:
+      nbytes = _shard_bytes() * (n - 1)
+      current[src_dim].remove(axis)
+      _add_step('all_gather', axis, src_dim, None, nbytes)
+  for axis in range(len(sizes)):
+    src_dim, dst_dim = _dim_of(axis), dst_dims.get(axis)
+    if src_dim is None and dst_dim is not None:
+      current[dst_dim].append(axis)
+      _add_step('dynamic_slice', axis, None, dst_dim, 0)
+  if current != target:
+    current = [list(axes) for axes in target]
+    _add_step('collective_permute', None, None, None, _shard_bytes())
+  return ReshardPlan(src_spec, dst_spec, steps, int(mesh.size()))
+
+
+def reshard(
+    t: Union[torch.Tensor, XLAShardedTensor],
+    mesh: Mesh,
+    partition_spec: Tuple,
+    src_spec: Optional[Tuple] = None) -> Tuple[XLAShardedTensor, ReshardPlan]:
+  """
+  Return a copy of `t` resharded to `partition_spec` over `mesh`, and the
+  `ReshardPlan` of the collectives used, which reports the bytes moved.
+
+  The current sharding of `t` is read from its HLO sharding, unless given as
+  `src_spec`. The copy is annotated with the partition spec after each step of
+  the plan, so the SPMD partitioner lowers the transition between consecutive
+  annotations to the collective of the step, instead of choosing its own.
+
+  Example:
+    # Move from FSDP-style sharding to tensor parallelism.
+    weight, plan = xs.reshard(weight, mesh, (None, 'model'))
+    print(plan.bytes_moved)
+  """
+  plan = plan_reshard(t, mesh, partition_spec, src_spec)
+  # A clone of device data is still device data, which mark_sharding does not
+  # re-annotate in the graph. The barrier makes the copy an IR value, so the
+  # annotations below are lowered to collectives.
+  copy = unwrap_sharded_tensor(t).clone()
+  xm.optimization_barrier_([copy])
+  resharded = mark_sharding(copy, mesh, plan.src_spec)
+  for i, step in enumerate(plan.steps):
+    # Dynamic slices are local, so only the last of a run is annotated.
+    if (step.collective == 'dynamic_slice' and i + 1 < len(plan.steps) and
+        plan.steps[i + 1].collective == 'dynamic_slice'):
+      continue
+    resharded = mark_sharding(resharded.global_tensor.clone(), mesh,
+                              step.partition_spec)
+  return resharded, plan
@@ -0,0 +1,320 @@
+import dataclasses
+import itertools
+import json
+import logging
+import math
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+import torch
+import torch.nn as nn
+import torch_xla.utils.utils as xu
+from torch_xla.distributed.spmd.xla_sharding import Mesh, mark_sharding_many
+
+log = logging.getLogger(__name__)
+
+# The role of the dimensions of the parameters of the modules known to the
+# cost model. 'out' dimensions index the output features, 'in' dimensions are
+# contracted with the input features, and 'vocab' dimensions are gathered by
+# the input indices. Sharding a dimension without a role all-gathers the
+# parameter before it is used.
+_OUT, _IN, _VOCAB = 'out', 'in', 'vocab'
+
+
+def _get_dim_roles(module: nn.Module, name: str,
+                   param: nn.Parameter) -> Tuple[Optional[str], ...]:
+  if isinstance(module, nn.Embedding):
+    return (_VOCAB, _OUT)
+  if isinstance(module,
+                nn.Linear) or (isinstance(module, nn.modules.conv._ConvNd) and
+                               not module.transposed):
+    if name == 'weight':
+      return (_OUT, _IN) + (None,) * (param.dim() - 2)
+    return (_OUT,)
+  return (None,) * param.dim()
+
+
+@dataclasses.dataclass
+class ShardingOption:
+  """The estimated per-device costs of a partition spec of a parameter."""
+  partition_spec: Tuple
+  # The bytes sent by each device for the parameter in a training step, in the
+  # forward and backward collectives and the gradient reduction.
+  comm_bytes: int
+  # The bytes of the parameter, its gradient and its optimizer states on each
+  # device.
+  memory_bytes: int
+
+
+@dataclasses.dataclass
+class _ParamUse:
+  """A parameter traced by `plan_sharding`, and the modules using it."""
+  name: str
+  shape: Tuple[int, ...]
+  param_bytes: int
+  roles: Tuple[Optional[str], ...]
+  # The (input bytes, output bytes) of each call of the modules owning the
+  # parameter.
+  calls: List[Tuple[int, int]] = dataclasses.field(default_factory=list)
+
+
+def _tensor_bytes(value: Any) -> int:
+  """The bytes of the first tensor found in `value`, or 0."""
+  sizes = []
+  xu.for_each_instance(value, lambda x: isinstance(x, torch.Tensor),
+                       lambda t: sizes.append(t.numel() * t.element_size()))
+  return sizes[0] if sizes else 0
+
+
+@torch.no_grad()
+def _trace_params(module: nn.Module, *args: Any,
+                  **kwargs: Any) -> Dict[str, _ParamUse]:
+  uses = {}
+  owners = defaultdict(list)
+  for module_name, m in module.named_modules():
+    for name, param in m.named_parameters(recurse=False):
+      if param in uses:
+        continue
+      qualified_name = f'{module_name}.{name}' if module_name else name
+      uses[param] = _ParamUse(qualified_name, tuple(param.shape),
+                              param.numel() * param.element_size(),
+                              _get_dim_roles(m, name, param))
+      owners[m].append(uses[param])
+
+  def _record_call(m, inputs, output):
+    for use in owners[m]:
+      use.calls.append((_tensor_bytes(inputs), _tensor_bytes(output)))
+
+  handles = [m.register_forward_hook(_record_call) for m in owners]
+  try:
+    module(*args, **kwargs)
+  finally:
+    for handle in handles:
+      handle.remove()
+  return {use.name: use for use in uses.values()}
+
+
+def _enumerate_specs(shape: Tuple[int, ...],
+                     mesh_sizes: Dict[Any, int]) -> List[Dict[int, Tuple]]:
+  """
+  Enumerate the assignments of the mesh axes to the dimensions of `shape`
+  (or to no dimension), as dicts mapping each sharded dimension to its mesh
+  axes. The dimensions must be divisible by the product of their axes.
+  """
+  axes = list(mesh_sizes)
+  assignments = []
+  for dims in itertools.product(
+      [None] + list(range(len(shape))), repeat=len(axes)):
+    dim_axes = defaultdict(tuple)
+    for axis, dim in zip(axes, dims):
+      if dim is not None and mesh_sizes[axis] > 1:
+        dim_axes[dim] += (axis,)
+    if all(shape[d] % math.prod(mesh_sizes[a]
+                                for a in dim_axes[d]) == 0
+           for d in dim_axes):
+      dim_axes = dict(dim_axes)
+      if dim_axes not in assignments:
+        assignments.append(dim_axes)
+  return assignments
+
+
+def _estimate(use: _ParamUse, dim_axes: Dict[int, Tuple],
+              mesh_sizes: Dict[Any, int], data_axes: Sequence[Any],
+              param_memory_factor: float) -> Tuple[int, int]:
+  """Estimate the (comm bytes, memory bytes) of a sharding of a parameter."""
+  axis_dims = {axis: d for d, axes in dim_axes.items() for axis in axes}
+  shard_bytes = use.param_bytes / math.prod(
+      mesh_sizes[axis] for axis in axis_dims)
+  # The activations are sharded along the batch over the data axes.
+  batch_shards = math.prod(mesh_sizes[axis] for axis in data_axes)
+  comm_bytes = 0.0
+  for axis, n in mesh_sizes.items():
+    if n == 1:
+      continue
+    dim = axis_dims.get(axis)
+    if axis in data_axes:
+      if dim is None:
+        # All-reduce the gradient.
+        comm_bytes += 2 * shard_bytes * (n - 1) / n
+      else:
+        # All-gather in the forward and backward passes, and reduce-scatter
+        # the gradient.
+        comm_bytes += 3 * shard_bytes * (n - 1)
+      continue
+    if dim is None:
+      # Replicated computation along a model axis.
+      continue
+    role = use.roles[dim]
+    calls = use.calls or [(0, 0)]
+    for in_bytes, out_bytes in calls:
+      in_bytes, out_bytes = in_bytes / batch_shards, out_bytes / batch_shards
+      if role == _OUT:
+        # All-gather the output, and all-reduce the input gradient.
+        comm_bytes += out_bytes * (n - 1) / n + 2 * in_bytes * (n - 1) / n
+      elif role == _IN:
+        # All-reduce the partial outputs, and all-gather the input gradient.
+        comm_bytes += 2 * out_bytes * (n - 1) / n + in_bytes * (n - 1) / n
+      elif role == _VOCAB:
+        # All-reduce the partially gathered outputs.
+        comm_bytes += 2 * out_bytes * (n - 1) / n
+      else:
+        # All-gather the parameter in the forward and backward passes.
+        comm_bytes += 2 * shard_bytes * (n - 1)
+  return int(comm_bytes), int(shard_bytes * param_memory_factor)
+
+
+@dataclasses.dataclass
+class ShardingPlan:
+  """
+  The partition specs of the parameters of a module chosen by
+  :func:`plan_sharding`. It can be applied with ``apply``, and saved to JSON
+  with ``to_json`` and reloaded with ``from_json``.
+  """
+  # The partition spec of each parameter, by qualified name.
+  partition_specs: Dict[str, Tuple]
+  # The estimated bytes sent by each device in a training step.
+  comm_bytes: int
+  # The estimated bytes of the parameters, gradients and optimizer states of
+  # each device.
+  memory_bytes: int
+  memory_budget_bytes: Optional[int] = None
+  # The candidate options of each parameter, from the cheapest communication.
+  options: Dict[str, List[ShardingOption]] = dataclasses.field(
+      default_factory=dict, repr=False)
+
+  def apply(self, module: nn.Module, mesh: Mesh) -> None:
+    """
+    Annotate the parameters of ``module``, which must be on the XLA device,
+    with their partition specs in a single call.
+    """
+    params = dict(module.named_parameters())
+    names = list(self.partition_specs)
+    mark_sharding_many([params[name] for name in names], mesh,
+                       [self.partition_specs[name] for name in names])
+
+  def to_json(self) -> str:
+    return json.dumps(dataclasses.asdict(self), indent=2)
+
+  @classmethod
+  def from_json(cls, text: str) -> 'ShardingPlan':
+
+    def _to_spec(spec):
+      return tuple(tuple(p) if isinstance(p, list) else p for p in spec)
+
+    fields = json.loads(text)
+    fields['partition_specs'] = {
+        name: _to_spec(spec)
+        for name, spec in fields['partition_specs'].items()
+    }
+    fields['options'] = {
+        name: [
+            ShardingOption(**dict(
+                option, partition_spec=_to_spec(option['partition_spec'])))
+            for option in options
+        ] for name, options in fields['options'].items()
+    }
+    return cls(**fields)
+
+
+def plan_sharding(
+    module: nn.Module,
+    *args: Any,
+    mesh: Mesh,
+    data_axes: Optional[Sequence[Union[int, str]]] = None,
+    memory_budget_bytes: Optional[int] = None,
+    param_memory_factor: float = 4.0,
+    **kwargs: Any,
+) -> ShardingPlan:
+  """
+  Recommend a partition spec over ``mesh`` for each parameter of ``module``.
+
+  A forward pass of ``module`` on the sample inputs ``args`` and ``kwargs`` is
+  traced to find the modules using each parameter and the sizes of their
+  inputs and outputs. With the module and inputs on an XLA device (e.g. with
+  ``PJRT_DEVICE=CPU``) the forward pass is only traced into IR and not
+  executed, and the mesh does not need to match the devices of the host, so
+  plans for large meshes can be computed on a CPU.
+
+  Every assignment of the mesh axes to the dimensions of each parameter is a
+  candidate. The cost model assumes the batch of the inputs is sharded over
+  ``data_axes`` (all the mesh axes by default) and estimates for each candidate:
+
+  * Along a data axis, a replicated parameter all-reduces its gradient, and a
+    sharded one is all-gathered in the forward and backward passes and its
+    gradient is reduce-scattered.
+  * Along a model axis, sharding the output features of ``nn.Linear``,
+    ``nn.Embedding`` and convolutions all-gathers their outputs, sharding
+    their input features all-reduces their outputs, and sharding the vocabulary
+    of ``nn.Embedding`` all-reduces its outputs, plus the collectives of the
+    input gradients. Sharding the other parameters all-gathers them.
+  * The memory of a parameter on each device is its shard times
+    ``param_memory_factor``, for its gradient and optimizer states (4 for
+    Adam).
+
+  Each parameter takes the option with the fewest bytes communicated. If the
+  total memory exceeds ``memory_budget_bytes``, the options saving the most
+  memory per byte of added communication are then taken until it fits.
+  Collectives of consecutive modules are estimated independently, so pairs of
+  output and input feature sharded layers are pessimistic.
+
+  Example::
+
+      >>> mesh = xs.Mesh(np.arange(64), (8, 8), ('data', 'model'))
+      >>> plan = plan_sharding(model, inputs, mesh=mesh, data_axes=('data',),
+      >>>                      memory_budget_bytes=8 * 2**30)
+      >>> print(plan.partition_specs)
+      >>> plan.apply(model, mesh)
+  """
+  if mesh.axis_names is not None:
+    axes = list(mesh.axis_names)
+  else:
+    axes = list(range(len(mesh.mesh_shape)))
+  mesh_sizes = dict(zip(axes, mesh.mesh_shape))
+  if data_axes is None:
+    data_axes = axes
+  for axis in data_axes:
+    if axis not in mesh_sizes:
+      raise ValueError(f"Axis {axis} is not defined in the given mesh")
+
+  uses = _trace_params(module, *args, **kwargs)
+  options = {}
+  for name, use in uses.items():
+    candidates = []
+    for dim_axes in _enumerate_specs(use.shape, mesh_sizes):
+      comm_bytes, memory_bytes = _estimate(use, dim_axes, mesh_sizes, data_axes,
+                                           param_memory_factor)
+      spec = tuple(
+          None if d not in dim_axes else dim_axes[d][0] if len(dim_axes[d]) ==
+          1 else dim_axes[d] for d in range(len(use.shape)))
+      candidates.append(ShardingOption(spec, comm_bytes, memory_bytes))
+    candidates.sort(key=lambda o: (o.comm_bytes, o.memory_bytes))
+    options[name] = candidates
+
+  chosen = {name: candidates[0] for name, candidates in options.items()}
+  memory_bytes = sum(o.memory_bytes for o in chosen.values())
+  while memory_budget_bytes is not None and memory_bytes > memory_budget_bytes:
+    best = None
+    for name, candidates in options.items():
+      current = chosen[name]
+      for option in candidates:
+        saved = current.memory_bytes - option.memory_bytes
+        if saved <= 0:
+          continue
+        ratio = (option.comm_bytes - current.comm_bytes) / saved
+        if best is None or ratio < best[0]:
+          best = (ratio, name, option)
+    if best is None:
+      log.warning(
+          f"The sharded parameters need {memory_bytes} bytes per device, "
+          f"which exceeds the memory budget of {memory_budget_bytes} bytes")
+      break
+    _, name, option = best
+    memory_bytes -= chosen[name].memory_bytes - option.memory_bytes
+    chosen[name] = option
+
+  return ShardingPlan(
+      partition_specs={name: o.partition_spec for name, o in chosen.items()},
+      comm_bytes=sum(o.comm_bytes for o in chosen.values()),
+      memory_bytes=memory_bytes,
+      memory_budget_bytes=memory_budget_bytes,
+      options=options)
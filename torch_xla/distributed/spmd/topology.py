@@ -0,0 +1,133 @@
+import dataclasses
+import math
+from typing import TYPE_CHECKING, Any, Dict, List, Tuple, Union
+
+import numpy as np
+
+if TYPE_CHECKING:
+  from torch_xla.distributed.spmd.xla_sharding import Mesh
+
+
+@dataclasses.dataclass(frozen=True)
+class VirtualTopology:
+  """
+  A simulated physical TPU topology, to build and evaluate a `HybridMesh`
+  without TPU devices, e.g. on a CPU-only machine. Passing it as the
+  `topology` of a `HybridMesh` replaces the device attributes of the runtime
+  with the ones of `device_attributes`.
+
+  Args:
+    chip_shape: the (x, y, z) shape of the chips of a slice.
+    cores_per_chip: the number of devices of a chip. As on TPU v2 and v3, the
+      cores of a chip are laid out along the z axis of the physical mesh.
+    num_slices: the number of slices connected over DCN.
+    host_shape: the (x, y, z) shape of the block of chips attached to a host.
+
+  Example:
+    # 2 slices of v4-32 with 4 chips per host.
+    topology = VirtualTopology(chip_shape=(2, 2, 4), num_slices=2)
+    mesh = HybridMesh(ici_mesh_shape=(1, 16), dcn_mesh_shape=(2, 1),
+                      topology=topology)
+    mesh_locality(mesh, topology)
+  """
+  chip_shape: Tuple[int, int, int]
+  cores_per_chip: int = 1
+  num_slices: int = 1
+  host_shape: Tuple[int, int, int] = (2, 2, 1)
+
+  def __post_init__(self):
+    if len(self.chip_shape) != 3 or len(self.host_shape) != 3:
+      raise ValueError('chip_shape and host_shape must have three dimensions')
+    if any(c % h != 0 for c, h in zip(self.chip_shape, self.host_shape)):
+      raise ValueError(f'host_shape {self.host_shape} does not tile '
+                       f'chip_shape {self.chip_shape}')
+
+  @property
+  def devices_per_slice(self) -> int:
+    return math.prod(self.chip_shape) * self.cores_per_chip
+
+  @property
+  def num_devices(self) -> int:
+    return self.devices_per_slice * self.num_slices
+
+  @property
+  def hosts_per_slice(self) -> int:
+    return math.prod(self.chip_shape) // math.prod(self.host_shape)
+
+  def _chip_coords(self, device_id: int) -> Tuple[int, int, int]:
+    chip = (device_id % self.devices_per_slice) // self.cores_per_chip
+    x_size, y_size, _ = self.chip_shape
+    return chip % x_size, (chip // x_size) % y_size, chip // (x_size * y_size)
+
+  def device_attributes(self) -> List[Dict[str, Any]]:
+    """
+    The device attributes of the topology, in the format of
+    `xr.global_runtime_device_attributes`. The devices are numbered by slice,
+    then by chip with x varying fastest, then by core.
+    """
+    attributes = []
+    for device_id in range(self.num_devices):
+      x, y, z = self._chip_coords(device_id)
+      core = device_id % self.cores_per_chip
+      attribute = {
+          'name': f'TPU:{device_id}',
+          'coords': [x, y, z * self.cores_per_chip + core],
+          'core_on_chip': core,
+      }
+      # Only multislice topologies report the slice of the devices.
+      if self.num_slices > 1:
+        attribute['slice_index'] = self.slice_index(device_id)
+      attributes.append(attribute)
+    return attributes
+
+  def slice_index(self, device_id: int) -> int:
+    return device_id // self.devices_per_slice
+
+  def host_index(self, device_id: int) -> int:
+    host_coords = [
+        c // h for c, h in zip(self._chip_coords(device_id), self.host_shape)
+    ]
+    hx, hy, _ = [c // h for c, h in zip(self.chip_shape, self.host_shape)]
+    host = host_coords[0] + hx * (host_coords[1] + hy * host_coords[2])
+    return self.slice_index(device_id) * self.hosts_per_slice + host
+
+
+@dataclasses.dataclass
+class MeshAxisLocality:
+  """
+  The fractions of the pairs of neighbors along a mesh axis which are on the
+  same host, and in the same slice. Collectives over an axis with high
+  locality use the faster intra-host and ICI links.
+  """
+  same_host: float
+  same_slice: float
+
+
+def mesh_locality(
+    mesh: 'Mesh',
+    topology: VirtualTopology) -> Dict[Union[int, str], MeshAxisLocality]:
+  """
+  Measure, for each axis of `mesh`, how many of the pairs of adjacent devices
+  along the axis share a host or a slice of `topology`. The result is keyed
+  by the axis names of the mesh, or by the axis indices if it has none. An
+  axis of size 1 has no pairs, and is fully local.
+  """
+  logical_mesh = mesh.get_logical_mesh()
+  axes = mesh.axis_names or range(len(mesh.mesh_shape))
+  locality = {}
+  for dim, axis in enumerate(axes):
+    same_host = same_slice = num_pairs = 0
+    size = logical_mesh.shape[dim]
+    for i in range(size - 1):
+      left = np.take(logical_mesh, i, axis=dim).flatten()
+      right = np.take(logical_mesh, i + 1, axis=dim).flatten()
+      for a, b in zip(left.tolist(), right.tolist()):
+        num_pairs += 1
+        same_host += topology.host_index(a) == topology.host_index(b)
+        same_slice += topology.slice_index(a) == topology.slice_index(b)
+    if num_pairs == 0:
+      locality[axis] = MeshAxisLocality(1.0, 1.0)
+    else:
+      locality[axis] = MeshAxisLocality(same_host / num_pairs,
+                                        same_slice / num_pairs)
+  return locality
@@ -2,8 +2,8 @@ import torch
 from torch.utils._pytree import tree_map
 import torch_xla
 
-from dataclasses import dataclass
-from typing import List, Tuple, Iterator, Union
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple, Iterator, Union
 import contextlib
 import collections
 
@@ -49,6 +49,76 @@ class XLAShard:
     self.data[unpadded_indices] = t
 
 
+@dataclass
+class XLAShardHandle:
+  """
+  A handle to a local shard of a sharded tensor, with the metadata of the
+  shard and without its data. The data is transferred to the host by `fetch`
+  or `fetch_shards`, from the device data of the tensor at the time of the
+  transfer.
+  """
+  # The indices of the shard into the global tensor, as in `XLAShard`.
+  indices: Union[type(Ellipsis), List[slice]]
+
+  # The device the shard's data is on.
+  shard_device: str
+
+  # The replica this shard belongs to, as in `XLAShard`.
+  replica_id: int
+
+  # The position of the shard in the local shards of the tensor.
+  shard_index: int
+
+  # The sharded tensor on the XLA device.
+  tensor: torch.Tensor = field(repr=False, compare=False)
+
+  @property
+  def unpadded_shape(self) -> torch.Size:
+    if self.indices == Ellipsis:
+      return self.tensor.shape
+    return torch.Size(s.stop - s.start for s in self.indices)
+
+  def fetch(self,
+            unpadded: bool = False,
+            out: Optional[torch.Tensor] = None) -> torch.Tensor:
+    """Transfer the data of the shard to the host. See `fetch_shards`."""
+    return fetch_shards([self], unpadded, None if out is None else [out])[0]
+
+
+def fetch_shards(
+    handles: List[XLAShardHandle],
+    unpadded: bool = False,
+    out: Optional[List[torch.Tensor]] = None) -> List[torch.Tensor]:
+  """
+  Transfer the data of the shards of `handles` to the host, in parallel
+  across devices, and return them in the same order. Only the given shards
+  are transferred, each in full, padding included.
+
+  `unpadded` and `out` are conveniences applied on the host after the
+  transfer: they do not reduce the data moved from the devices. If `unpadded`
+  is set, the returned tensors are views of the transferred shards without
+  their padding. If `out` is given, the transferred data is copied into its
+  tensors, which must have the shapes of the returned tensors, and they are
+  returned instead.
+  """
+  if out is not None and len(out) != len(handles):
+    raise ValueError(f"Expected {len(handles)} output tensors, got {len(out)}")
+  datas = torch_xla._XLAC._get_local_shards_data(
+      [h.tensor for h in handles], [h.shard_index for h in handles])
+  results = []
+  for i, (handle, data) in enumerate(zip(handles, datas)):
+    if unpadded and handle.indices != Ellipsis:
+      data = data[tuple(slice(0, s.stop - s.start) for s in handle.indices)]
+    if out is not None:
+      if out[i].shape != data.shape:
+        raise ValueError(
+            f"Output tensor of shape {out[i].shape} does not match the shard "
+            f"shape {data.shape}")
+      data = out[i].copy_(data)
+    results.append(data)
+  return results
+
+
 @contextlib.contextmanager
 def no_dispatch() -> Iterator[None]:
   guard = torch._C._DisableTorchDispatch()  # type: ignore[attr-defined]
@@ -123,6 +193,20 @@ class XLAShardedTensor(torch.Tensor):
         for (data, dev), (replica, indices) in zip(shard_dev, replica_ind)
     ]
 
+  # Handles to the local shards, which expose the metadata of the shards
+  # without transferring their data. The data of a subset of the shards can be
+  # transferred on demand with `fetch_shards`.
+  @property
+  def local_shard_handles(self) -> List[XLAShardHandle]:
+    replica_ind = torch_xla._XLAC._get_local_shard_replica_and_indices(
+        [self.global_tensor])[0]
+    devices = torch_xla._XLAC._get_local_shard_devices(self.global_tensor)
+    return [
+        XLAShardHandle(indices, dev, replica, i, self.global_tensor)
+        for i, ((replica, indices),
+                dev) in enumerate(zip(replica_ind, devices))
+    ]
+
   # Load the given list of local shards into the underlying tensor's data
   # on the local devices.
   def load_local_shards_(self, shards: List[XLAShard]):
@@ -5,10 +5,10 @@ import torch
 import torch_xla
 import torch_xla.core.xla_model as xm
 from torch_xla.distributed.spmd import XLAShardedTensor, XLAShard
+from torch_xla.distributed.spmd.topology import VirtualTopology
 import torch_xla.runtime as xr
 
 import numpy as np
-import functools
 import itertools
 from typing import Tuple, Union, List, Sequence, Any, Optional, Set
 from enum import IntEnum
@@ -61,6 +61,10 @@ class Mesh:
     self.mesh_shape = mesh_shape
     self.axis_names = axis_names
     assert all(d < self.size() for d in device_ids)
+    # Maps (partition_spec, rank) to the `_get_op_sharding_args` and the
+    # OpSharding of the partition spec, for both the partition specs as given
+    # by the user and with the axis names translated to indices.
+    self._op_sharding_cache = {}
 
   def size(self):
     return np.prod(self.mesh_shape)
@@ -80,7 +84,6 @@ class Mesh:
       return None
     return self.axis_names.index(name)
 
-  @functools.lru_cache(maxsize=None)
   def _get_op_sharding_args(self, partition_spec: Tuple):
     partition_spec = _translate_named_partition_spec(self, partition_spec)
     flat_specs = np.hstack([d for d in partition_spec])
@@ -104,23 +107,39 @@ class Mesh:
     sharding_type = int(sharding_type)
     return tile_assignment, group_assignment, replication_groups, sharding_type
 
-  @functools.lru_cache(maxsize=None)
+  def _get_cached_op_sharding(
+      self, partition_spec: Tuple) -> Tuple[Tuple, torch_xla._XLAC.OpSharding]:
+    partition_spec = _normalize_partition_spec(partition_spec)
+    key = (partition_spec, len(partition_spec))
+    cached = self._op_sharding_cache.get(key)
+    if cached is not None:
+      return cached
+
+    translated_key = (_translate_named_partition_spec(self, partition_spec),
+                      len(partition_spec))
+    cached = self._op_sharding_cache.get(translated_key)
+    if cached is None:
+      # For scalar tensors, it can only be replicated.
+      # We have made sure len(t.shape) == len(partition_spec)
+      # in mark_sharding API.
+      if len(partition_spec) == 0:
+        op_sharding_args = ([], [], [], int(ShardingType.REPLICATED))
+      else:
+        op_sharding_args = self._get_op_sharding_args(partition_spec)
+      cached = (op_sharding_args, torch_xla._XLAC.OpSharding(*op_sharding_args))
+      self._op_sharding_cache[translated_key] = cached
+    self._op_sharding_cache[key] = cached
+    return cached
+
   def get_op_sharding(self,
                       partition_spec: Tuple) -> torch_xla._XLAC.OpSharding:
     """
     Return the OpSharding for the given partition spec. This is an expensive
-    operation as the mesh grows, so the value is cached for reuse.
+    operation as the mesh grows, so the value is cached on the mesh for reuse.
+    Partition specs which only differ by the use of axis names or indices share
+    the same OpSharding.
     """
-    # For scalar tensors, it can only be replicated.
-    # We have made sure len(t.shape) == len(partition_spec)
-    # in mark_sharding API.
-    if len(partition_spec) == 0:
-      return torch_xla._XLAC.OpSharding([], [], [], ShardingType.REPLICATED)
-
-    tile_assignment, group_assignment, replication_groups, sharding_type = self._get_op_sharding_args(
-        partition_spec)
-    return torch_xla._XLAC.OpSharding(tile_assignment, group_assignment,
-                                      replication_groups, sharding_type)
+    return self._get_cached_op_sharding(partition_spec)[1]
 
 
 # HybridDevice class has been inspired from jax's mesh_utils: https://github.com/google/jax/blob/fc5960f2b8b7a0ef74dbae4e27c5c08ff1564cff/jax/experimental/mesh_utils.py#L4ƒ
@@ -133,6 +152,8 @@ class HybridMesh(Mesh):
   Args:
     ici_mesh_shape: shape of the logical mesh for inner connected devices.
     dcn_mesh_shape: shape of logical mesh for outer connected devices.
+    topology: a simulated physical topology to build the mesh for, instead of
+      the devices of the runtime.
 
   Example:
     # This example is assuming 2 slices of v4-8.
@@ -150,12 +171,17 @@ class HybridMesh(Mesh):
                *,
                ici_mesh_shape: Tuple[int, ...],
                dcn_mesh_shape: Tuple[int, ...] = None,
-               axis_names: Tuple[str, ...] = None):
+               axis_names: Tuple[str, ...] = None,
+               topology: Optional[VirtualTopology] = None):
     if dcn_mesh_shape == None:
       dcn_mesh_shape = tuple([1] * len(ici_mesh_shape))
     assert len(ici_mesh_shape) == len(dcn_mesh_shape)
     mesh_shape = tuple([x * y for x, y in zip(ici_mesh_shape, dcn_mesh_shape)])
-    self.device_attributes = xr.global_runtime_device_attributes()
+    self.topology = topology
+    if topology is not None:
+      self.device_attributes = topology.device_attributes()
+    else:
+      self.device_attributes = xr.global_runtime_device_attributes()
     self.device_attributes.sort(
         key=lambda attr: xm.parse_xla_device(attr['name'])[1])
 
@@ -187,7 +213,8 @@ class HybridMesh(Mesh):
         A np.ndarray of device logical ordinals with shape [global_x, global_y, global_z]. On
           v2 and v3, global_z is instead cores_per_chip (i.e., 2).
     """
-    assert xm.xla_device_hw(xm.xla_device()) == 'TPU'
+    assert self.topology is not None or xm.xla_device_hw(
+        xm.xla_device()) == 'TPU'
     # coords is a 3-dims tuple representing the device in physical mesh
     device_coords = [self.device_attributes[d]['coords'] for d in devices]
     dims = tuple(d + 1 for d in max(device_coords))
@@ -301,7 +328,7 @@ class HybridMesh(Mesh):
     """
 
     if devices is None:
-      devices = np.arange(xr.global_runtime_device_count())
+      devices = np.arange(len(self.device_attributes))
     if np.prod(mesh_shape) != len(devices):
       raise ValueError(
           f'Number of devices {len(devices)} must equal the product '
@@ -440,6 +467,11 @@ def _get_group_assignment(sharding_type: ShardingType,
   return group_assignment, replication_groups
 
 
+def _normalize_partition_spec(partition_spec: Sequence) -> Tuple:
+  """Convert the lists of a partition spec into tuples, to make it hashable."""
+  return tuple(tuple(p) if isinstance(p, list) else p for p in partition_spec)
+
+
 def _translate_named_partition_spec(mesh: Mesh, partition_spec: Tuple):
   _partition_spec = list()
   for p in partition_spec:
@@ -516,8 +548,8 @@ def mark_sharding(t: Union[torch.Tensor, XLAShardedTensor],
   if use_dynamo_custom_op:
     # Allows Dynamo to capture mark_sharding op
     annotate_func = torch_xla._XLAC._xla_mark_sharding_dynamo_custom_op
-    annotate_func(
-        unwrap_sharded_tensor(t), *mesh._get_op_sharding_args(partition_spec))
+    op_sharding_args, _ = mesh._get_cached_op_sharding(partition_spec)
+    annotate_func(unwrap_sharded_tensor(t), *op_sharding_args)
   else:
     op_sharding = mesh.get_op_sharding(partition_spec)
     annotate_func = torch_xla._XLAC._xla_mark_sharding
@@ -525,6 +557,126 @@ def mark_sharding(t: Union[torch.Tensor, XLAShardedTensor],
   return wrap_as_sharded_tensor(t)
 
 
+@xr.requires_pjrt
+def mark_sharding_many(
+    tensors: Sequence[Union[torch.Tensor, XLAShardedTensor]], mesh: Mesh,
+    partition_specs: Sequence[Tuple[Union[Tuple, int, str, None]]]
+) -> List[XLAShardedTensor]:
+  """
+    Annotates each of `tensors` with the partition spec at the same position
+    of `partition_specs`, as `mark_sharding` does, with a single call into the
+    runtime. The OpShardings are built once per distinct partition spec and
+    cached on the mesh, so this is cheaper than calling `mark_sharding` in a
+    loop when annotating many tensors, e.g. all the parameters of a model or
+    the activations of every step.
+
+    Examples
+    —------------------------------
+    mesh = Mesh(device_ids, (num_devices, 1), ('fsdp', 'tensor'))
+    params = list(model.parameters())
+    specs = [('fsdp',) + (None,) * (p.dim() - 1) for p in params]
+    xs.mark_sharding_many(params, mesh, specs)
+  """
+  assert len(tensors) == len(partition_specs), \
+    f"Got {len(partition_specs)} partition specs for {len(tensors)} tensors."
+  num_devices = xr.global_runtime_device_count()
+  assert num_devices > 0, "This requires XLA supported device(s)."
+  assert mesh.size() == num_devices, \
+    f"{mesh.mesh_shape} is not mappable over {num_devices} devices."
+  for t, partition_spec in zip(tensors, partition_specs):
+    assert len(t.shape) == len(partition_spec), \
+      f"Partition spec length ({len(partition_spec)}) should be equal to the input rank ({len(t.shape)})."
+
+  op_shardings = [mesh.get_op_sharding(spec) for spec in partition_specs]
+  torch_xla._XLAC._xla_mark_sharding_many(
+      [unwrap_sharded_tensor(t) for t in tensors], op_shardings)
+  return [wrap_as_sharded_tensor(t) for t in tensors]
+
+
+@xr.requires_pjrt
+def make_global_tensor_from_local_shards(
+    local_data: torch.Tensor, mesh: Mesh,
+    partition_spec: Tuple[Union[Tuple, int, str, None]],
+    global_shape: Sequence[int]) -> XLAShardedTensor:
+  """
+    Assembles a sharded tensor of `global_shape` on the XLA devices from the
+    data of the local process only, e.g. the slice of the global batch read
+    by each host in multi-host SPMD. Only the shards of the local devices are
+    built and transferred, so the host memory and the host-to-device bytes of
+    each host scale with 1/num_hosts, whereas `mark_sharding` expects the
+    global tensor on every host.
+
+    `local_data` is the block of the global tensor spanned by the shards of
+    the local devices under `partition_spec`, i.e. from the lowest to the
+    highest index of the local shards in each dimension. For a batch sharded
+    over the leading mesh axis of a `HybridMesh`, this is the contiguous
+    slice of the batch of the host.
+
+    Examples
+    —------------------------------
+    mesh = Mesh(device_ids, (num_devices, 1), ('data', 'model'))
+    # Each of the hosts loads its slice of the global batch.
+    local_batch = next(local_loader)
+    global_batch = xs.make_global_tensor_from_local_shards(
+        local_batch, mesh, ('data', None),
+        (local_batch.shape[0] * num_hosts,) + local_batch.shape[1:])
+  """
+  global_shape = torch.Size(global_shape)
+  assert len(global_shape) == len(partition_spec), \
+    f"Partition spec length ({len(partition_spec)}) should be equal to the global rank ({len(global_shape)})."
+
+  # Annotate a lazy placeholder, which does not hold the global data, to
+  # compute the indices of the local shards from its sharding spec only, as
+  # reading the shards of its device data would execute the placeholder.
+  placeholder = torch.empty(
+      global_shape, dtype=local_data.dtype, device=xm.xla_device())
+  xt = mark_sharding(placeholder, mesh, partition_spec)
+  devices = torch_xla._XLAC._xla_get_runtime_devices()
+  shard_indices = [
+      indices for _, indices in torch_xla._XLAC.
+      _get_shard_replica_and_indices_for_devices(xt.global_tensor, devices)
+  ]
+  if all(indices == Ellipsis for indices in shard_indices):
+    # Each device holds the global tensor, which is then the local data.
+    if local_data.shape != global_shape:
+      raise ValueError(
+          f"Local data of shape {local_data.shape} does not match the global "
+          f"shape {global_shape} of a replicated tensor")
+    return mark_sharding(local_data.to(xm.xla_device()), mesh, partition_spec)
+
+  rank = len(global_shape)
+  starts = [
+      min(indices[d].start for indices in shard_indices) for d in range(rank)
+  ]
+  stops = [
+      max(indices[d].stop for indices in shard_indices) for d in range(rank)
+  ]
+  local_shape = torch.Size(stop - start for start, stop in zip(starts, stops))
+  if local_data.shape != local_shape:
+    raise ValueError(
+        f"Local data of shape {local_data.shape} does not match the shape "
+        f"{local_shape} of the block of the local shards")
+
+  # The shards are padded to the size of the largest shard in each dim.
+  partition_spec = _translate_named_partition_spec(mesh, partition_spec)
+  shard_shape = []
+  for size, axes in zip(global_shape, partition_spec):
+    axes = () if axes is None else axes if isinstance(axes, tuple) else (axes,)
+    num_tiles = int(np.prod([mesh.mesh_shape[a] for a in axes]))
+    shard_shape.append(-(-size // num_tiles))
+  shards = []
+  for indices in shard_indices:
+    local_indices = tuple(
+        slice(s.start - start, s.stop - start)
+        for s, start in zip(indices, starts))
+    shard = local_data.new_zeros(shard_shape)
+    shard[tuple(slice(0, s.stop - s.start) for s in indices)] = \
+        local_data[local_indices]
+    shards.append(shard)
+  torch_xla._XLAC._load_local_shards(xt.global_tensor, shards, devices)
+  return xt
+
+
 def clear_sharding(t: Union[torch.Tensor, XLAShardedTensor]) -> torch.Tensor:
   """Clear sharding annotation from the input tensor and return a `cpu` casted tensor."""
   torch_xla._XLAC._xla_clear_sharding(t)
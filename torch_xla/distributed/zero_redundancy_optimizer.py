@@ -1,5 +1,5 @@
 import copy
-from typing import (Any, Iterator, Optional, Type, Union, List, Dict)
+from typing import (Any, Iterator, Optional, Type, Union, List, Dict, Tuple)
 
 import torch
 import torch.nn as nn
@@ -9,6 +9,7 @@ from torch.optim import Optimizer
 
 import torch_xla
 import torch_xla.core.xla_model as xm
+from torch_xla.distributed.cpu_offload_optimizer import CPUOffloadOptimizer, get_buckets
 
 
 class ZeroRedundancyOptimizer(Optimizer):
@@ -40,6 +41,37 @@ class ZeroRedundancyOptimizer(Optimizer):
           If specified, ZeRO-1 will use this ``grad_norm_groups`` for the
           EXTRA all-reduce op in grad norm calculation. This can be model parallel
           groups when mixing ZeRO-1 with model parallelism such as Megatron.
+        coalesce_cc (bool, Optional): if ``True``, then reduce-scatter the
+            gradients and all-gather the updated parameters with coalesced
+            collective ops over buckets of ``bucket_cap_bytes``, instead of
+            one collective op per parameter. Requires ``pin_layout=False``.
+            Default: False
+        bucket_cap_bytes (int, Optional): the max size in bytes of the
+            coalesced collective ops when ``coalesce_cc`` is ``True``. A
+            parameter larger than this gets its own bucket.
+            Default: 25 MiB
+        defer_all_gather (bool, Optional): if ``True``, then ``step`` only
+            updates the parameter shards, and the all-gather of the updated
+            parameters of a module is issued at the start of its next forward
+            pass, by the hooks registered with ``register_all_gather_hooks``,
+            which must be called before the first ``step``. This hides the
+            all-gathers behind the forward computation. Call
+            ``all_gather_params`` before reading the parameters outside of a
+            forward pass (e.g. to save a checkpoint). Default: False
+        flatten_shards (bool, Optional): if ``True``, then pack the shards of
+            all the parameters of a parameter group into a single flat shard.
+            The local optimizer then updates one tensor per parameter group,
+            and the gradients and parameters of a group are reduce-scattered
+            and all-gathered with a single collective op each. All the
+            parameters of a group must have the same dtype, and must all have
+            gradients in a step, if any has one. Not supported together with
+            ``defer_all_gather``. Default: False
+        offload_optimizer_state (bool, Optional): if ``True``, then keep the
+            master copy of the shards and the states of the local optimizer in
+            host memory, and run the local optimizer on the CPU with
+            :class:`CPUOffloadOptimizer`, over buckets of ``bucket_cap_bytes``.
+            The local optimizer must be elementwise (e.g. SGD, Adam or AdamW).
+            Default: False
         **defaults: any trailing arguments, which are forwarded to the local
             optimizer.
 
@@ -60,6 +92,11 @@ class ZeroRedundancyOptimizer(Optimizer):
       sharding_groups: Optional[Any] = None,
       grad_norm_groups: Optional[Any] = None,
       lazy_init: bool = False,
+      coalesce_cc: bool = False,
+      bucket_cap_bytes: int = 25 * 1024 * 1024,
+      defer_all_gather: bool = False,
+      flatten_shards: bool = False,
+      offload_optimizer_state: bool = False,
       **defaults: Any,
   ):
     super().__init__(params, defaults)
@@ -76,6 +113,20 @@ class ZeroRedundancyOptimizer(Optimizer):
     self.grad_clipping = grad_clipping
     self.max_norm = max_norm if max_norm is not None else 1.0
     self.pin_layout = pin_layout
+    if coalesce_cc and pin_layout:
+      raise ValueError("coalesce_cc requires pin_layout=False")
+    self.coalesce_cc = coalesce_cc
+    self.bucket_cap_bytes = bucket_cap_bytes
+    self.defer_all_gather = defer_all_gather
+    if flatten_shards and defer_all_gather:
+      raise ValueError(
+          "flatten_shards is not supported together with defer_all_gather")
+    self.flatten_shards = flatten_shards
+    self.offload_optimizer_state = offload_optimizer_state
+    # Maps the id of a full parameter to the parameter and its updated shard,
+    # for the all-gathers deferred to the next forward pass.
+    self._pending_all_gather: Dict[int, Tuple[Tensor, Tensor]] = {}
+    self._all_gather_hooks_registered = False
 
     self.inited = False
     if not lazy_init:
@@ -97,8 +148,16 @@ class ZeroRedundancyOptimizer(Optimizer):
     # Shard parameters for use in optimizer
     sharded_param_groups = self._shard_parameters()
     # Optimizer initialization
-    self.base_optimizer = self.optimizer_class(sharded_param_groups,
-                                               **self.defaults)
+    if self.offload_optimizer_state:
+      self.base_optimizer = CPUOffloadOptimizer(
+          sharded_param_groups,
+          self.optimizer_class,
+          optimizer_dtype=self.optimizer_dtype,
+          bucket_cap_bytes=self.bucket_cap_bytes,
+          **self.defaults)
+    else:
+      self.base_optimizer = self.optimizer_class(sharded_param_groups,
+                                                 **self.defaults)
     self._sync_param_groups(self.param_groups, self.base_optimizer.param_groups)
     self.inited = True
 
@@ -169,20 +228,103 @@ class ZeroRedundancyOptimizer(Optimizer):
     sharded_params_groups = []
     for param_group in self.param_groups:
       sharded_params = []
-      for param in param_group['params']:
-        shard_data = param.data.to(device="cpu")  # move to cpu
-        shard_data = self._shard_tensor(shard_data)  # slice it
-        if shard_data.dtype != self.optimizer_dtype:
-          shard_data = shard_data.to(dtype=self.optimizer_dtype)
-        shard_data = shard_data.to(device=self.device)  # move to xla device
-        shard = nn.Parameter(shard_data, requires_grad=param.requires_grad)
-        sharded_params.append(shard)
+      if self.flatten_shards:
+        sharded_params.append(
+            self._shard_flat_parameters(param_group['params']))
+      else:
+        for param in param_group['params']:
+          shard_data = param.data.to(device="cpu")  # move to cpu
+          shard_data = self._shard_tensor(shard_data)  # slice it
+          if shard_data.dtype != self.optimizer_dtype:
+            shard_data = shard_data.to(dtype=self.optimizer_dtype)
+          shard_data = shard_data.to(device=self.device)  # move to xla device
+          shard = nn.Parameter(shard_data, requires_grad=param.requires_grad)
+          sharded_params.append(shard)
       sharded_params_group = copy.copy(param_group)
       sharded_params_group['params'] = sharded_params
       sharded_params_groups.append(sharded_params_group)
 
     return sharded_params_groups
 
+  def _shard_flat_parameters(self, params: List[Tensor]) -> nn.Parameter:
+    """
+    Pack the shards of ``params`` into a single flat shard. The shard of each
+    parameter is the chunk of its flattened and padded data for this rank.
+    """
+    if len({param.dtype for param in params}) > 1:
+      raise ValueError(
+          "flatten_shards requires all parameters of a param group to have the same dtype"
+      )
+    shards = [
+        self._shard_tensor(param.data.to(device="cpu").reshape(-1))
+        for param in params
+    ]
+    shard_data = torch.cat(shards).to(dtype=self.optimizer_dtype)
+    return nn.Parameter(
+        shard_data.to(device=self.device),
+        requires_grad=any(param.requires_grad for param in params))
+
+  def _reduce_scatter_flat_grads(self, params: List[Tensor],
+                                 shard: Tensor) -> None:
+    """
+    Reduce-scatter the gradients of ``params`` into the gradient of their
+    flat ``shard`` with a single collective op.
+    """
+    if any(param.grad is None for param in params):
+      raise RuntimeError(
+          "flatten_shards requires all parameters of a param group to have gradients"
+      )
+    # Row r of the matrix holds the chunks of the gradients for rank r, in the
+    # layout of the flat shards.
+    grads_2d = [
+        self._pad_to_world_size(param.grad.reshape(-1),
+                                self.local_world_size).view(
+                                    self.local_world_size, -1)
+        for param in params
+    ]
+    grad_shard = xm.reduce_scatter(
+        xm.REDUCE_SUM,
+        torch.cat(grads_2d, dim=1),
+        scale=1.0 / self.local_world_size,
+        scatter_dim=0,
+        shard_count=self.local_world_size,
+        pin_layout=self.pin_layout,
+        groups=self.sharding_groups,
+    ).reshape(-1)
+    if grad_shard.dtype != self.optimizer_dtype:
+      grad_shard = grad_shard.to(dtype=self.optimizer_dtype)
+    shard.grad = grad_shard
+
+  @torch.no_grad()
+  def _all_gather_flat_params(self, params: List[Tensor],
+                              shard: Tensor) -> None:
+    """
+    All-gather the flat ``shard`` with a single collective op and copy it into
+    ``params``.
+    """
+    shard_data = shard.data
+    if params[0].dtype != self.optimizer_dtype:
+      shard_data = shard_data.to(dtype=params[0].dtype)
+    gathered = xm.all_gather(
+        shard_data.view(1, -1),
+        dim=0,
+        pin_layout=self.pin_layout,
+        groups=self.sharding_groups,
+    )
+    offset = 0
+    for param in params:
+      chunk_size = -(-param.numel() // self.local_world_size)
+      padded_param = gathered[:, offset:offset + chunk_size].reshape(-1)
+      param.data.copy_(padded_param[:param.numel()].view_as(param))
+      offset += chunk_size
+
+  def _get_buckets(self, tensors: List[Tensor]) -> List[List[int]]:
+    """
+    Split the indices of `tensors` into consecutive buckets of at most
+    `bucket_cap_bytes`.
+    """
+    return get_buckets(tensors, self.bucket_cap_bytes)
+
   @torch.no_grad()
   def _calc_grad_norm(
       self,
@@ -245,24 +387,43 @@ class ZeroRedundancyOptimizer(Optimizer):
     Performs a single optimizer step and syncs parameters across all ranks.
     """
     assert self.inited, "must call init_zero() first"
+    if self.defer_all_gather and not self._all_gather_hooks_registered:
+      # Without the hooks, the next forward pass reads stale parameters.
+      raise RuntimeError(
+          "defer_all_gather requires register_all_gather_hooks to be called "
+          "before step")
 
     loss = None
     if closure is not None:
       with torch.enable_grad():
         loss = closure()
 
+    # Parameters not used in the forward pass since the last step may still
+    # have pending all-gathers.
+    self.all_gather_params()
+
     # sync to base optimizer
     self._sync_param_groups(self.param_groups, self.base_optimizer.param_groups)
 
     # Reduce full gradients across ranks
     # Assign gradient shards to the respective parameter shards
+    shards_to_reduce, grads_to_reduce = [], []
     for param_group, sharded_param_group in zip(
         self.param_groups, self.base_optimizer.param_groups):
+      if self.flatten_shards:
+        if any(param.grad is not None for param in param_group['params']):
+          self._reduce_scatter_flat_grads(param_group['params'],
+                                          sharded_param_group['params'][0])
+        continue
       for param, shard in zip(param_group['params'],
                               sharded_param_group['params']):
         if param.grad is not None:
           padded_grad = self._pad_to_world_size(param.grad,
                                                 self.local_world_size)
+          if self.coalesce_cc:
+            shards_to_reduce.append(shard)
+            grads_to_reduce.append(padded_grad)
+            continue
           grad_shard = xm.reduce_scatter(
               xm.REDUCE_SUM,
               padded_grad,
@@ -277,6 +438,21 @@ class ZeroRedundancyOptimizer(Optimizer):
             grad_shard = grad_shard.to(dtype=self.optimizer_dtype)
           shard.grad = grad_shard
 
+    for bucket in self._get_buckets(grads_to_reduce):
+      grad_shards = xm.reduce_scatter(
+          xm.REDUCE_SUM,
+          [grads_to_reduce[i] for i in bucket],
+          scale=1.0 / self.local_world_size,
+          scatter_dim=0,
+          shard_count=self.local_world_size,
+          pin_layout=self.pin_layout,
+          groups=self.sharding_groups,
+      )
+      for i, grad_shard in zip(bucket, grad_shards):
+        if grad_shard.dtype != self.optimizer_dtype:
+          grad_shard = grad_shard.to(dtype=self.optimizer_dtype)
+        shards_to_reduce[i].grad = grad_shard
+
     if self.grad_clipping:
       # Update unscale/clip with sub partitions
       self._clip_grad_norm(max_norm=self.max_norm)
@@ -288,27 +464,147 @@ class ZeroRedundancyOptimizer(Optimizer):
     self.base_optimizer.zero_grad(set_to_none=True)
 
     # All gather the new weights across the ranks and assign them to the full parameters
+    params_to_gather = []
     for param_group, sharded_param_group in zip(
         self.param_groups, self.base_optimizer.param_groups):
+      if self.flatten_shards:
+        if any(param.grad is not None for param in param_group['params']):
+          self._all_gather_flat_params(param_group['params'],
+                                       sharded_param_group['params'][0])
+        continue
       for param, shard in zip(param_group['params'],
                               sharded_param_group['params']):
         if param.grad is not None:
-          shard_data = shard.data
-          if param.dtype != self.optimizer_dtype:
-            shard_data = shard_data.to(dtype=param.dtype)
-          padded_param = xm.all_gather(
-              shard_data,
-              dim=0,
-              pin_layout=self.pin_layout,
-              groups=self.sharding_groups,
-          )
-          param.data.copy_(padded_param.data[:param.size(0)])
+          params_to_gather.append((param, shard))
+    if self.defer_all_gather:
+      for param, shard in params_to_gather:
+        self._pending_all_gather[id(param)] = (param, shard)
+    else:
+      self._all_gather_params(params_to_gather)
 
     # sync back
     self._sync_param_groups(self.base_optimizer.param_groups, self.param_groups)
 
     return loss
 
+  @torch.no_grad()
+  def _all_gather_params(
+      self, params_and_shards: List[Tuple[Tensor, Tensor]]) -> None:
+    """
+    All-gather the parameter shards and copy them into the full parameters.
+    """
+    shards_data = []
+    for param, shard in params_and_shards:
+      shard_data = shard.data
+      if param.dtype != self.optimizer_dtype:
+        shard_data = shard_data.to(dtype=param.dtype)
+      shards_data.append(shard_data)
+
+    if not self.coalesce_cc:
+      for (param, _), shard_data in zip(params_and_shards, shards_data):
+        padded_param = xm.all_gather(
+            shard_data,
+            dim=0,
+            pin_layout=self.pin_layout,
+            groups=self.sharding_groups,
+        )
+        param.data.copy_(padded_param.data[:param.size(0)])
+      return
+
+    # Bucket by the size of the full parameters, which are the outputs.
+    for bucket in self._get_buckets([param for param, _ in params_and_shards]):
+      padded_params = xm.all_gather(
+          [shards_data[i] for i in bucket],
+          dim=0,
+          pin_layout=self.pin_layout,
+          groups=self.sharding_groups,
+      )
+      for i, padded_param in zip(bucket, padded_params):
+        param = params_and_shards[i][0]
+        param.data.copy_(padded_param.data[:param.size(0)])
+
+  def all_gather_params(self, params: Optional[List[Tensor]] = None) -> None:
+    """
+    Issue the all-gathers deferred by ``defer_all_gather`` for ``params``, or
+    for all the parameters if ``params`` is ``None``. This is a no-op for the
+    parameters which are up to date.
+    """
+    if params is None:
+      keys = list(self._pending_all_gather)
+    else:
+      keys = [id(p) for p in params if id(p) in self._pending_all_gather]
+    params_and_shards = [self._pending_all_gather.pop(k) for k in keys]
+    if params_and_shards:
+      self._all_gather_params(params_and_shards)
+
+  def register_all_gather_hooks(
+      self,
+      module: nn.Module,
+      root_params: Optional[List[Tensor]] = None
+  ) -> List[torch.utils.hooks.RemovableHandle]:
+    """
+    Register forward pre-hooks on ``module`` and its submodules to issue the
+    all-gathers deferred by ``defer_all_gather`` for the parameters of each
+    submodule at the start of its forward pass.
+
+    A hook only sees the parameters owned by its submodule, so the parameters
+    owned by several submodules (e.g. tied embeddings) are gathered at the
+    start of the forward pass of ``module`` itself, as well as
+    ``root_params``. Pass in ``root_params`` the parameters which are read by
+    a module which does not own them, e.g. through ``F.linear(x, weight)``,
+    or which are not parameters of ``module`` at all.
+
+    Args:
+        module (nn.Module): the module whose forward pass reads the
+            parameters of the optimizer.
+        root_params (list, Optional): the parameters to gather at the start
+            of the forward pass of ``module``.
+
+    Returns:
+        The hook handles, call ``remove()`` on them to remove the hooks.
+
+    Raises:
+        ValueError: if a parameter of the optimizer is neither a parameter of
+            ``module`` nor in ``root_params``, as no hook would gather it.
+    """
+    num_owners = {}
+    for m in module.modules():
+      for param in m.parameters(recurse=False):
+        num_owners[id(param)] = num_owners.get(id(param), 0) + 1
+    root_ids = {id(param) for param in root_params or []}
+    root_ids.update(k for k, n in num_owners.items() if n > 1)
+    params = [
+        param for param_group in self.param_groups
+        for param in param_group['params']
+    ]
+    missing = [
+        param for param in params
+        if id(param) not in num_owners and id(param) not in root_ids
+    ]
+    if missing:
+      raise ValueError(
+          f'{len(missing)} parameter(s) of the optimizer are not parameters '
+          'of the module, pass them as root_params so that they are gathered '
+          'before the forward pass')
+    gathered_at_root = [param for param in params if id(param) in root_ids]
+
+    def _all_gather_hook(m, args):
+      if self._pending_all_gather:
+        self.all_gather_params(list(m.parameters(recurse=False)))
+
+    def _root_all_gather_hook(m, args):
+      if self._pending_all_gather:
+        self.all_gather_params(gathered_at_root +
+                               list(m.parameters(recurse=False)))
+
+    handles = [module.register_forward_pre_hook(_root_all_gather_hook)]
+    for m in module.modules():
+      if m is not module and next(m.parameters(recurse=False),
+                                  None) is not None:
+        handles.append(m.register_forward_pre_hook(_all_gather_hook))
+    self._all_gather_hooks_registered = True
+    return handles
+
   def state_dict(self):
     state_dict = super().state_dict()
     base_state = self.base_optimizer.state_dict()['state']
@@ -320,6 +616,9 @@ class ZeroRedundancyOptimizer(Optimizer):
     base_state = state_dict.pop('base_state')
     super().load_state_dict(state_dict)
 
+    # init_zero shards the current full parameters
+    self.all_gather_params()
+
     # re-init base optimizer to make sure we have right shards
     self.init_zero()
 
@@ -3,13 +3,16 @@
 # their APIs.
 
 import dataclasses
-from itertools import starmap
+import math
+import re
+import zlib
 
 import torch
 import torch_xla
 import torch_xla.distributed.spmd as xs
+import torch_xla.runtime as xr
 
-from torch.distributed.checkpoint.planner import SavePlan
+from torch.distributed.checkpoint.planner import SavePlan, WriteItem
 from typing import (
     Any,
     Callable,
@@ -151,34 +154,60 @@ def flatten_state_dict(
   return flattened, mappings
 
 
-# TODO(jonbolin): Take a dependency on the upstream implementation when the APIs
-# are stable.
+def _write_item_bytes(write_item: WriteItem) -> int:
+  if write_item.tensor_data is None:
+    return 0
+  numel = math.prod(write_item.tensor_data.chunk.sizes)
+  dtype = write_item.tensor_data.properties.dtype
+  return numel * torch.empty((), dtype=dtype).element_size()
+
+
+# Modified from the upstream implementation to balance the owners of the
+# replicated items.
 # https://github.com/pytorch/pytorch/blob/d1cecd9c32ba700c27f2b0716bf2cbef41469495/torch/distributed/checkpoint/_dedup_tensors.py#L29
 def dedup_tensors(all_plans: List[SavePlan]) -> List[SavePlan]:
+  """
+  Keep a single copy of each WriteItem across all plans. Each item present in
+  several plans (or several times in a plan) is owned by one of them, picked
+  to balance the bytes written by each plan: the largest items are assigned
+  first, each to the plan holding it with the fewest bytes so far.
+  """
   all_plans = list(all_plans)
   key_to_plan: Dict[MetadataIndex, List[int]] = {}
+  key_to_bytes: Dict[MetadataIndex, int] = {}
   for plan_idx, plan in enumerate(all_plans):
     for write_item in plan.items:
-      key_to_plan.setdefault(write_item.index, []).append(plan_idx)
-
-  replicated_items = {k: v for k, v in key_to_plan.items() if len(v) > 1}
-
-  # Remove duplicates by always keeping the first entry.
-  # Compute the per-rank remove set.
-  plan_to_keys: Dict[int, List[MetadataIndex]] = {}
-  for key, plans in replicated_items.items():
-    for plan_idx in plans[1:]:
-      plan_to_keys.setdefault(plan_idx, []).append(key)
-
-  for plan_idx, keys in plan_to_keys.items():
-    key_set = set(keys)
-    # rewrite items and remove elements
-    new_items = [
-        write_item for write_item in all_plans[plan_idx].items
-        if write_item.index not in key_set
-    ]
-    all_plans[plan_idx] = dataclasses.replace(
-        all_plans[plan_idx], items=new_items)
+      plans = key_to_plan.setdefault(write_item.index, [])
+      if plan_idx not in plans:
+        plans.append(plan_idx)
+      key_to_bytes[write_item.index] = _write_item_bytes(write_item)
+
+  # The items held by a single plan are written by it.
+  plan_bytes = [0] * len(all_plans)
+  owners: Dict[MetadataIndex, int] = {}
+  replicated_keys = []
+  for key, plans in key_to_plan.items():
+    if len(plans) == 1:
+      owners[key] = plans[0]
+      plan_bytes[plans[0]] += key_to_bytes[key]
+    else:
+      replicated_keys.append(key)
+  # `sorted` is stable, so the assignment is deterministic.
+  for key in sorted(replicated_keys, key=lambda k: -key_to_bytes[k]):
+    owner = min(key_to_plan[key], key=lambda i: plan_bytes[i])
+    owners[key] = owner
+    plan_bytes[owner] += key_to_bytes[key]
+
+  for plan_idx, plan in enumerate(all_plans):
+    new_items = []
+    written = set()
+    for write_item in plan.items:
+      if owners[
+          write_item.index] == plan_idx and write_item.index not in written:
+        written.add(write_item.index)
+        new_items.append(write_item)
+    if len(new_items) != len(plan.items):
+      all_plans[plan_idx] = dataclasses.replace(plan, items=new_items)
 
   return all_plans
 
@@ -219,26 +248,55 @@ class _CpuShards:
   global_shape: torch.Size
 
 
-def _cpu_shards_from_tensors(tensors: List[torch.Tensor]):
+def _num_replicas(t: torch.Tensor) -> int:
+  """The number of devices holding each shard of a sharded tensor."""
+  sharding = torch_xla._XLAC._get_xla_sharding_spec(t)
+  # eg: '{devices=[2,1,2]0,1,2,3 last_tile_dim_replicate}'
+  match = re.search(r'devices=\[([\d,]+)\]', sharding)
+  if match is None:
+    return xr.global_runtime_device_count()
+  if 'last_tile_dim_replicate' in sharding:
+    return int(match.group(1).split(',')[-1])
+  return 1
+
+
+def _owned_shard_handles(position: int,
+                         t: torch.Tensor) -> List[xs.XLAShardHandle]:
   """
-  Transfer all shards for the input tensors to CPU, and create a _CpuShards
-  object for each.
+  Select the local shards of `t` written by this process. Each shard of the
+  global tensor is owned by a single one of its replicas, chosen from the
+  position of the tensor and the offsets of the shard. Since all processes
+  derive the same owner without communicating, the replicas of a shard on
+  the other devices are never transferred, and the owners are spread over
+  the replicas.
   """
+  num_replicas = _num_replicas(t)
+  handles = []
+  for handle in xs.XLAShardedTensor(t).local_shard_handles:
+    offsets = tuple(s.start for s in handle.indices)
+    key = f'{position}:{offsets}'.encode()
+    if handle.replica_id == zlib.crc32(key) % num_replicas:
+      handles.append(handle)
+  return handles
+
 
-  def create_cpu_shards(global_tensor: torch.Tensor,
-                        shards_dev: List[Tuple[torch.Tensor, str]],
-                        replica_ind: List[Tuple[int, Union[List[slice],
-                                                           type(Ellipsis)]]]):
+def _cpu_shards_from_tensors(tensors: List[torch.Tensor]):
+  """
+  Transfer the shards of the input tensors owned by this process to CPU, and
+  create a _CpuShards object for each.
+  """
+  handles = [_owned_shard_handles(i, t) for i, t in enumerate(tensors)]
+  flat_handles = [h for tensor_handles in handles for h in tensor_handles]
+  datas = iter(xs.fetch_shards(flat_handles))
+  cpu_shards = []
+  for global_tensor, tensor_handles in zip(tensors, handles):
     shards = [
-        xs.XLAShard(data, indices, dev, replica)
-        for (data, dev), (replica, indices) in zip(shards_dev, replica_ind)
+        xs.XLAShard(next(datas), h.indices, h.shard_device, h.replica_id)
+        for h in tensor_handles
     ]
-    global_shape = global_tensor.shape
-    return _CpuShards(shards=shards, global_shape=global_shape)
-
-  shards_devs = torch_xla._XLAC._get_local_shards(tensors)
-  rep_inds = torch_xla._XLAC._get_local_shard_replica_and_indices(tensors)
-  return list(starmap(create_cpu_shards, zip(tensors, shards_devs, rep_inds)))
+    cpu_shards.append(
+        _CpuShards(shards=shards, global_shape=global_tensor.shape))
+  return cpu_shards
 
 
 def _sharded_cpu_state_dict(state_dict: STATE_DICT_TYPE) -> STATE_DICT_TYPE:
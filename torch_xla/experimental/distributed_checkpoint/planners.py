@@ -64,11 +64,15 @@ class SPMDSavePlanner(SavePlanner):
     self.unsharded_state_dict: Dict[str, Any] = None
 
     # Upon the first `resolve_data` call for a WriteItem associated with a
-    # sharded tensor, all local shards are moved to CPU via
-    # `XLAShardedTensor::local_shards` and are tracked in `_local_shards` until
-    # the shard's data is resolved. This allows only transferring the shards
-    # to CPU once.
-    self._local_shards: Dict[str, List[XLAShard]] = {}
+    # sharded tensor, the local shards of the tensor written by this host are
+    # moved to CPU together via `fetch_shards`, and are tracked by their local
+    # shard index in `_local_shards` until the shard's data is resolved. This
+    # allows only transferring the shards to CPU once, and never transferring
+    # the replicas written by other hosts.
+    self._local_shards: Dict[str, Dict[int, XLAShard]] = {}
+
+    # The local shard indices of each sharded tensor in the final plan.
+    self._planned_shards: Dict[str, List[int]] = {}
 
   def set_up_planner(self, state_dict: STATE_DICT_TYPE,
                      is_coordinator: bool) -> None:
@@ -120,6 +124,11 @@ class SPMDSavePlanner(SavePlanner):
     return global_plan, metadata
 
   def finish_plan(self, new_plan: SavePlan) -> SavePlan:
+    self._planned_shards = {}
+    for item in new_plan.items:
+      if item.index.fqn in self.sharded_state_dict:
+        self._planned_shards.setdefault(item.index.fqn,
+                                        []).append(item.index.index)
     return new_plan
 
   def resolve_data(self,
@@ -134,11 +143,19 @@ class SPMDSavePlanner(SavePlanner):
     if index.fqn not in self._local_shards:
       xtensor = self.sharded_state_dict[index.fqn]
       if isinstance(xtensor, XLAShardedTensor):
-        self._local_shards[index.fqn] = xtensor.local_shards
+        # Without a final plan, only transfer the shard being resolved.
+        shard_indices = self._planned_shards.get(index.fqn, [index.index])
+        handles = xtensor.local_shard_handles
+        datas = xs.fetch_shards([handles[i] for i in shard_indices])
+        self._local_shards[index.fqn] = {
+            i: XLAShard(data, handles[i].indices, handles[i].shard_device,
+                        handles[i].replica_id)
+            for i, data in zip(shard_indices, datas)
+        }
       elif isinstance(xtensor, _CpuShards):
-        self._local_shards[index.fqn] = copy(xtensor.shards)
+        self._local_shards[index.fqn] = dict(enumerate(copy(xtensor.shards)))
 
-    shard = self._local_shards[index.fqn][index.index]
+    shard = self._local_shards[index.fqn].get(index.index)
     assert shard is not None, f"WriteItem has already been processed: {index}"
     assert index.offset == torch.Size(
         ind.start for ind in shard.indices
@@ -326,14 +343,19 @@ def _create_write_item_from_indices(fqn: str, shard_index: int,
 def _create_write_items_for_xla_sharded_tensor(
     fqn: str, t: XLAShardedTensor) -> List[WriteItem]:
   items = []
-  # Since local shards are currently moved to CPU on creation, we need to get
-  # the shard indices indirectly to avoid unnecessarily consuming host memory.
-  replica_and_indices = torch_xla._XLAC._get_local_shard_replica_and_indices(
-      [t.global_tensor])[0]
+  # The shard handles give the shard indices without moving the shards to CPU.
+  # A single WriteItem is created for the local replicas of a shard, and the
+  # replicas across hosts are deduplicated in `create_global_plan` before any
+  # data is transferred.
   prop = TensorProperties.create_from_tensor(t)
-  for shard_ind, (_, indices) in enumerate(replica_and_indices):
-    write_item = _create_write_item_from_indices(fqn, shard_ind, indices,
-                                                 t.size(), prop)
+  offsets = set()
+  for handle in t.local_shard_handles:
+    offset = tuple(ind.start for ind in handle.indices)
+    if offset in offsets:
+      continue
+    offsets.add(offset)
+    write_item = _create_write_item_from_indices(fqn, handle.shard_index,
+                                                 handle.indices, t.size(), prop)
     items.append(write_item)
   return items
 
@@ -1,4 +1,6 @@
-from typing import (Any, Callable, Optional, Union)
+import enum
+import fnmatch
+from typing import (Any, Callable, Dict, Optional, Tuple, Union)
 import warnings
 
 import torch
@@ -11,7 +13,7 @@ import torch_xla
 import torch_xla.distributed.spmd as spmd
 
 
-def _prepare_spmd_partition_spec(param):
+def _prepare_spmd_partition_spec(param, batch_axes: Union[str, Tuple] = "fsdp"):
   partition_spec = [None] * len(param.shape)
   # Skip scalar tensors and it replicated.
   if len(partition_spec) == 0:
@@ -21,10 +23,46 @@ def _prepare_spmd_partition_spec(param):
   # fsdp axis of the mesh.
   # TODO: should we shard on the maximal dim for param? Then we need
   # another helper for the output.
-  partition_spec[0] = "fsdp"
+  partition_spec[0] = batch_axes
   return tuple(partition_spec)
 
 
+class TensorParallelStyle(enum.Enum):
+  """
+  How a module is split over the tensor axis of the mesh, in addition to the
+  sharding of its parameters over the fsdp axis.
+  """
+  # nn.Linear with its output features sharded over the tensor axis. Its
+  # output activations are sharded on their last dim.
+  COLWISE = 'colwise'
+  # nn.Linear with its input features sharded over the tensor axis, which
+  # takes the output of a COLWISE module. Its output activations are
+  # replicated over the tensor axis.
+  ROWWISE = 'rowwise'
+  # nn.Embedding with its embedding dim sharded over the tensor axis. Its
+  # output activations are sharded on their last dim.
+  EMBEDDING = 'embedding'
+
+
+_STYLE_MODULE_TYPES = {
+    TensorParallelStyle.COLWISE: nn.Linear,
+    TensorParallelStyle.ROWWISE: nn.Linear,
+    TensorParallelStyle.EMBEDDING: nn.Embedding,
+}
+
+
+def _tensor_parallel_specs(style: TensorParallelStyle,
+                           tensor_axis: str) -> Dict[str, Tuple]:
+  """The partition specs of the parameters of a tensor parallel module."""
+  if style is TensorParallelStyle.COLWISE:
+    # The weight is (out_features, in_features).
+    return {'weight': (tensor_axis, 'fsdp'), 'bias': (tensor_axis,)}
+  if style is TensorParallelStyle.ROWWISE:
+    return {'weight': ('fsdp', tensor_axis), 'bias': ('fsdp',)}
+  # The weight is (num_embeddings, embedding_dim).
+  return {'weight': ('fsdp', tensor_axis)}
+
+
 class SpmdFullyShardedDataParallel(nn.Module):
   """
   This is an experiemntal implementation of rewriting FullyShardedDataParallel using SPMD.
@@ -37,12 +75,32 @@ class SpmdFullyShardedDataParallel(nn.Module):
       The callable should have the signature (output, mesh) -> None.
       If None, the default implementation will shard the first tensor in the output.
       If the output is a tuple, only the first tensor will be sharded.
+    tensor_parallel_plan: A mapping from the names of submodules of `module`,
+      which can be glob patterns, to their `TensorParallelStyle` or its value,
+      eg. {'layers.*.fc1': 'colwise', 'layers.*.fc2': 'rowwise'}. The
+      parameters of the planned submodules are sharded over both the fsdp and
+      the tensor axes, and their output activations and the gradients of their
+      parameters are annotated to match, so FSDP and tensor parallelism
+      compose without conflicting shardings.
+    tensor_axis: The name of the tensor parallel axis of the mesh.
+
+  The batch is sharded over the fsdp axis, and also over a 'data' axis if the
+  mesh has one, which replicates the parameters, e.g. across slices:
+
+    mesh = Mesh(device_ids, (2, 4, 2), ('data', 'fsdp', 'tensor'))
+    model = SpmdFullyShardedDataParallel(
+        model, mesh, tensor_parallel_plan={'mlp.fc1': 'colwise',
+                                           'mlp.fc2': 'rowwise'})
   """
 
   def __init__(self,
                module: nn.Module,
                mesh: spmd.Mesh,
-               shard_output: Optional[Callable] = None):
+               shard_output: Optional[Callable] = None,
+               tensor_parallel_plan: Optional[Dict[str,
+                                                   Union[TensorParallelStyle,
+                                                         str]]] = None,
+               tensor_axis: str = 'tensor'):
     if isinstance(module, SpmdFullyShardedDataParallel):
       raise RuntimeError(
           "Cannot wrap a module that is already wrapped with FSDP. For nested FSDP, "
@@ -62,19 +120,66 @@ class SpmdFullyShardedDataParallel(nn.Module):
           "instead of using any of its submodules or its weights).")
     if "fsdp" not in mesh.axis_names:
       raise ValueError("The mesh must have an axis named 'fsdp'.")
+    tensor_parallel_plan = tensor_parallel_plan or {}
+    if tensor_parallel_plan and tensor_axis not in mesh.axis_names:
+      raise ValueError(
+          f"The mesh must have an axis named '{tensor_axis}' for tensor parallelism."
+      )
 
     super().__init__()
 
     self._orig_module = module
     self._mesh = mesh
+    # The batch dim of the activations is sharded over the data axis, if any,
+    # and the fsdp axis.
+    self._batch_axes = ("data", "fsdp") if "data" in mesh.axis_names else "fsdp"
+
+    # Find the style of each tensor parallel submodule.
+    styles = {}
+    for pattern, style in tensor_parallel_plan.items():
+      style = TensorParallelStyle(style)
+      matches = [(name, m)
+                 for name, m in module.named_modules()
+                 if fnmatch.fnmatchcase(name, pattern)]
+      if not matches:
+        raise ValueError(f"No submodule matches '{pattern}' of the plan.")
+      for name, submodule in matches:
+        if not isinstance(submodule, _STYLE_MODULE_TYPES[style]):
+          raise ValueError(
+              f"Submodule '{name}' of type {type(submodule).__name__} cannot "
+              f"be {style.value} parallel.")
+        styles[name] = style
+
+    # The partition specs of the parameters sharded by this wrapper.
+    self.partition_specs = {}
+    for name, submodule in module.named_modules():
+      if name not in styles:
+        continue
+      specs = _tensor_parallel_specs(styles[name], tensor_axis)
+      for param_name, param in submodule.named_parameters(recurse=False):
+        if torch_xla._XLAC._get_xla_sharding_spec(param) != "":
+          continue
+        spec = specs[param_name]
+        spmd.mark_sharding(param, mesh, spec)
+        fqn = f"{name}.{param_name}" if name else param_name
+        self.partition_specs[fqn] = spec
+        # Annotate the gradients as their parameters, so the partitioner
+        # reduce-scatters them over both axes instead of choosing its own
+        # sharding.
+        if param.requires_grad:
+          param.register_hook(self._make_grad_hook(spec))
+      submodule.register_forward_hook(
+          self._make_activation_hook(styles[name], tensor_axis))
 
     # Only handle params which are not already sharded. This enables
     # sharding individual layers of a Module, with an outer wrapper to
     # shard any leftover parameters.
-    for param in module.parameters():
+    for name, param in module.named_parameters():
       if torch_xla._XLAC._get_xla_sharding_spec(param) != "":
         continue
-      spmd.mark_sharding(param, mesh, _prepare_spmd_partition_spec(param))
+      spec = _prepare_spmd_partition_spec(param)
+      spmd.mark_sharding(param, mesh, spec)
+      self.partition_specs[name] = spec
 
     # Register a backward hook to place optimization barrier to prevent
     # gigantic fusions on syncing the gradients.
@@ -98,13 +203,34 @@ class SpmdFullyShardedDataParallel(nn.Module):
               f"The output type is not supported: {type(output)}. Please provide your own shard_output callable."
           )
 
-        spmd.mark_sharding(real_output, mesh,
-                           _prepare_spmd_partition_spec(real_output))
+        spmd.mark_sharding(
+            real_output, mesh,
+            _prepare_spmd_partition_spec(real_output, self._batch_axes))
 
       shard_output = shard_output_impl
 
     self._shard_output = shard_output
 
+  def _make_activation_hook(self, style: TensorParallelStyle, tensor_axis: str):
+
+    def activation_hook(module, inputs, output):
+      if not isinstance(output, TensorLike) or output.dim() < 2:
+        return
+      spec = [None] * output.dim()
+      spec[0] = self._batch_axes
+      if style is not TensorParallelStyle.ROWWISE:
+        spec[-1] = tensor_axis
+      spmd.mark_sharding(output, self._mesh, tuple(spec))
+
+    return activation_hook
+
+  def _make_grad_hook(self, partition_spec: Tuple):
+
+    def grad_hook(grad):
+      spmd.mark_sharding(grad, self._mesh, partition_spec)
+
+    return grad_hook
+
   @property
   def module(self) -> nn.Module:
     """make model.module accessible, just like DDP."""
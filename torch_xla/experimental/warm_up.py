@@ -0,0 +1,202 @@
+import dataclasses
+import itertools
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+import torch
+import torch_xla
+import torch_xla.core.xla_model as xm
+import torch_xla.utils.utils as xu
+
+# A signature describes the positional inputs of one call. Tensor inputs are
+# recorded as `{'shape': [...], 'dtype': 'float32'}`, other inputs as
+# `{'value': value}`, which must be JSON serializable.
+Signature = List[Dict[str, Any]]
+
+
+def _dtype_name(dtype: torch.dtype) -> str:
+  return str(dtype).split('.')[-1]
+
+
+def _signature_of(args: Sequence[Any]) -> Signature:
+  signature = []
+  for arg in args:
+    if isinstance(arg, torch.Tensor):
+      signature.append({
+          'shape': list(arg.shape),
+          'dtype': _dtype_name(arg.dtype)
+      })
+    else:
+      signature.append({'value': arg})
+  return signature
+
+
+def _signature_key(signature: Signature) -> str:
+  return json.dumps(signature, sort_keys=True)
+
+
+class InputSignatureRecorder:
+  """
+  Records the distinct input signatures a model is called with, so that they
+  can be saved to a JSON manifest and used by `warm_up_cache` in a later run.
+
+  Example:
+    recorder = InputSignatureRecorder()
+    handle = recorder.attach(model)
+    ... serve traffic ...
+    handle.remove()
+    recorder.save('/tmp/manifest.json')
+  """
+
+  def __init__(self):
+    self._signatures = {}
+
+  @property
+  def signatures(self) -> List[Signature]:
+    return list(self._signatures.values())
+
+  def record(self, *args):
+    signature = _signature_of(args)
+    self._signatures.setdefault(_signature_key(signature), signature)
+
+  def attach(self, module: torch.nn.Module):
+    """Records the positional inputs of every `module` forward call. Returns
+    the hook handle, call `remove()` on it to stop recording."""
+    return module.register_forward_pre_hook(
+        lambda module, args: self.record(*args))
+
+  def save(self, path: str):
+    with open(path, 'w') as f:
+      json.dump({'signatures': self.signatures}, f, indent=2)
+
+
+def load_manifest(path: str) -> List[Signature]:
+  """Loads the input signatures saved by `InputSignatureRecorder.save`."""
+  with open(path, 'r') as f:
+    return json.load(f)['signatures']
+
+
+def make_example_inputs(signature: Signature,
+                        device: Optional[torch.device] = None) -> List[Any]:
+  """Creates zero filled inputs on `device` matching `signature`."""
+  device = device or xm.xla_device()
+  inputs = []
+  for entry in signature:
+    if 'shape' in entry:
+      dtype = getattr(torch, entry['dtype'])
+      inputs.append(torch.zeros(entry['shape'], dtype=dtype).to(device))
+    else:
+      inputs.append(entry['value'])
+  return inputs
+
+
+@dataclasses.dataclass
+class WarmUpResult:
+  """The outcome of warming up the graph of one input signature.
+
+  `compile_time` is the time in seconds spent in the compilation thread, and
+  `cache_hit` tells whether the graph was already in the in-memory or the
+  persistent computation cache.
+  """
+  signature: Signature
+  graph_hash: str
+  compile_time: float
+  cache_hit: bool
+
+
+def _trace_graph(model: Callable, args: List[Any],
+                 device: torch.device) -> Tuple[str, Callable[[], bool]]:
+  if isinstance(model, torch.nn.Module):
+    state = list(itertools.chain(model.parameters(), model.buffers()))
+  else:
+    state = []
+  # Keep the original state around, so that in place updates made by the
+  # traced forward (eg. batch norm statistics) can be undone.
+  cloned_state = [torch.clone(t) for t in state]
+
+  outputs = model(*args)
+  tensors = []
+  xu.for_each_instance(outputs, lambda x: isinstance(x, torch.Tensor),
+                       tensors.append)
+  need_update = torch_xla._XLAC._check_tensor_need_materialization(
+      state) if state else []
+  seen = {id(t) for t in tensors}
+  for tensor, updated in zip(state, need_update):
+    if updated and id(tensor) not in seen:
+      tensors.append(tensor)
+  # `mark_step` syncs the live tensors sorted by their unique ID, keep the same
+  # order so that the warmed up graph has the same hash. It also forces the
+  # tensors to device data, which is part of the hash as well.
+  tensors.sort(key=torch_xla._XLAC._xla_get_tensor_id)
+
+  graph_hash = torch_xla._XLAC._get_graph_hash(
+      tensors, force_ltc_data=True).hex()
+  compile_fn = torch_xla._XLAC._xla_prepare_warm_up_cache(
+      tensors, [], force_ltc_data=True)
+
+  for tensor, cloned, updated in zip(state, cloned_state, need_update):
+    if updated:
+      tensor.copy_(cloned)
+  torch_xla._XLAC._clear_pending_irs(str(device))
+  return graph_hash, compile_fn
+
+
+def _timed_compile(compile_fn: Callable[[], bool]) -> Tuple[bool, float]:
+  start = time.perf_counter()
+  compiled = compile_fn()
+  return not compiled, time.perf_counter() - start
+
+
+def warm_up_cache(model: Callable,
+                  signatures: Union[str, Sequence[Signature]],
+                  num_threads: Optional[int] = None,
+                  device: Optional[torch.device] = None) -> List[WarmUpResult]:
+  """
+  Compiles the forward graphs of `model` for every input signature, ahead of
+  time. The graphs are traced one after the other on the calling thread, and
+  compiled in parallel by `num_threads` threads into the computation cache
+  (and into the persistent cache, if `torch_xla.runtime.initialize_cache` was
+  called). A later `model(*inputs)` followed by `xm.mark_step()` with matching
+  input shapes reuses the compiled graph.
+
+  Args:
+    model: The model (or any callable taking XLA tensors) to warm up.
+    signatures: The input signatures, or the path of a JSON manifest written by
+      `InputSignatureRecorder.save`.
+    num_threads: The number of compilation threads. Defaults to one thread per
+      signature, capped at the number of CPUs.
+    device: The XLA device to trace on. Defaults to `xm.xla_device()`.
+
+  Returns:
+    A `WarmUpResult` per signature, in the input order.
+  """
+  if isinstance(signatures, str):
+    signatures = load_manifest(signatures)
+  if not signatures:
+    return []
+  device = device or xm.xla_device()
+  num_threads = num_threads or min(len(signatures), os.cpu_count() or 1)
+
+  # Make sure there is no pending IR that would leak into the traced graphs.
+  xm.mark_step()
+  futures = []
+  with ThreadPoolExecutor(
+      max_workers=num_threads, thread_name_prefix='xla_warm_up') as pool:
+    for signature in signatures:
+      args = make_example_inputs(signature, device)
+      graph_hash, compile_fn = _trace_graph(model, args, device)
+      futures.append(
+          (signature, graph_hash, pool.submit(_timed_compile, compile_fn)))
+    results = []
+    for signature, graph_hash, future in futures:
+      cache_hit, compile_time = future.result()
+      results.append(
+          WarmUpResult(
+              signature=signature,
+              graph_hash=graph_hash,
+              compile_time=compile_time,
+              cache_hit=cache_hit))
+  return results
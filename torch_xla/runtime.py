@@ -264,13 +264,22 @@ def get_master_ip() -> str:
 
 
 @requires_pjrt
-def initialize_cache(path: str, readonly: bool = False):
+def initialize_cache(path: str,
+                     readonly: bool = False,
+                     max_bytes: Optional[int] = None):
   """Initializes the persistent compilation cache. This API must be called
   before any computations have been performed.
 
+  The cache directory can be shared by multiple processes and hosts (eg. over
+  NFS): entries are written atomically, and each writer evicts the least
+  recently used entries once the directory grows beyond `max_bytes`. Use
+  `python -m torch_xla.debug.persistent_cache` to inspect and prune it.
+
   Args:
     path: The path at which to store the persistent cache.
     readonly: Whether or not this worker should have write access to the cache.
+    max_bytes: The max size of the cache directory in bytes. Unbounded if not
+      set.
   """
   assert not torch_xla._XLAC._xla_computation_cache_is_initialized(
   ), "Computation cache has already been initialized"
@@ -279,3 +288,5 @@ def initialize_cache(path: str, readonly: bool = False):
   # the cache.
   os.environ['XLA_PERSISTENT_CACHE_PATH'] = path
   os.environ['XLA_PERSISTENT_CACHE_READ_ONLY'] = '1' if readonly else '0'
+  if max_bytes is not None:
+    os.environ['XLA_PERSISTENT_CACHE_MAX_BYTES'] = str(max_bytes)
@@ -1,11 +1,15 @@
 # This file is copied from https://github.com/pytorch/pytorch/blob/master/torch/utils/checkpoint.py.
 # PyTorch/XLA needs to add `optimization_barrier` before saving the input for the backward hence we
 # slightly modify the upstream version of the checkpoint util function.
+import collections
 import torch
 import warnings
 import torch_xla.core.xla_model as xm
+from torch.utils._python_dispatch import TorchDispatchMode
+from torch.utils._pytree import tree_flatten, tree_map
 from torch.utils.checkpoint import detach_variable, check_backward_validity, _get_device_module, _infer_device_type
-from typing import Iterable, List, Tuple, Union
+from torch.utils.flop_counter import flop_registry
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Union
 
 # The 2 functions below (get_device_states and set_device_states) are slightly modified versions
 # from PyTorch's original file.
@@ -58,6 +62,80 @@ def set_device_states(devices: List[torch.device],
     device_module.set_rng_state(state, device=device)
 
 
+def _output_bytes(outputs: Any) -> int:
+  return sum(t.numel() * t.element_size()
+             for t in tree_flatten(outputs)[0]
+             if isinstance(t, torch.Tensor))
+
+
+def flops_per_byte_policy(func: torch._ops.OpOverload,
+                          args: Tuple[Any, ...],
+                          kwargs: Dict[str, Any],
+                          outputs: Any,
+                          min_flops_per_byte: float = 8.0) -> bool:
+  """
+  A selective checkpointing policy which saves the outputs of the ops that are
+  expensive to recompute for their size, i.e. which take at least
+  ``min_flops_per_byte`` FLOPs per output byte, like matmuls and convolutions.
+  The other ops (elementwise ops, reductions, softmax, ...) are recomputed in
+  the backward pass. The outputs of random ops are always saved, so that the
+  recomputation sees the same values. Use ``functools.partial`` to change
+  ``min_flops_per_byte``.
+  """
+  if torch.Tag.nondeterministic_seeded in func.tags:
+    return True
+  flop_formula = flop_registry.get(func.overloadpacket)
+  if flop_formula is None:
+    return False
+  flops = flop_formula(*args, **kwargs, out_val=outputs)
+  return flops >= min_flops_per_byte * _output_bytes(outputs)
+
+
+class _SelectiveCheckpointMode(TorchDispatchMode):
+  """
+  Records the outputs of the ops chosen by `policy` in the forward pass of a
+  checkpointed function. When created with the `saved` outputs of the forward
+  pass, replays them in the recomputation instead of running the ops again.
+  """
+
+  def __init__(self,
+               policy: Optional[Callable] = None,
+               saved: Optional[Dict[Any, List[Any]]] = None):
+    super().__init__()
+    self.policy = policy
+    self.recompute = saved is not None
+    # Maps each op to its outputs in call order, `None` if not saved.
+    self.saved = collections.defaultdict(list) if saved is None else saved
+    self.counters = collections.defaultdict(int)
+
+  def __torch_dispatch__(self, func, types, args=(), kwargs=None):
+    kwargs = kwargs or {}
+    if self.recompute:
+      outputs = self.saved.get(func, [])
+      index = self.counters[func]
+      self.counters[func] += 1
+      if index < len(outputs) and outputs[index] is not None:
+        return tree_map(
+            lambda x: x.detach()
+            if isinstance(x, torch.Tensor) else x, outputs[index])
+      return func(*args, **kwargs)
+
+    outputs = func(*args, **kwargs)
+    # Views and in-place ops alias other tensors, which can change later.
+    save = (not func.is_view and not func._schema.is_mutable and
+            self.policy(func, args, kwargs, outputs))
+    self.saved[func].append(
+        tree_map(lambda x: x.detach() if isinstance(x, torch.Tensor) else x,
+                 outputs) if save else None)
+    return outputs
+
+  def saved_tensors(self) -> List[torch.Tensor]:
+    return [
+        t for outputs in self.saved.values() for t in tree_flatten(outputs)[0]
+        if isinstance(t, torch.Tensor)
+    ]
+
+
 class CheckpointFunction(torch.autograd.Function):
 
   def _extract_tensors_from_list(inputs):
@@ -72,7 +150,7 @@ class CheckpointFunction(torch.autograd.Function):
     return tensor_inputs
 
   @staticmethod
-  def forward(ctx, run_function, preserve_rng_state, *args):
+  def forward(ctx, run_function, preserve_rng_state, policy, *args):
     check_backward_validity(args)
     ctx.run_function = run_function
     ctx.preserve_rng_state = preserve_rng_state
@@ -114,8 +192,14 @@ class CheckpointFunction(torch.autograd.Function):
 
     ctx.save_for_backward(*tensor_inputs)
 
+    ctx.saved_outputs = None
     with torch.no_grad():
-      outputs = run_function(*args)
+      if policy is None:
+        outputs = run_function(*args)
+      else:
+        with _SelectiveCheckpointMode(policy) as mode:
+          outputs = run_function(*args)
+        ctx.saved_outputs = mode.saved
 
     return outputs
 
@@ -141,8 +225,14 @@ class CheckpointFunction(torch.autograd.Function):
     rng_devices = []
     if ctx.preserve_rng_state and ctx.had_cuda_in_fwd:
       rng_devices = ctx.fwd_gpu_devices
-    xm.optimization_barrier_(
-        CheckpointFunction._extract_tensors_from_list(inputs + list(args)))
+    replay_mode = None
+    barrier_tensors = CheckpointFunction._extract_tensors_from_list(inputs +
+                                                                    list(args))
+    if ctx.saved_outputs is not None:
+      replay_mode = _SelectiveCheckpointMode(saved=ctx.saved_outputs)
+      # The saved outputs are inputs of the recomputation too.
+      barrier_tensors += replay_mode.saved_tensors()
+    xm.optimization_barrier_(barrier_tensors)
     with torch.random.fork_rng(
         devices=rng_devices, enabled=ctx.preserve_rng_state):
       if ctx.preserve_rng_state:
@@ -153,7 +243,12 @@ class CheckpointFunction(torch.autograd.Function):
       with torch.enable_grad(), \
            torch.cuda.amp.autocast(**ctx.gpu_autocast_kwargs), \
            torch.cpu.amp.autocast(**ctx.cpu_autocast_kwargs):
-        outputs = ctx.run_function(*detached_inputs)
+        if replay_mode is None:
+          outputs = ctx.run_function(*detached_inputs)
+        else:
+          with replay_mode:
+            outputs = ctx.run_function(*detached_inputs)
+    ctx.saved_outputs = None
 
     if isinstance(outputs, torch.Tensor):
       outputs = (outputs,)
@@ -173,7 +268,7 @@ class CheckpointFunction(torch.autograd.Function):
         inp.grad if isinstance(inp, torch.Tensor) else None
         for inp in detached_inputs)
 
-    return (None, None) + grads
+    return (None, None, None) + grads
 
 
 def checkpoint(function, *args, use_reentrant: bool = True, **kwargs):
@@ -240,6 +335,13 @@ def checkpoint(function, *args, use_reentrant: bool = True, **kwargs):
             first input as ``activation`` and the second input as ``hidden``
         preserve_rng_state(bool, optional, default=True):  Omit stashing and restoring
             the RNG state during each checkpoint.
+        policy(Callable, optional, default=None): a selective checkpointing
+            policy ``policy(func, args, kwargs, outputs) -> bool``, called for
+            each ATen op run by :attr:`function` in the forward pass. The
+            outputs of the ops for which it returns ``True`` are saved for the
+            backward pass, the other ops are recomputed. See
+            :func:`flops_per_byte_policy`. If ``None``, all the ops are
+            recomputed.
         use_reentrant(bool, optional, default=True): Use checkpointing
             implementation that requires re-entrant autograd.
             If ``use_reentrant=False`` is specified, ``checkpoint`` will use an
@@ -254,11 +356,12 @@ def checkpoint(function, *args, use_reentrant: bool = True, **kwargs):
     """
   # Hack to mix *args with **kwargs in a python 2.7-compliant way
   preserve = kwargs.pop('preserve_rng_state', True)
+  policy = kwargs.pop('policy', None)
   if kwargs:
     raise ValueError("Unexpected keyword arguments: " +
                      ",".join(arg for arg in kwargs))
 
   if use_reentrant:
-    return CheckpointFunction.apply(function, preserve, *args)
+    return CheckpointFunction.apply(function, preserve, policy, *args)
   else:
     raise ValueError("XLA currently does not support use_reentrant==False")